@@ -2,20 +2,104 @@ from crewai import Agent, Task, Crew, Process
 import logging
 import json
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from agents.scout_agent import PRIORITY_RANK, issue_key
+from utils.keyword_matcher import KeywordMatcherRegistry
+from utils.tracing import span, propagate
+
+class AnalystIssuePipeline:
+    """
+    Analyzes Scout issue types one by one as they become available
+    
+    Issues submitted while Scout is still streaming start their Analyst
+    call right away on a small worker pool; each issue type is analyzed
+    once, however often it is submitted. Scout only streams single-prompt
+    analyses, so for sharded ones every issue is submitted by results()
+    once the shard results are merged.
+    """
+    def __init__(self, analyst, query, company_id, max_workers=4):
+        """
+        Start the pipeline
+        
+        Args:
+            analyst: AnalystAgent running the per-issue tasks
+            query: Query string of the analysis
+            company_id: Company the analysis runs for
+            max_workers: Maximum issues analyzed at the same time
+        """
+        self.analyst = analyst
+        self.query = query
+        self.company_id = company_id
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analyst-issue')
+        self.futures = {}
+        self.lock = threading.Lock()
+        
+    def submit(self, issue):
+        """Start analyzing an issue type unless it is already being analyzed"""
+        key = issue_key(issue.get('type', ''))
+        with self.lock:
+            if key not in self.futures:
+                self.futures[key] = self.executor.submit(
+                    propagate(self.analyst.analyze_issue), issue, self.query, self.company_id
+                )
+                
+    def results(self, issues):
+        """
+        Wait for the analysis of every issue, submitting those not seen yet
+        
+        Args:
+            issues: Final list of Scout issue type dicts
+            
+        Returns:
+            List of per-issue insight dicts in the order of issues
+        """
+        for issue in issues:
+            self.submit(issue)
+        return [self.futures[issue_key(issue.get('type', ''))].result() for issue in issues]
+        
+    def shutdown(self):
+        """Stop the workers, dropping issues that have not started"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
 class AnalystAgent:
-    def __init__(self, socket_instance=None):
-        """Initialize the Analyst Agent"""
+    # Cap on sources kept per issue of a ticket grown by appends, newest kept
+    MAX_ISSUE_SOURCES = 20
+
+    def __init__(self, socket_instance=None, cache=None, model_name="azure/gpt-4o-mini", keyword_matchers=None,
+                 scheduler=None, issue_workers=0):
+        """
+        Initialize the Analyst Agent
+        
+        Args:
+            socket_instance: SocketIO instance for emitting events
+            cache: Optional LLMResultCache used to skip repeated LLM calls
+            model_name: LLM used by the agent
+            keyword_matchers: Optional KeywordMatcherRegistry used to recognize team names
+            scheduler: Optional LLMScheduler that admits the LLM calls
+            issue_workers: Issues analyzed concurrently as Scout finds them, 0 analyzes all issues in one task
+        """
         # Store SocketIO instance for emitting events
         self.socketio = socket_instance
+        self.cache = cache
+        self.model_name = model_name
+        self.keyword_matchers = keyword_matchers or KeywordMatcherRegistry()
+        self.scheduler = scheduler
+        self.issue_workers = issue_workers
         
         # Initialize CrewAI Agent for deeper analysis
-        self.agent = Agent(
+        self.agent = self._create_agent()
+        
+    def _create_agent(self):
+        """Create the CrewAI Agent for deeper analysis"""
+        return Agent(
             role="Feedback Analysis Expert",
             goal="Determine responsible teams and actionable recommendations based on feedback analysis",
             backstory="You are a senior analyst specializing in interpreting customer feedback and transforming it into actionable insights for organizations.",
             verbose=True,
-            llm="azure/gpt-4o-mini"
+            llm=self.model_name
         )
         
     def emit_log(self, message):
@@ -40,26 +124,7 @@ class AnalystAgent:
         formatted_text.append("ISSUE TYPES IDENTIFIED:")
         if 'issue_types' in scout_analysis and scout_analysis['issue_types']:
             for i, issue in enumerate(scout_analysis['issue_types'], 1):
-                formatted_text.append(f"  {i}. Type: {issue.get('type', 'Unknown issue type')}")
-                formatted_text.append(f"     Priority: {issue.get('priority', 'Not specified')}")
-                
-                # Add tags if present
-                if 'tags' in issue and issue['tags']:
-                    formatted_text.append(f"     Tags: {', '.join(issue['tags'])}")
-                
-                if 'key_details' in issue and issue['key_details']:
-                    formatted_text.append(f"     Key Details: {issue['key_details']}")
-                
-                if 'examples' in issue and issue['examples']:
-                    formatted_text.append("     Examples:")
-                    for example in issue['examples']:
-                        formatted_text.append(f"       - \"{example}\"")
-                
-                if 'sources' in issue and issue['sources']:
-                    formatted_text.append("     User Reports:")
-                    for source in issue['sources']:
-                        formatted_text.append(f"       - \"{source}\"")
-                
+                formatted_text.extend(self._format_issue(i, issue))
                 formatted_text.append("")  # Empty line for separation
         else:
             formatted_text.append("  No specific issue types identified.")
@@ -88,7 +153,32 @@ class AnalystAgent:
         
         return "\n".join(formatted_text)
 
-    def generate_final_report(self, analyst_insights, scout_analysis, query, metadata):
+    def _format_issue(self, number, issue):
+        """Format one scout issue type as indented text lines"""
+        formatted_text = []
+        formatted_text.append(f"  {number}. Type: {issue.get('type', 'Unknown issue type')}")
+        formatted_text.append(f"     Priority: {issue.get('priority', 'Not specified')}")
+        
+        # Add tags if present
+        if 'tags' in issue and issue['tags']:
+            formatted_text.append(f"     Tags: {', '.join(issue['tags'])}")
+        
+        if 'key_details' in issue and issue['key_details']:
+            formatted_text.append(f"     Key Details: {issue['key_details']}")
+        
+        if 'examples' in issue and issue['examples']:
+            formatted_text.append("     Examples:")
+            for example in issue['examples']:
+                formatted_text.append(f"       - \"{example}\"")
+        
+        if 'sources' in issue and issue['sources']:
+            formatted_text.append("     User Reports:")
+            for source in issue['sources']:
+                formatted_text.append(f"       - \"{source}\"")
+        
+        return formatted_text
+
+    def generate_final_report(self, analyst_insights, scout_analysis, query, metadata, company_id=None):
         """
         Generate final report from analyst insights and scout analysis
         
@@ -97,6 +187,7 @@ class AnalystAgent:
             scout_analysis: Dict containing scout analysis
             query: Original query string
             metadata: Metadata about the analysis
+            company_id: Optional company whose team dictionary is used
             
         Returns:
             Dict containing final report
@@ -129,7 +220,30 @@ class AnalystAgent:
                 }
                 issues.append(issue)
         
-        # Build implementation plan based on issue criticality
+        # Generate cross-team initiatives from analyst insights
+        cross_team_initiatives = []
+        
+        if 'cross_team_recommendations' in analyst_insights and analyst_insights['cross_team_recommendations']:
+            for i, recommendation in enumerate(analyst_insights['cross_team_recommendations']):
+                initiative = {
+                    'name': f"Initiative {i+1}",
+                    'description': recommendation,
+                    'teams_involved': self._extract_teams_from_text(recommendation, company_id),
+                }
+                cross_team_initiatives.append(initiative)
+        
+        # Final report structure
+        final_report = {
+            'executive_summary': self._build_executive_summary(scout_analysis),
+            'issues': issues,
+            'cross_team_initiatives': cross_team_initiatives,
+            'implementation_plan': self._build_implementation_plan(issues)
+        }
+        
+        return final_report
+        
+    def _build_implementation_plan(self, issues):
+        """Build the implementation plan from the first action of each issue, by timeline"""
         implementation_plan = {
             'immediate_actions': [],
             'short_term_actions': [],
@@ -150,32 +264,90 @@ class AnalystAgent:
                 else:
                     implementation_plan['long_term_actions'].append(action)
         
-        # Generate cross-team initiatives from analyst insights
-        cross_team_initiatives = []
-        
-        if 'cross_team_recommendations' in analyst_insights and analyst_insights['cross_team_recommendations']:
-            for i, recommendation in enumerate(analyst_insights['cross_team_recommendations']):
-                initiative = {
-                    'name': f"Initiative {i+1}",
-                    'description': recommendation,
-                    'teams_involved': self._extract_teams_from_text(recommendation),
-                }
-                cross_team_initiatives.append(initiative)
+        return implementation_plan
         
-        # Build executive summary
+    def _build_executive_summary(self, scout_analysis):
+        """Build the executive summary from the scout summary and sentiment"""
         executive_summary = scout_analysis.get('summary', 'No summary available')
         if len(executive_summary) < 100 and 'overall_sentiment' in scout_analysis:
             executive_summary += f" Overall sentiment is {scout_analysis['overall_sentiment'].lower()}."
+        return executive_summary
         
-        # Final report structure
-        final_report = {
-            'executive_summary': executive_summary,
+    def append_final_report(self, existing_report, new_report, scout_analysis):
+        """
+        Fold the report on newly appended feedback into a ticket's final report
+        
+        Existing issues keep their position, and with it their task index,
+        as well as their status, team and strategy; reports of the same
+        issue type add sources, tags and actions and can raise the
+        criticality. Issue types not seen before are appended as new tasks.
+        
+        Args:
+            existing_report: Stored final_report of the ticket
+            new_report: Final report generated for the new records
+            scout_analysis: Merged scout analysis of the ticket
+            
+        Returns:
+            Merged final report dict
+        """
+        issues = [dict(issue) for issue in existing_report.get('issues', [])]
+        positions = {issue_key(issue.get('issue_type', '')): index for index, issue in enumerate(issues)}
+        
+        for issue in new_report.get('issues', []):
+            key = issue_key(issue.get('issue_type', ''))
+            if key not in positions:
+                positions[key] = len(issues)
+                issues.append(dict(issue))
+                continue
+            
+            current = issues[positions[key]]
+            criticality = issue.get('criticality', 'Medium')
+            if PRIORITY_RANK.get(str(criticality).lower(), 2) < PRIORITY_RANK.get(str(current.get('criticality')).lower(), 2):
+                current['criticality'] = criticality
+                current['timeline'] = self._determine_timeline(criticality)
+            for field in ['sources', 'tags', 'recommended_actions']:
+                current[field] = list(dict.fromkeys(chain(current.get(field, []), issue.get(field, []))))
+            current['sources'] = current['sources'][-self.MAX_ISSUE_SOURCES:]
+        
+        # Initiatives are matched by their text and renumbered
+        initiatives = {}
+        for initiative in chain(existing_report.get('cross_team_initiatives', []), new_report.get('cross_team_initiatives', [])):
+            initiatives.setdefault(initiative['description'], initiative.get('teams_involved', []))
+        
+        return {
+            'executive_summary': self._build_executive_summary(scout_analysis),
             'issues': issues,
-            'cross_team_initiatives': cross_team_initiatives,
-            'implementation_plan': implementation_plan
+            'cross_team_initiatives': [
+                {'name': f"Initiative {i+1}", 'description': description, 'teams_involved': teams}
+                for i, (description, teams) in enumerate(initiatives.items())
+            ],
+            'implementation_plan': self._build_implementation_plan(issues)
         }
         
-        return final_report
+    def append_insights(self, existing_insights, new_insights):
+        """
+        Fold the Analyst insights on newly appended feedback into a ticket's insights
+        
+        Args:
+            existing_insights: Stored analyst_insights of the ticket
+            new_insights: Analyst insights for the new records
+            
+        Returns:
+            Merged insights dict; entries for issue types already present are kept
+        """
+        merged = dict(existing_insights or {})
+        for field in ['team_assignments', 'prioritization']:
+            entries = list(merged.get(field, []))
+            seen = {issue_key(entry.get('issue_type', '')) for entry in entries}
+            for entry in new_insights.get(field, []):
+                if issue_key(entry.get('issue_type', '')) not in seen:
+                    seen.add(issue_key(entry.get('issue_type', '')))
+                    entries.append(entry)
+            merged[field] = entries
+        merged['cross_team_recommendations'] = list(dict.fromkeys(chain(
+            merged.get('cross_team_recommendations', []), new_insights.get('cross_team_recommendations', [])
+        )))
+        return merged
         
     def _determine_timeline(self, criticality):
         """Determine timeline based on criticality"""
@@ -190,15 +362,9 @@ class AnalystAgent:
         else:
             return 'long-term'
             
-    def _extract_teams_from_text(self, text):
+    def _extract_teams_from_text(self, text, company_id=None):
         """Extract potential team names from recommendation text"""
-        common_teams = ['Product', 'Engineering', 'Support', 'QA', 'Marketing', 
-                      'Sales', 'Design', 'Customer Success', 'Operations', 'Finance']
-        
-        found_teams = []
-        for team in common_teams:
-            if team.lower() in text.lower():
-                found_teams.append(team)
+        found_teams = self.keyword_matchers.get(company_id).find(text, groups={'teams'})['teams']
         
         # If no teams found, add product and engineering as defaults
         if not found_teams:
@@ -206,40 +372,98 @@ class AnalystAgent:
             
         return found_teams
         
-    def process_analyst_query(self, scout_results):
+    def run_analyst_task(self, analyst_task, company_id=None):
         """
-        Process data with the Analyst Agent and generate final report
+        Execute an Analyst task and parse the JSON from the LLM response
         
         Args:
-            scout_results: Dict containing results from the Scout Agent
+            analyst_task: CrewAI Task to execute
+            company_id: Company the task runs for, used to schedule the LLM call
             
         Returns:
-            Dict containing analyst insights and recommendations
+            Parsed insights dict, or a dict with an 'error' key
         """
-        self.emit_log("Starting Analyst Agent processing...")
+        # Serve repeated prompts from the cache without calling the LLM
+        if self.cache:
+            cached = self.cache.get(self.model_name, analyst_task.description)
+            if cached is not None:
+                self.emit_log("Using cached Analyst insights")
+                analyst_insights = self.parse_json_result(cached)
+                if 'error' not in analyst_insights:
+                    return analyst_insights
         
-        if 'error' in scout_results:
-            self.emit_log(f"⚠️ Error received from Scout Agent: {scout_results['error']}")
-            return scout_results
+        crew = Crew(
+            agents=[self.agent],
+            tasks=[analyst_task],
+            process=Process.sequential,
+            verbose=True
+        )
         
-        process_id = scout_results.get('process_id', 'unknown')
-        company_id = scout_results.get('company_id', 'default_company')
-        query = scout_results.get('query', '')
-        scout_analysis = scout_results.get('scout_analysis', {})
-        metadata = scout_results.get('metadata', {})
+        # Run the analysis, waiting for a slot when a scheduler shares the LLM between companies
+        with span('analyst_llm', prompt_chars=len(analyst_task.description)) as llm_span:
+            if self.scheduler:
+                result = self.scheduler.run(crew.kickoff, company_id=company_id, prompt=analyst_task.description)
+            else:
+                result = crew.kickoff()
+            llm_span.set(response_chars=len(str(result)))
+        print("[analyst_task_PROMPT]",analyst_task.description)
+        
+        analyst_insights = self.parse_json_result(str(result))
+        
+        # Only cache responses that parsed cleanly
+        if self.cache and 'error' not in analyst_insights:
+            self.cache.set(self.model_name, analyst_task.description, str(result))
+        
+        return analyst_insights
+        
+    def parse_json_result(self, result_str):
+        """
+        Parse the JSON object embedded in an LLM response
+        
+        Args:
+            result_str: Raw LLM response text
+            
+        Returns:
+            Parsed result dict, or a dict with an 'error' key
+        """
+        try:
+            # Extract JSON from the response if it's embedded
+            json_start = result_str.find('{')
+            json_end = result_str.rfind('}') + 1
+            
+            if json_start >= 0 and json_end > json_start:
+                json_str = result_str[json_start:json_end]
+                return json.loads(json_str)
+            return {"error": "Could not extract JSON from response"}
+                
+        except json.JSONDecodeError:
+            self.emit_log("⚠️ Error parsing JSON from LLM response")
+            return {"error": "Invalid JSON format in response"}
+        
+    def build_analyst_task(self, query, record_count, scout_analysis):
+        """
+        Build the Analyst task covering every issue of a scout analysis
         
+        Args:
+            query: Query string of the analysis
+            record_count: Number of records analyzed
+            scout_analysis: Dict containing the scout analysis
+            
+        Returns:
+            CrewAI Task
+        """
         # Format the scout analysis as text
         formatted_scout_analysis = self.format_scout_analysis(scout_analysis)
         self.emit_log("Formatted scout analysis for better readability")
         
         # Create the analyst task with optimized prompt
-        analyst_task = Task(
+        return Task(
             description=f"""
             Analyze this feedback data and determine team responsibilities and action plans.
             
             Query: "{query}"
             
-            Context: {scout_results.get('record_count', 0)} records analyzed. 
+            Context: {record_count} records analyzed. 
             
             Scout Analysis:
             ```
@@ -279,44 +503,176 @@ class AnalystAgent:
             expected_output="Detailed analysis and recommendations in structured JSON format"
         )
         
+    def build_issue_task(self, issue, query):
+        """
+        Build an Analyst task for a single scout issue type
+        
+        Args:
+            issue: Scout issue type dict
+            query: Query string of the analysis
+            
+        Returns:
+            CrewAI Task run by its own agent, so issues can be analyzed concurrently
+        """
+        formatted_issue = "\n".join(self._format_issue(1, issue))
+        return Task(
+            description=f"""
+            Determine team responsibility and an action plan for one issue found in customer feedback.
+            
+            Query: "{query}"
+            
+            Issue:
+            ```
+            {formatted_issue}
+            ```
+            
+            Your task:
+            1. Assign the issue to responsible team(s) (support, technical, billing, product, etc.)
+            2. Recommend specific actions to resolve it
+            3. Rate criticality (Critical/High/Medium/Low) based on user impact, business impact, urgency
+            4. Provide a resolution strategy
+            5. Maintain the user reports/sources from the issue
+            6. If resolving it needs several teams working together, give one cross-team recommendation
+            
+            Format as JSON:
+            {{
+                "responsible_team": "Primary team",
+                "supporting_teams": ["Team 1", "Team 2"],
+                "criticality": "Critical/High/Medium/Low",
+                "recommended_actions": ["Action 1", "Action 2"],
+                "resolution_strategy": "Strategy description",
+                "sources": ["User report 1", "User report 2"],
+                "cross_team_recommendation": "Recommendation, or empty",
+                "priority_reason": "Why and how urgently to address it"
+            }}
+            """,
+            agent=self._create_agent(),
+            expected_output="Team assignment and recommendations for the issue in structured JSON format"
+        )
+        
+    def analyze_issue(self, issue, query, company_id=None):
+        """
+        Run the Analyst on a single scout issue type
+        
+        Args:
+            issue: Scout issue type dict
+            query: Query string of the analysis
+            company_id: Company the analysis runs for
+            
+        Returns:
+            Insight dict for the issue, or a dict with an 'error' key
+        """
+        issue_type = issue.get('type', 'Unknown issue type')
         try:
-            # Execute the task
-            self.emit_log("Analyst Agent is evaluating scout findings...")
-            crew = Crew(
-                agents=[self.agent],
-                tasks=[analyst_task],
-                process=Process.sequential,
-                verbose=True
-            )
-            
-            # Run the analysis
-            result = crew.kickoff()
-            print("[analyst_task_PROMPT]",analyst_task.description)
-            
-            # Parse the JSON response
-            try:
-                # Extract JSON from the response if it's embedded
-                result_str = str(result)
-                json_start = result_str.find('{')
-                json_end = result_str.rfind('}') + 1
-                
-                if json_start >= 0 and json_end > json_start:
-                    json_str = result_str[json_start:json_end]
-                    analyst_insights = json.loads(json_str)
-                else:
-                    analyst_insights = {"error": "Could not extract JSON from response"}
-                    
-            except json.JSONDecodeError:
-                self.emit_log("⚠️ Error parsing JSON from LLM response")
-                analyst_insights = {"error": "Invalid JSON format in response"}
+            insights = self.run_analyst_task(self.build_issue_task(issue, query), company_id)
+        except Exception as e:
+            insights = {'error': f'Issue analysis failed: {str(e)}'}
+        if 'error' in insights:
+            self.emit_log(f"⚠️ Could not analyze issue {issue_type}: {insights['error']}")
+        else:
+            self.emit_log(f"Analyzed issue: {issue_type} ({insights.get('responsible_team', 'Unassigned')})")
+        return insights
+        
+    def combine_issue_insights(self, issues, issue_insights):
+        """
+        Combine per-issue Analyst results into the insights of a single Analyst task
+        
+        Args:
+            issues: Scout issue type dicts
+            issue_insights: Insight dicts from analyze_issue, in the same order
+            
+        Returns:
+            Dict with 'team_assignments', 'cross_team_recommendations' and 'prioritization'
+        """
+        team_assignments = []
+        cross_team_recommendations = []
+        prioritization = []
+        for issue, insights in zip(issues, issue_insights):
+            if 'error' in insights:
+                continue
+            assignment = dict(insights)
+            # Use the scout name so the report finds the issue's tags
+            assignment['issue_type'] = issue.get('type', 'Unknown Issue')
+            recommendation = assignment.pop('cross_team_recommendation', None)
+            if recommendation and recommendation not in cross_team_recommendations:
+                cross_team_recommendations.append(recommendation)
+            prioritization.append({'issue_type': assignment['issue_type'],
+                                   'reason': assignment.pop('priority_reason', '')})
+            team_assignments.append(assignment)
+        
+        if issues and not team_assignments:
+            return {'error': 'Analysis failed for every issue'}
+        
+        # Most critical first, as the single task is asked to order them
+        criticality = {entry['issue_type']: entry.get('criticality', 'Medium') for entry in team_assignments}
+        prioritization.sort(key=lambda entry: PRIORITY_RANK.get(str(criticality[entry['issue_type']]).lower(), 2))
+        
+        return {
+            'team_assignments': team_assignments,
+            'cross_team_recommendations': cross_team_recommendations,
+            'prioritization': prioritization
+        }
+        
+    def start_issue_pipeline(self, query, company_id):
+        """
+        Start analyzing issues one by one, if enabled
+        
+        Args:
+            query: Query string of the analysis
+            company_id: Company the analysis runs for
+            
+        Returns:
+            AnalystIssuePipeline to feed Scout issues into, or None when issue_workers is 0
+        """
+        if not self.issue_workers:
+            return None
+        return AnalystIssuePipeline(self, query, company_id, max_workers=self.issue_workers)
+        
+    def process_analyst_query(self, scout_results, pipeline=None):
+        """
+        Process data with the Analyst Agent and generate final report
+        
+        Args:
+            scout_results: Dict containing results from the Scout Agent
+            pipeline: Optional AnalystIssuePipeline analyzing issues one by one
+            
+        Returns:
+            Dict containing analyst insights and recommendations
+        """
+        self.emit_log("Starting Analyst Agent processing...")
+        
+        if 'error' in scout_results:
+            self.emit_log(f"⚠️ Error received from Scout Agent: {scout_results['error']}")
+            return scout_results
+        
+        process_id = scout_results.get('process_id', 'unknown')
+        company_id = scout_results.get('company_id', 'default_company')
+        query = scout_results.get('query', '')
+        scout_analysis = scout_results.get('scout_analysis', {})
+        metadata = scout_results.get('metadata', {})
+        
+        try:
+            if pipeline is not None:
+                # Issues streamed by Scout are already being analyzed; add the rest and collect all
+                issues = scout_analysis.get('issue_types', []) or []
+                self.emit_log(f"Analyst Agent is evaluating {len(issues)} issues...")
+                analyst_insights = self.combine_issue_insights(issues, pipeline.results(issues))
+            else:
+                # Execute the task
+                analyst_task = self.build_analyst_task(query, scout_results.get('record_count', 0), scout_analysis)
+                self.emit_log("Analyst Agent is evaluating scout findings...")
+                analyst_insights = self.run_analyst_task(analyst_task, company_id)
             
             # Generate final report directly (replacing orchestrator)
-            final_report = self.generate_final_report(
-                analyst_insights=analyst_insights,
-                scout_analysis=scout_analysis,
-                query=query,
-                metadata=metadata
-            )
+            with span('report_generation') as report_span:
+                final_report = self.generate_final_report(
+                    analyst_insights=analyst_insights,
+                    scout_analysis=scout_analysis,
+                    query=query,
+                    metadata=metadata,
+                    company_id=company_id
+                )
+                report_span.set(issues=len(final_report['issues']))
             
             # Add metadata to the result
             final_result = {
@@ -5,20 +5,104 @@ import time
 import uuid
 import re
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+import pandas as pd
+from utils.dedup import NearDuplicateDetector
+from utils.keyword_matcher import KeywordMatcherRegistry
+from utils.prompt_packer import PromptPacker, TokenCounter
+from utils.tracing import span, add_span, propagate
+from utils.stream_parser import IssueStreamParser
+
+try:
+    import litellm
+except ImportError:
+    litellm = None
+
+logger = logging.getLogger(__name__)
+
+# Priority ranking used when merging shard results (lower is more urgent)
+PRIORITY_RANK = {'critical': 0, 'high': 1, 'medium': 2, 'low': 3}
+
+def issue_key(issue_name):
+    """Normalize an issue type name so differently punctuated or cased names match"""
+    return re.sub(r'[^a-z0-9]+', ' ', str(issue_name).lower()).strip()
+
+# Record fields checked, in priority order, when extracting metadata
+USER_FIELDS = ["user", "username", "user_id", "customer", "customer_id", "name", "email"]
+LOCATION_FIELDS = ["location", "country", "city", "region", "address"]
+METADATA_TEXT_FIELDS = ["text", "message", "feedback", "content", "description"]
+# Record fields holding the feedback when there is no 'text' or 'message'
+FEEDBACK_FIELDS = ["feedback", "content", "description", "comment", "issue", "complaint"]
+# Record fields the prompt packer uses to balance and order feedback
+CATEGORY_FIELDS = ["category", "type"]
+SOURCE_FIELDS = ["source", "channel"]
+TIMESTAMP_FIELDS = ["timestamp", "created_at", "date", "time"]
 
 class ScoutAgent:
-    def __init__(self, socket_instance=None):
-        """Initialize the Scout Agent"""
+    # Caps on merged issue details so the Analyst prompt stays bounded
+    MAX_MERGED_EXAMPLES = 5
+    MAX_MERGED_SOURCES = 10
+    # Number of users/locations named for a collapsed feedback group
+    MAX_GROUP_NAMES = 3
+    # Cap on locations kept in the metadata of a ticket grown by appends
+    MAX_TOP_LOCATIONS = 3
+    # Seconds between Socket.IO emits of streamed Scout output
+    STREAM_EMIT_INTERVAL = 0.1
+    # Persona of the CrewAI agent, also sent with every streamed prompt
+    AGENT_ROLE = "Data Scout Specialist"
+    AGENT_GOAL = "Extract key insights from user feedback to identify issue types and priorities"
+    AGENT_BACKSTORY = "You are an expert at analyzing customer feedback and identifying common patterns and issues."
+    EXPECTED_OUTPUT = "Detailed analysis of user feedback in structured JSON format"
+
+    def __init__(self, socket_instance=None, max_workers=4, shard_token_limit=100000, cache=None,
+                 model_name="azure/gpt-4o-mini", dedup_threshold=0.8, keyword_matchers=None,
+                 prompt_packer=None, max_shards=None, scheduler=None, stream_llm=False):
+        """
+        Initialize the Scout Agent
+        
+        Args:
+            socket_instance: SocketIO instance for emitting events
+            max_workers: Number of feedback shards analyzed concurrently
+            shard_token_limit: Token budget of one Scout prompt, its instructions included
+            cache: Optional LLMResultCache used to skip repeated LLM calls
+            model_name: LLM used by the agent
+            dedup_threshold: Similarity at which feedback is collapsed as a near-duplicate, None disables
+            keyword_matchers: Optional KeywordMatcherRegistry used for tag detection
+            prompt_packer: Optional PromptPacker that prices and selects feedback entries
+            max_shards: Maximum Scout prompts per analysis; the least preferred feedback
+                beyond them is left out. None analyzes all feedback
+            scheduler: Optional LLMScheduler that admits the LLM calls
+            stream_llm: Whether to stream single-prompt Scout output to the client, needs litellm;
+                sharded analyses are not streamed
+        """
         # Store SocketIO instance for emitting events
         self.socketio = socket_instance
+        self.max_workers = max_workers
+        self.shard_token_limit = shard_token_limit
+        self.cache = cache
+        self.model_name = model_name
+        self.deduplicator = NearDuplicateDetector(threshold=dedup_threshold) if dedup_threshold else None
+        self.keyword_matchers = keyword_matchers or KeywordMatcherRegistry()
+        self.prompt_packer = prompt_packer or PromptPacker(TokenCounter(model_name))
+        self.max_shards = max_shards
+        self.scheduler = scheduler
+        self.stream_llm = stream_llm
+        if stream_llm and litellm is None:
+            logger.info("litellm not installed, Scout output will not be streamed")
         
         # Initialize CrewAI Agent for scouting/information gathering
-        self.agent = Agent(
-            role="Data Scout Specialist",
-            goal="Extract key insights from user feedback to identify issue types and priorities",
-            backstory="You are an expert at analyzing customer feedback and identifying common patterns and issues.",
+        self.agent = self._create_agent()
+        
+    def _create_agent(self):
+        """Create the CrewAI Agent for scouting/information gathering"""
+        return Agent(
+            role=self.AGENT_ROLE,
+            goal=self.AGENT_GOAL,
+            backstory=self.AGENT_BACKSTORY,
             verbose=True,
-            llm="azure/gpt-4o-mini"
+            llm=self.model_name
         )
         
     def emit_log(self, message):
@@ -27,6 +111,11 @@ class ScoutAgent:
         if self.socketio:
             self.socketio.emit('scout_log', {'message': message})
 
+    def emit_stream(self, text, room):
+        """Emits a piece of streamed Scout output to the clients following a job"""
+        if self.socketio:
+            self.socketio.emit('scout_log', {'delta': text}, to=room)
+
     def clean_text(self, text):
         """Clean and normalize text for better analysis"""
         if not text:
@@ -36,121 +125,210 @@ class ScoutAgent:
         text = text.replace('\r\n', '\n').replace('\r', '\n')  # Normalize line breaks
         return text.strip()  # Remove leading/trailing whitespace
     
-    def extract_metadata(self, content):
-        """Extract metadata and categorize feedback for better context"""
+    def extract_metadata(self, content, company_id=None):
+        """
+        Extract metadata counters and feedback items from one batch of records
+        
+        Statistics and the per-record user, location and feedback text are
+        computed with pandas column operations over one DataFrame of the
+        batch rather than per record. Missing values (None/NaN) count as
+        absent when picking the user, location and text of a record.
+        
+        Args:
+            content: List of feedback records
+            company_id: Optional company whose keyword dictionaries are used for tags
+            
+        Returns:
+            Tuple of (dict of metadata counters and the summed 'text_length' of the
+            batch, list of feedback item dicts with 'text', 'user', 'location',
+            'category', 'source' and 'timestamp')
+        """
         metadata = {
             "categories": Counter(),
             "sources": Counter(),
-            "avg_length": 0,
-            "has_structured_fields": False,
+            "text_length": 0,
             "field_statistics": Counter(),
             "users": Counter(),
             "user_location": Counter(),  # New field for user locations
             "potential_tags": Counter()   # New field to track potential tags
         }
+        feedback_items = []
         
-        total_length = 0
-        all_fields = set()
-        
-        # Common tag categories to look for
-        tag_indicators = {
-            'refund': ['refund', 'money back', 'return payment'],
-            'replacement': ['replacement', 'replace', 'new product'],
-            'update': ['update', 'upgrade', 'new version', 'software'],
-            'bug': ['bug', 'error', 'crash', 'not working'],
-            'feature': ['feature', 'add', 'missing', 'would be nice'],
-            'usability': ['difficult', 'confusing', 'hard to use', 'not intuitive'],
-            'performance': ['slow', 'lag', 'freeze', 'performance'],
-            'billing': ['bill', 'charge', 'subscription', 'payment'],
-            'support': ['support', 'help', 'service', 'contact'],
-            'quality': ['quality', 'poor', 'bad', 'excellent', 'good']
-        }
-        
-        for record in content:
-            # Track fields
-            record_fields = set(record.keys())
-            all_fields.update(record_fields)
-            for field in record_fields:
-                metadata["field_statistics"][field] += 1
-            
-            # Look for categories and sources
-            if "category" in record:
-                metadata["categories"][str(record["category"])] += 1
-            elif "type" in record:
-                metadata["categories"][str(record["type"])] += 1
-                
-            if "source" in record:
-                metadata["sources"][str(record["source"])] += 1
-            elif "channel" in record:
-                metadata["sources"][str(record["channel"])] += 1
+        if content:
+            record_count = len(content)
+            
+            # Track fields: iterating the dicts yields their keys without a Python-level loop
+            metadata["field_statistics"] = Counter(chain.from_iterable(content))
+            field_statistics = metadata["field_statistics"]
+            frame = pd.DataFrame(content, index=pd.RangeIndex(record_count), dtype=object)
+            
+            def present(field):
+                """Mask of records that have the field as a key"""
+                if field not in field_statistics:
+                    return pd.Series(False, index=frame.index)
+                if field_statistics[field] == record_count:
+                    return pd.Series(True, index=frame.index)
+                # Only ragged schemas need a per-record key check
+                return pd.Series([field in record for record in content], index=frame.index)
+            
+            def truthy(field):
+                """Mask of records where the field holds a non-empty value"""
+                if field not in field_statistics:
+                    return pd.Series(False, index=frame.index)
+                column = frame[field]
+                return present(field) & column.notna() & column.astype(bool)
+            
+            def first_truthy(fields, as_str=True):
+                """Series with the first non-empty value among fields, as strings unless as_str is False"""
+                values = pd.Series(None, index=frame.index, dtype=object)
+                remaining = pd.Series(True, index=frame.index)
+                for field in fields:
+                    mask = remaining & truthy(field)
+                    if mask.any():
+                        values[mask] = frame[field][mask].astype(str) if as_str else frame[field][mask]
+                        remaining &= ~mask
+                return values
+            
+            def count_values(values):
+                """Counter of values in first-seen order, so ties rank like a per-record loop"""
+                return Counter(values.dropna().value_counts(sort=False).to_dict())
+            
+            # Look for categories and sources, falling back to type/channel
+            for target, primary, fallback in [("categories", "category", "type"), ("sources", "source", "channel")]:
+                primary_mask = present(primary)
+                fallback_mask = ~primary_mask & present(fallback)
+                values = pd.concat([
+                    frame[primary][primary_mask].astype(str) if primary_mask.any() else pd.Series(dtype=object),
+                    frame[fallback][fallback_mask].astype(str) if fallback_mask.any() else pd.Series(dtype=object)
+                ]).sort_index()
+                metadata[target] = count_values(values)
             
             # Track users/usernames and location if available
-            user_found = False
-            for user_field in ["user", "username", "user_id", "customer", "customer_id", "name", "email"]:
-                if user_field in record and record[user_field]:
-                    metadata["users"][str(record[user_field])] += 1
-                    user_found = True
-                    break
-            
-            # Check for location information
-            for location_field in ["location", "country", "city", "region", "address"]:
-                if location_field in record and record[location_field]:
-                    metadata["user_location"][str(record[location_field])] += 1
-                    break
-            
-            # Calculate average text length and detect potential tags
-            feedback_text = ""
-            for field in ["text", "message", "feedback", "content", "description"]:
-                if field in record and record[field]:
-                    feedback_text = str(record[field])
-                    
-                    # Check for tag indicators in the text
-                    feedback_lower = feedback_text.lower()
-                    for tag, keywords in tag_indicators.items():
-                        for keyword in keywords:
-                            if keyword in feedback_lower:
-                                metadata["potential_tags"][tag] += 1
-                                break
-                    
-                    break
-            
-            total_length += len(feedback_text)
-        
-        # Set average length and structure info
-        if content:
-            metadata["avg_length"] = total_length / len(content)
-        metadata["has_structured_fields"] = len(all_fields) > 2
+            users = first_truthy(USER_FIELDS)
+            locations = first_truthy(LOCATION_FIELDS)
+            metadata["users"] = count_values(users)
+            metadata["user_location"] = count_values(locations)
+            
+            # Sum text lengths for the average and detect potential tags
+            feedback_text = first_truthy(METADATA_TEXT_FIELDS).dropna()
+            metadata["text_length"] = int(feedback_text.str.len().sum())
+            
+            # One keyword scan over the batch's texts, using the company's tag dictionary
+            matcher = self.keyword_matchers.get(company_id)
+            metadata["potential_tags"] = matcher.count_records(feedback_text.tolist(), 'tags')
+            
+            # Feedback text: 'text', else 'message' (even if empty), else the first
+            # non-empty feedback field, else all of the record's values joined
+            text_mask = present('text')
+            message_mask = ~text_mask & present('message')
+            other_mask = ~text_mask & ~message_mask
+            texts = pd.Series(None, index=frame.index, dtype=object)
+            for field, field_mask in (('text', text_mask), ('message', message_mask)):
+                field_mask = field_mask & truthy(field)
+                if field_mask.any():
+                    texts[field_mask] = frame[field][field_mask]
+            if other_mask.any():
+                texts[other_mask] = first_truthy(FEEDBACK_FIELDS)[other_mask]
+                for index in texts.index[other_mask & texts.isna()]:
+                    texts[index] = ' '.join(str(value) for value in content[index].values() if value) or None
+            
+            # Clean and keep the feedback: whitespace runs become single spaces
+            texts = texts.dropna().astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+            texts = texts[texts.astype(bool)]
+            
+            # Category, source and time steer which feedback is packed into the prompt
+            def kept(values):
+                """Values of the kept records, with None where absent"""
+                values = values[texts.index]
+                return values.where(values.notna(), None).tolist()
+            
+            columns = zip(
+                texts.tolist(), kept(users), kept(locations), kept(first_truthy(CATEGORY_FIELDS)),
+                kept(first_truthy(SOURCE_FIELDS)), kept(first_truthy(TIMESTAMP_FIELDS, as_str=False))
+            )
+            feedback_items = [
+                {'text': text, 'user': user, 'location': location,
+                 'category': category, 'source': source, 'timestamp': timestamp}
+                for text, user, location, category, source, timestamp in columns
+            ]
+        
+        return metadata, feedback_items
+
+    def scan_records(self, batches, company_id=None):
+        """
+        Collect metadata and feedback items from record batches
+        
+        Batches are consumed one at a time and reduced to counters and
+        compact feedback items, so the raw records of a large file are never
+        all held in memory. Producing a batch (reading and preprocessing a
+        streamed file) happens between these steps, so the
+        metadata_extraction span records only the time spent on the batches,
+        summed over all of them.
+        
+        Args:
+            batches: Iterable of lists of feedback records, e.g. a streaming preprocessor
+            company_id: Optional company whose keyword dictionaries are used for tags
+            
+        Returns:
+            Tuple of (metadata dict, list of feedback item dicts, record count)
+        """
+        scan_start = time.time()
+        extraction_seconds = 0.0
+        metadata = None
+        feedback_items = []
+        record_count = 0
+        
+        for batch in batches:
+            if not batch:
+                continue
+            batch_start = time.time()
+            record_count += len(batch)
+            batch_metadata, batch_items = self.extract_metadata(batch, company_id)
+            if metadata is None:
+                metadata = batch_metadata
+            else:
+                # Counter.update keeps first-seen order, so ties rank as in a single pass
+                for field, value in batch_metadata.items():
+                    if isinstance(value, Counter):
+                        metadata[field].update(value)
+                    else:
+                        metadata[field] += value
+            feedback_items.extend(batch_items)
+            extraction_seconds += time.time() - batch_start
+        
+        batch_start = time.time()
+        if metadata is None:
+            metadata = self.extract_metadata([], company_id)[0]
+        
+        # Set structure info
+        metadata["avg_length"] = metadata.pop("text_length") / record_count if record_count else 0
+        metadata["has_structured_fields"] = len(metadata["field_statistics"]) > 2
         metadata["common_fields"] = [field for field, count in metadata["field_statistics"].most_common(5)]
         
         # Extract top potential tags
         metadata["suggested_tags"] = [tag for tag, count in metadata["potential_tags"].most_common(5)]
         
-        return metadata
+        extraction_seconds += time.time() - batch_start
+        add_span('metadata_extraction', scan_start, duration_ms=extraction_seconds * 1000, records=record_count)
+        return metadata, feedback_items, record_count
 
-    def format_all_feedback(self, all_feedback, user_map=None, location_map=None, max_token_estimate=100000):
+    def format_feedback_entries(self, all_feedback, user_map=None, location_map=None, count_map=None):
         """
-        Format all feedback data without sampling, only cleaning whitespace
+        Format each feedback item as a numbered entry, only cleaning whitespace
         
         Args:
             all_feedback: List of all feedback text
             user_map: Dictionary mapping feedback to usernames
             location_map: Dictionary mapping feedback to user locations
-            max_token_estimate: Rough limit to ensure we don't exceed token limits
+            count_map: Dictionary mapping feedback to how many times it was reported
             
         Returns:
-            Formatted string with all cleaned feedback
+            List of formatted feedback entry strings
         """
-        if not all_feedback:
-            return "No feedback available for analysis."
-            
         # Clean all feedback and remove any empty items
         cleaned_feedback = [self.clean_text(item) for item in all_feedback if item and self.clean_text(item)]
         
-        # Format with numbers
-        formatted_texts = []
-        total_chars = 0
-        char_limit = max_token_estimate * 4  # Rough estimate of chars per token
-        
+        entries = []
         for i, text in enumerate(cleaned_feedback, 1):
             metadata = ""
             if user_map and text in user_map and user_map[text]:
@@ -159,111 +337,487 @@ class ScoutAgent:
             if location_map and text in location_map and location_map[text]:
                 metadata += f" (Location: {location_map[text]})"
                 
-            feedback_entry = f"Feedback {i}{metadata}: {text}"
+            if count_map and count_map.get(text, 1) > 1:
+                metadata += f" (Reported {count_map[text]} times)"
+                
+            entries.append(f"Feedback {i}{metadata}: {text}")
+        
+        return entries
+
+    def prompt_overhead_tokens(self, query, record_count, metadata, entry_count):
+        """
+        Count the tokens a Scout prompt takes besides its feedback
+        
+        Args:
+            query: Query string for analysis
+            record_count: Total number of records being analyzed
+            metadata: Metadata extracted from the whole dataset
+            entry_count: Number of feedback entries, which bounds the shard note
             
-            # Check if we're approaching token limit
-            if total_chars + len(feedback_entry) > char_limit:
-                formatted_texts.append(f"... (and {len(cleaned_feedback) - i + 1} more feedback items not shown due to size constraints)")
-                break
+        Returns:
+            Tokens of the agent persona, instructions, context and expected output
+        """
+        # The longest shard note the prompts can carry
+        shard_info = self._shard_info(entry_count, entry_count, entry_count)
+        return sum(self.prompt_packer.count_tokens(text) for text in (
+            self.build_scout_prompt(query, record_count, metadata, "", shard_info),
+            self.AGENT_ROLE, self.AGENT_GOAL, self.AGENT_BACKSTORY, self.EXPECTED_OUTPUT
+        ))
+
+    def _shard_info(self, index, shard_count, size):
+        """Note telling the model which part of the feedback a shard prompt holds"""
+        return f"This is part {index} of {shard_count} of the feedback ({size} items)."
+
+    def merge_scout_analyses(self, analyses):
+        """
+        Merge per-shard Scout analyses into a single scout_analysis
+        
+        Issue types with the same name are combined: examples, sources and tags
+        are unioned and the most urgent priority wins. Themes are ranked by how
+        many shards reported them and sentiment is a record-weighted vote.
+        
+        Args:
+            analyses: List of (parsed_result, record_count) tuples, one per shard
+            
+        Returns:
+            Dict in the scout_analysis format
+        """
+        merged_issues = {}
+        theme_counts = Counter()
+        theme_labels = {}
+        sentiment_votes = Counter()
+        summaries = []
+        
+        for analysis, shard_records in analyses:
+            for issue in analysis.get('issue_types', []) or []:
+                issue_name = str(issue.get('type', 'Unknown issue type')).strip()
+                key = issue_key(issue_name)
+                
+                if key not in merged_issues:
+                    merged_issues[key] = {
+                        'type': issue_name,
+                        'examples': [],
+                        'priority': issue.get('priority', 'Medium'),
+                        'key_details': [],
+                        'sources': [],
+                        'tags': [],
+                        'shard_count': 0
+                    }
+                merged = merged_issues[key]
+                # An already merged analysis carries how many shards reported the issue
+                merged['shard_count'] += issue.get('shard_count', 1)
+                
+                # Keep the most urgent priority reported by any shard
+                priority = issue.get('priority', 'Medium')
+                if PRIORITY_RANK.get(str(priority).lower(), 2) < PRIORITY_RANK.get(str(merged['priority']).lower(), 2):
+                    merged['priority'] = priority
+                
+                details = issue.get('key_details')
+                if details and details not in merged['key_details']:
+                    merged['key_details'].append(details)
+                
+                for field in ['examples', 'sources', 'tags']:
+                    for value in issue.get(field, []) or []:
+                        if value not in merged[field]:
+                            merged[field].append(value)
+            
+            for theme in analysis.get('common_themes', []) or []:
+                theme_key = str(theme).strip().lower()
+                theme_counts[theme_key] += 1
+                theme_labels.setdefault(theme_key, theme)
+            
+            sentiment = analysis.get('overall_sentiment')
+            if sentiment:
+                sentiment_votes[str(sentiment).strip().capitalize()] += shard_records
+            
+            summary = analysis.get('summary')
+            if summary and summary not in summaries:
+                summaries.append(summary)
+        
+        # Order by priority, then by how widely the issue was reported
+        issue_types = sorted(
+            merged_issues.values(),
+            key=lambda issue: (PRIORITY_RANK.get(str(issue['priority']).lower(), 2), -issue['shard_count'])
+        )
+        for issue in issue_types:
+            issue['examples'] = issue['examples'][:self.MAX_MERGED_EXAMPLES]
+            issue['sources'] = issue['sources'][:self.MAX_MERGED_SOURCES]
+            issue['key_details'] = " ".join(issue['key_details'])
+        
+        return {
+            'issue_types': issue_types,
+            'common_themes': [theme_labels[key] for key, count in theme_counts.most_common()],
+            'overall_sentiment': sentiment_votes.most_common(1)[0][0] if sentiment_votes else 'Neutral',
+            'summary': " ".join(summaries) if summaries else 'No summary available'
+        }
+
+    def append_scout_analysis(self, existing_analysis, existing_records, new_analysis, new_records):
+        """
+        Fold the Scout analysis of newly appended feedback into a ticket's analysis
+        
+        Issue types, sources, tags and themes are merged as for shards and
+        sentiment is weighted by the records behind each side. The summary is
+        the newest one, so it does not grow with every append.
+        
+        Args:
+            existing_analysis: Stored scout_analysis of the ticket
+            existing_records: Number of records behind the stored analysis
+            new_analysis: Scout analysis of the new records
+            new_records: Number of new records
+            
+        Returns:
+            Dict in the scout_analysis format
+        """
+        merged = self.merge_scout_analyses([(existing_analysis, existing_records), (new_analysis, new_records)])
+        merged['summary'] = new_analysis.get('summary') or existing_analysis.get('summary') or 'No summary available'
+        return merged
+
+    def append_metadata(self, existing_metadata, new_metadata):
+        """
+        Combine a ticket's stored metadata with the metadata of an appended batch
+        
+        Record counts add up and lengths are record-weighted; the shard,
+        prompt and packing fields describe the latest run and are taken
+        from the new batch.
+        
+        Args:
+            existing_metadata: Stored metadata of the ticket
+            new_metadata: Metadata of the Scout run over the new records
+            
+        Returns:
+            Merged metadata dict
+        """
+        existing_records = existing_metadata.get('record_count', existing_metadata.get('distinct_feedback', 0))
+        new_records = new_metadata.get('record_count', 0)
+        total_records = existing_records + new_records
+        
+        merged = {**existing_metadata, **new_metadata}
+        merged['record_count'] = total_records
+        merged['distinct_feedback'] = existing_metadata.get('distinct_feedback', 0) + new_metadata.get('distinct_feedback', 0)
+        if total_records:
+            merged['avg_feedback_length'] = int(
+                (existing_metadata.get('avg_feedback_length', 0) * existing_records
+                 + new_metadata.get('avg_feedback_length', 0) * new_records) / total_records
+            )
+        merged['has_structured_data'] = bool(existing_metadata.get('has_structured_data') or new_metadata.get('has_structured_data'))
+        for field in ['common_fields', 'suggested_tags', 'top_locations']:
+            merged[field] = list(dict.fromkeys(chain(existing_metadata.get(field, []), new_metadata.get(field, []))))
+        merged['top_locations'] = merged['top_locations'][:self.MAX_TOP_LOCATIONS]
+        merged['append_count'] = existing_metadata.get('append_count', 0) + 1
+        return merged
+
+    def collapse_duplicates(self, feedback_items):
+        """
+        Collapse near-duplicate feedback into representative items
+        
+        Args:
+            feedback_items: List of dicts with 'text', 'user' and 'location'
+            
+        Returns:
+            List of dicts with the representative 'text', the occurrence 'count',
+            the merged 'users' and 'locations' of the group, and the 'category',
+            'source' and 'timestamp' of the representative
+        """
+        texts = [item['text'] for item in feedback_items]
+        if self.deduplicator:
+            groups = self.deduplicator.group(texts)
+        else:
+            groups = [[index] for index in range(len(texts))]
+        
+        collapsed = []
+        for group in groups:
+            users = []
+            locations = []
+            for index in group:
+                user = feedback_items[index]['user']
+                location = feedback_items[index]['location']
+                if user and user not in users:
+                    users.append(user)
+                if location and location not in locations:
+                    locations.append(location)
             
-            formatted_texts.append(feedback_entry)
-            total_chars += len(feedback_entry)
+            representative = feedback_items[group[0]]
+            collapsed.append({
+                'text': texts[group[0]],
+                'count': len(group),
+                'users': users,
+                'locations': locations,
+                'category': representative.get('category'),
+                'source': representative.get('source'),
+                'timestamp': representative.get('timestamp')
+            })
         
-        return "\n\n".join(formatted_texts)
+        return collapsed
+
+    def _parse_timestamps(self, values):
+        """
+        Convert record timestamps to Unix seconds for recency ordering
+        
+        Args:
+            values: Raw timestamp values; numbers are taken as Unix seconds (or
+                milliseconds when too large), anything else is parsed as a date
+            
+        Returns:
+            List of floats, None where a value is missing or unparseable
+        """
+        parsed = [None] * len(values)
+        text_positions = []
+        for position, value in enumerate(values):
+            if value is None or (isinstance(value, float) and pd.isna(value)):
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                parsed[position] = value / 1000 if value > 1e11 else float(value)
+            else:
+                text_positions.append(position)
+        
+        if text_positions:
+            dates = pd.to_datetime(pd.Series([str(values[position]) for position in text_positions]),
+                                   errors='coerce', utc=True, format='mixed')
+            for position, date in zip(text_positions, dates):
+                if not pd.isna(date):
+                    parsed[position] = date.timestamp()
+        return parsed
+
+    def _format_names(self, names):
+        """Join a list of names, summarizing the tail beyond MAX_GROUP_NAMES"""
+        if len(names) <= self.MAX_GROUP_NAMES:
+            return ", ".join(names)
+        shown = ", ".join(names[:self.MAX_GROUP_NAMES])
+        remaining = len(names) - self.MAX_GROUP_NAMES
+        return f"{shown} and {remaining} other{'s' if remaining > 1 else ''}"
 
     def process_scout_query(self, data):
         """
         Process data with the Scout Agent
         
         Args:
-            data: Dict containing 'content', 'query', and 'process_id'
+            data: Dict containing 'content' (a list of records) or 'batches' (an iterable of
+                record batches), 'query', and 'process_id', and optionally 'known_issue_types'
+                already tracked on the ticket being appended to and an 'on_issue' callable
+                receiving each issue type as soon as it is streamed. Only single-prompt runs
+                stream; when the feedback is sharded nothing is passed to on_issue, as each
+                shard's issues are partial until merged, and the caller gets them all in the
+                result
             
         Returns:
             Dict containing scout analysis results
         """
         self.emit_log("Starting Scout Agent analysis...")
         
-        content = data.get('content', [])
         query = data.get('query', 'What are the key issues and actionable insights from this feedback?')
         process_id = data.get('process_id', str(uuid.uuid4()))
         company_id = data.get('company_id', 'default_company')
+        on_issue = data.get('on_issue')
+        batches = data.get('batches')
+        if batches is None:
+            content = data.get('content', [])
+            batches = [content]
         
-        if not content:
+        # Analyze the structure of records and extract metadata, one batch at a time
+        metadata, feedback_items, record_count = self.scan_records(batches, company_id)
+        
+        if not record_count:
             self.emit_log("⚠️ No content provided for analysis")
             return {'error': 'No content provided for analysis'}
         
-        # Analyze the structure of records and extract metadata
-        record_count = len(content)
-        metadata = self.extract_metadata(content)
+        metadata['known_issue_types'] = data.get('known_issue_types') or []
         self.emit_log(f"Analyzing {record_count} feedback records...")
+        build_start = time.time()
+        
+        # Collapse duplicates so each distinct complaint is sent once with its count
+        collapsed_feedback = self.collapse_duplicates(feedback_items)
+        if len(collapsed_feedback) < len(feedback_items):
+            self.emit_log(f"Collapsed {len(feedback_items)} feedback items into {len(collapsed_feedback)} distinct items")
         
-        # Build user and location maps
+        # Build user, location and count maps for the representatives
+        all_feedback = []
         user_feedback_map = {}
         location_feedback_map = {}
+        count_feedback_map = {}
+        for item in collapsed_feedback:
+            all_feedback.append(item['text'])
+            if item['users']:
+                user_feedback_map[item['text']] = self._format_names(item['users'])
+            if item['locations']:
+                location_feedback_map[item['text']] = self._format_names(item['locations'])
+            count_feedback_map[item['text']] = item['count']
+        metadata['distinct_feedback'] = len(all_feedback)
         
-        # Extract all text for analysis
-        all_feedback = []
-        for record in content:
-            feedback_text = None
-            username = None
-            location = None
-            
-            # Try to get username
-            for user_field in ["user", "username", "user_id", "customer", "customer_id", "name", "email"]:
-                if user_field in record and record[user_field]:
-                    username = str(record[user_field])
-                    break
-            
-            # Try to get location
-            for location_field in ["location", "country", "city", "region", "address"]:
-                if location_field in record and record[location_field]:
-                    location = str(record[location_field])
-                    break
-            
-            # For text-based records
-            if 'text' in record:
-                feedback_text = record['text']
-            # For email records
-            elif 'message' in record:
-                feedback_text = record['message']
-            # Check common feedback field names
+        # Format all feedback (no sampling, just whitespace cleaning)
+        self.emit_log(f"Formatting {len(all_feedback)} feedback items...")
+        entries = self.format_feedback_entries(all_feedback, user_feedback_map, location_feedback_map, count_feedback_map)
+        
+        # Fill at most max_shards prompts, each within the token limit once its instructions are
+        # counted, choosing entries by the packing policy
+        feedback_budget = self.shard_token_limit - self.prompt_overhead_tokens(query, record_count, metadata, len(entries))
+        if feedback_budget <= 0:
+            self.emit_log("⚠️ Scout prompt instructions alone exceed the shard token limit")
+            return {'error': 'Scout prompt instructions exceed the shard token limit',
+                    'process_id': process_id, 'company_id': company_id}
+        timestamps = self._parse_timestamps([item['timestamp'] for item in collapsed_feedback])
+        packed = self.prompt_packer.pack_shards([
+            {'text': entry, 'category': item['category'], 'source': item['source'],
+             'location': item['locations'][0] if item['locations'] else None, 'timestamp': timestamp}
+            for entry, item, timestamp in zip(entries, collapsed_feedback, timestamps)
+        ], feedback_budget, self.max_shards)
+        if packed['dropped']:
+            if self.max_shards and len(packed['shards']) >= self.max_shards:
+                reason = f"cap of {self.max_shards} Scout prompts reached"
             else:
-                for field in ['feedback', 'content', 'description', 'comment', 'issue', 'complaint']:
-                    if field in record and record[field]:
-                        feedback_text = str(record[field])
-                        break
-                
-                # If no matching field, use all values concatenated
-                if not feedback_text:
-                    record_str = ' '.join(str(val) for val in record.values() if val)
-                    feedback_text = record_str
-            
-            # Clean and add the feedback
-            if feedback_text:
-                cleaned_text = self.clean_text(feedback_text)
-                all_feedback.append(cleaned_text)
+                reason = "entries larger than a whole prompt"
+            self.emit_log(f"⚠️ Left out {packed['dropped']} feedback items ({packed['dropped_tokens']} tokens), "
+                          f"{reason}, by {self.prompt_packer.policy} policy")
+        shards = packed['shards'] or [[]]
+        add_span('scout_prompt_build', build_start, records=record_count, distinct_feedback=len(collapsed_feedback),
+                 prompt_tokens=packed['used_tokens'], dropped_feedback=packed['dropped'], shards=len(shards))
+        
+        try:
+            if len(shards) == 1:
+                # Everything fits in one prompt
+                formatted_feedback = "\n\n".join(shards[0]) if shards[0] else "No feedback available for analysis."
+                scout_task = self.build_scout_task(query, record_count, metadata, formatted_feedback)
+                self.emit_log("Scout Agent is analyzing all feedback...")
+                parsed_result = self.run_scout_task(scout_task, company_id, stream_to=process_id, on_issue=on_issue)
+            else:
+                parsed_result = self.map_reduce_shards(shards, query, record_count, metadata, company_id)
                 
-                # Map feedback to username and location if available
-                if username:
-                    user_feedback_map[cleaned_text] = username
-                if location:
-                    location_feedback_map[cleaned_text] = location
+            # Add metadata to the result
+            final_result = {
+                'process_id': process_id,
+                'timestamp': int(time.time()),
+                'query': query,
+                'company_id': company_id,
+                'record_count': record_count,
+                'metadata': {
+                    'record_count': record_count,
+                    'avg_feedback_length': int(metadata["avg_length"]),
+                    'common_fields': metadata["common_fields"],
+                    'has_structured_data': metadata["has_structured_fields"],
+                    'suggested_tags': metadata.get("suggested_tags", []),
+                    'top_locations': [loc for loc, count in metadata.get("user_location", {}).most_common(3)],
+                    'distinct_feedback': metadata['distinct_feedback'],
+                    'shard_count': len(shards),
+                    'prompt_tokens': packed['used_tokens'],
+                    'dropped_feedback': packed['dropped'],
+                    'dropped_tokens': packed['dropped_tokens'],
+                    'packing_policy': self.prompt_packer.policy
+                },
+                'scout_analysis': parsed_result
+            }
+            
+            self.emit_log("Scout analysis complete")
+            return final_result
+            
+        except Exception as e:
+            self.emit_log(f"⚠️ Error in Scout analysis: {str(e)}")
+            return {
+                'error': f'Analysis failed: {str(e)}',
+                'process_id': process_id,
+                'company_id': company_id
+            }
+
+    def map_reduce_shards(self, shards, query, record_count, metadata, company_id=None):
+        """
+        Run a Scout task per feedback shard concurrently and merge the results
         
-        # Format all feedback (no sampling, just whitespace cleaning)
-        self.emit_log(f"Formatting {len(all_feedback)} feedback items...")
-        formatted_feedback = self.format_all_feedback(all_feedback, user_feedback_map, location_feedback_map)
+        Args:
+            shards: List of shards, each a list of formatted feedback entries
+            query: Query string for analysis
+            record_count: Total number of records being analyzed
+            metadata: Metadata extracted from the whole dataset
+            company_id: Company the analysis runs for, used to schedule the LLM calls
+            
+        Returns:
+            Merged scout analysis dict
+        """
+        shard_count = len(shards)
+        self.emit_log(f"Feedback exceeds a single prompt; analyzing {shard_count} shards with {self.max_workers} workers...")
+        
+        def analyze_shard(index):
+            shard = shards[index]
+            shard_info = self._shard_info(index + 1, shard_count, len(shard))
+            scout_task = self.build_scout_task(
+                query, record_count, metadata, "\n\n".join(shard),
+                shard_info=shard_info, agent=self._create_agent()
+            )
+            try:
+                parsed = self.run_scout_task(scout_task, company_id)
+            except Exception as e:
+                self.emit_log(f"⚠️ Error analyzing shard {index + 1}: {str(e)}")
+                parsed = {"error": f"Shard analysis failed: {str(e)}"}
+            else:
+                self.emit_log(f"Shard {index + 1} of {shard_count} analyzed")
+            return parsed, len(shard)
         
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            shard_results = list(executor.map(propagate(analyze_shard), range(shard_count)))
+        
+        # Merge only the shards that produced usable JSON
+        successful = [(parsed, size) for parsed, size in shard_results if 'error' not in parsed]
+        if not successful:
+            return shard_results[0][0]
+        if len(successful) < shard_count:
+            self.emit_log(f"⚠️ {shard_count - len(successful)} of {shard_count} shards failed and were skipped")
+        
+        self.emit_log("Merging shard analyses...")
+        return self.merge_scout_analyses(successful)
+
+    def build_scout_task(self, query, record_count, metadata, formatted_feedback, shard_info=None, agent=None):
+        """
+        Build the Scout task for a block of formatted feedback
+        
+        Args:
+            query: Query string for analysis
+            record_count: Total number of records being analyzed
+            metadata: Metadata extracted from the whole dataset
+            formatted_feedback: Formatted feedback text to include in the prompt
+            shard_info: Optional note describing which part of the data this is
+            agent: Agent to run the task, defaults to the shared agent
+            
+        Returns:
+            CrewAI Task
+        """
+        return Task(
+            description=self.build_scout_prompt(query, record_count, metadata, formatted_feedback, shard_info),
+            agent=agent or self.agent,
+            expected_output=self.EXPECTED_OUTPUT
+        )
+
+    def build_scout_prompt(self, query, record_count, metadata, formatted_feedback, shard_info=None):
+        """
+        Build the Scout task description for a block of formatted feedback
+        
+        Args:
+            query: Query string for analysis
+            record_count: Total number of records being analyzed
+            metadata: Metadata extracted from the whole dataset
+            formatted_feedback: Formatted feedback text to include in the prompt
+            shard_info: Optional note describing which part of the data this is
+            
+        Returns:
+            Prompt text
+        """
         # Create the scout task with enhanced prompt for tagging
         suggested_tags = ", ".join(metadata.get("suggested_tags", []))
-        scout_task = Task(
-            description=f"""
+        shard_note = f"\n            {shard_info}" if shard_info else ""
+        distinct = metadata.get("distinct_feedback", record_count)
+        dedup_note = ""
+        if distinct < record_count:
+            dedup_note = (f"\n            Duplicates were collapsed into {distinct} distinct items; "
+                          f"\"Reported N times\" shows how often each was received, so weigh priorities by it.")
+        known_issue_types = metadata.get("known_issue_types")
+        known_note = ""
+        if known_issue_types:
+            known_note = (f"\n            Issue types already tracked: {', '.join(known_issue_types)}. "
+                          f"Reuse these exact names for feedback about the same issues.")
+        return f"""
             Analyze all customer feedback to identify key patterns and insights.
             
             Query: "{query}"
             
             Context: {record_count} feedback records. Avg length: {int(metadata["avg_length"])} chars.
             {", ".join(metadata["common_fields"][:3])} are common fields.
-            Suggested tags based on content: {suggested_tags}
+            Suggested tags based on content: {suggested_tags}{dedup_note}{known_note}{shard_note}
             
             Complete Feedback Data:
             {formatted_feedback}
@@ -292,66 +846,131 @@ class ScoutAgent:
                 "overall_sentiment": "Positive/Negative/Neutral",
                 "summary": "Overall summary"
             }}
-            """,
-            agent=self.agent,
-            expected_output="Detailed analysis of user feedback in structured JSON format"
-        )
+            """
+
+    def run_scout_task(self, scout_task, company_id=None, stream_to=None, on_issue=None):
+        """
+        Execute a Scout task and parse the JSON from the LLM response
         
-        try:
-            # Execute the task
-            self.emit_log("Scout Agent is analyzing all feedback...")
+        With streaming enabled and a room to stream to, the response is
+        streamed to that Socket.IO room as it is generated and every
+        completed issue type is passed to on_issue right away.
+        
+        Args:
+            scout_task: CrewAI Task to execute
+            company_id: Company the task runs for, used to schedule the LLM call
+            stream_to: Optional Socket.IO room, the job ID, receiving the streamed output
+            on_issue: Optional callable receiving each streamed issue type dict
+            
+        Returns:
+            Parsed result dict, or a dict with an 'error' key
+        """
+        # Serve repeated prompts from the cache without calling the LLM
+        if self.cache:
+            cached = self.cache.get(self.model_name, scout_task.description)
+            if cached is not None:
+                self.emit_log("Using cached Scout analysis")
+                parsed = self.parse_json_result(cached)
+                if 'error' not in parsed:
+                    return parsed
+        
+        streamed = bool(stream_to) and self.stream_llm and litellm is not None
+        if streamed:
+            call = partial(self.stream_scout_task, scout_task, stream_to, on_issue)
+        else:
             crew = Crew(
-                agents=[self.agent],
+                agents=[scout_task.agent],
                 tasks=[scout_task],
                 process=Process.sequential,
                 verbose=True
             )
+            call = crew.kickoff
+        
+        # Run the analysis, waiting for a slot when a scheduler shares the LLM between companies
+        with span('scout_llm', prompt_chars=len(scout_task.description), streamed=streamed) as llm_span:
+            if self.scheduler:
+                result = self.scheduler.run(call, company_id=company_id, prompt=scout_task.description)
+            else:
+                result = call()
+            llm_span.set(response_chars=len(str(result)))
+        print("[scout_task_PROMPT]", scout_task.description)
+        
+        parsed = self.parse_json_result(str(result))
+        
+        # Only cache responses that parsed cleanly
+        if self.cache and 'error' not in parsed:
+            self.cache.set(self.model_name, scout_task.description, str(result))
+        
+        return parsed
+
+    def stream_scout_task(self, scout_task, room, on_issue=None):
+        """
+        Run a Scout task as a streamed completion
+        
+        Output is forwarded to the room in pieces at most every
+        STREAM_EMIT_INTERVAL seconds, and issue types are announced and
+        handed to on_issue as soon as their JSON object is complete.
+        
+        Args:
+            scout_task: CrewAI Task whose agent and prompt are sent
+            room: Socket.IO room receiving the output
+            on_issue: Optional callable receiving each completed issue type dict
             
-            # Run the analysis
-            result = crew.kickoff()
-            print("[scout_task_PROMPT]", scout_task.description)
+        Returns:
+            Full response text
+        """
+        agent = scout_task.agent
+        messages = [
+            {'role': 'system', 'content': f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"},
+            {'role': 'user', 'content': f"{scout_task.description}\n\nExpected output: {scout_task.expected_output}"}
+        ]
+        
+        parser = IssueStreamParser()
+        chunks = []
+        pending = []
+        last_emit = time.monotonic()
+        for chunk in litellm.completion(model=self.model_name, messages=messages, stream=True):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            chunks.append(delta)
+            pending.append(delta)
             
-            # Parse the JSON response
-            try:
-                # Extract JSON from the response if it's embedded
-                result_str = str(result)
-                json_start = result_str.find('{')
-                json_end = result_str.rfind('}') + 1
-                
-                if json_start >= 0 and json_end > json_start:
-                    json_str = result_str[json_start:json_end]
-                    parsed_result = json.loads(json_str)
-                else:
-                    parsed_result = {"error": "Could not extract JSON from response"}
-                    
-            except json.JSONDecodeError:
-                self.emit_log("⚠️ Error parsing JSON from LLM response")
-                parsed_result = {"error": "Invalid JSON format in response"}
-                
-            # Add metadata to the result
-            final_result = {
-                'process_id': process_id,
-                'timestamp': int(time.time()),
-                'query': query,
-                'company_id': company_id,
-                'record_count': record_count,
-                'metadata': {
-                    'avg_feedback_length': int(metadata["avg_length"]),
-                    'common_fields': metadata["common_fields"],
-                    'has_structured_data': metadata["has_structured_fields"],
-                    'suggested_tags': metadata.get("suggested_tags", []),
-                    'top_locations': [loc for loc, count in metadata.get("user_location", {}).most_common(3)]
-                },
-                'scout_analysis': parsed_result
-            }
+            issues = parser.feed(delta)
+            if pending and (issues or time.monotonic() - last_emit >= self.STREAM_EMIT_INTERVAL):
+                self.emit_stream("".join(pending), room)
+                pending = []
+                last_emit = time.monotonic()
+            for issue in issues:
+                self.emit_log(f"Identified issue: {issue.get('type', 'Unknown issue type')} "
+                              f"({issue.get('priority', 'Medium')} priority)")
+                if on_issue:
+                    on_issue(issue)
+        
+        if pending:
+            self.emit_stream("".join(pending), room)
+        return "".join(chunks)
+
+    def parse_json_result(self, result_str):
+        """
+        Parse the JSON object embedded in an LLM response
+        
+        Args:
+            result_str: Raw LLM response text
             
-            self.emit_log("Scout analysis complete")
-            return final_result
+        Returns:
+            Parsed result dict, or a dict with an 'error' key
+        """
+        try:
+            # Extract JSON from the response if it's embedded
+            json_start = result_str.find('{')
+            json_end = result_str.rfind('}') + 1
             
-        except Exception as e:
-            self.emit_log(f"⚠️ Error in Scout analysis: {str(e)}")
-            return {
-                'error': f'Analysis failed: {str(e)}',
-                'process_id': process_id,
-                'company_id': company_id
-            }
\ No newline at end of file
+            if json_start >= 0 and json_end > json_start:
+                json_str = result_str[json_start:json_end]
+                return json.loads(json_str)
+            return {"error": "Could not extract JSON from response"}
+                
+        except json.JSONDecodeError:
+            self.emit_log("⚠️ Error parsing JSON from LLM response")
+            return {"error": "Invalid JSON format in response"}
@@ -1,13 +1,16 @@
 from flask import request, jsonify, render_template, redirect, url_for
+from flask_socketio import join_room
 from werkzeug.utils import secure_filename
 import os
 import uuid
 from datetime import datetime
 
 # Custom modules
-from utils.file_processor import process_file
-from utils.app_config import app, socketio, logger, storage
-from utils.process_agents import process_with_agents
+from utils.app_config import app, socketio, logger, storage, job_manager, llm_cache, llm_scheduler, tracer
+from utils.process_agents import run_analysis_job
+from utils.job_queue import JobQueueFullError
+from utils.event_bus import company_room
+from utils.tracing import activate, span
 
 # =============================
 # Template Filters
@@ -31,6 +34,24 @@ def handle_connect():
 def handle_disconnect():
     logger.info('Client disconnected')
 
+@socketio.on('subscribe_job')
+def handle_subscribe_job(data):
+    """Join the room for a job and send its current state"""
+    job_id = (data or {}).get('job_id')
+    if not job_id:
+        return
+    join_room(job_id)
+    job = job_manager.get_job(job_id)
+    if job:
+        socketio.emit('job_update', job, to=request.sid)
+
+@socketio.on('subscribe_company')
+def handle_subscribe_company(data):
+    """Join the room receiving storage change events for a company"""
+    company_id = (data or {}).get('company_id')
+    if company_id:
+        join_room(company_room(company_id))
+
 # =============================
 # Routes
 # =============================
@@ -51,20 +72,24 @@ def dashboard(company_id):
     if not result['success']:
         return render_template('error.html', message=result['error'])
     
-    analyses = result['data']
-    status_counts = {'new': 0, 'processing': 0, 'resolved': 0, 'failed': 0}
+    # Header statistics come from one aggregation rather than the ticket list
+    stats_result = storage.get_dashboard_stats(company_id)
+    if not stats_result['success']:
+        return render_template('error.html', message=stats_result['error'])
     
-    for analysis in analyses:
-        status = analysis.get('status', 'new')
+    stats = stats_result['data']
+    status_counts = {'new': 0, 'processing': 0, 'resolved': 0, 'failed': 0}
+    for status, count in stats['status_counts'].items():
         if status in status_counts:
-            status_counts[status] += 1
+            status_counts[status] = count
     
     return render_template(
         'dashboard.html',
         company_name=company_id.replace('_', ' ').title(),
         company_id=company_id,
-        analyses=analyses,
-        status_counts=status_counts
+        analyses=result['data'],
+        status_counts=status_counts,
+        stats=stats
     )
 
 # =============================
@@ -72,7 +97,7 @@ def dashboard(company_id):
 # =============================
 @app.route('/api/analyze', methods=['POST'])
 def analyze_feedback():
-    """Endpoint to analyze uploaded file"""
+    """Endpoint to queue analysis of an uploaded file; a ticket_id appends its records to that ticket"""
     # Check if file exists in request
     if 'file' not in request.files:
         return jsonify({'error': 'No file part'}), 400
@@ -85,50 +110,98 @@ def analyze_feedback():
     company_id = request.form.get('company_id', 'default_company')
     query = request.form.get('query', 'What are the key issues and actionable insights from this feedback?')
     save_analysis = request.form.get('save_analysis', 'true').lower() == 'true'
+    ticket_id = request.form.get('ticket_id') or None
     
-    # Generate process ID
+    # Generate process ID, which is also used as the job ID
     process_id = str(uuid.uuid4())
     
     try:
-        # Step 1: Upload and process the file
-        socketio.emit('status', {'message': 'Processing file...'})
-        
-        # Save file temporarily
-        filename = secure_filename(file.filename)
+        # Save file temporarily; prefix with the process ID so concurrent uploads don't collide
+        filename = f"{process_id}_{secure_filename(file.filename)}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(file_path)
+        trace = tracer.start_trace(process_id, company_id=company_id)
+        with activate(trace), span('upload_save') as upload_span:
+            file.save(file_path)
+            upload_span.set(bytes=os.path.getsize(file_path))
+        
+        # Queue the pipeline; the worker removes the file and finishes the trace when the job ends
+        job = job_manager.submit(
+            run_analysis_job, file_path, query, process_id, company_id, save_analysis, ticket_id, trace,
+            job_id=process_id, company_id=company_id
+        )
+        socketio.emit('status', {'message': 'File uploaded. Analysis queued...'})
         
-        # Process the file
-        content, file_type = process_file(file_path)
-        record_count = len(content) if isinstance(content, list) else 1
-        socketio.emit('status', {'message': f'File processed successfully. Found {record_count} records.'})
+        return jsonify({
+            'job_id': job['job_id'],
+            'process_id': process_id,
+            'state': job['state'],
+            'status_url': url_for('get_job', job_id=job['job_id'])
+        }), 202
         
-        # Clean up temporary file
+    except JobQueueFullError as e:
+        logger.warning(str(e))
         if os.path.exists(file_path):
             os.remove(file_path)
-            
-        # Process with agents and return results
-        return process_with_agents(content, query, process_id, company_id, save_analysis)
+        return jsonify({'error': 'Server is busy, please retry shortly'}), 503
         
     except Exception as e:
-        logger.error(f"Error processing and analyzing file: {str(e)}")
+        logger.error(f"Error queuing analysis: {str(e)}")
         socketio.emit('status', {'message': f'Error: {str(e)}'})
         # Clean up temporary file if it exists
         if 'file_path' in locals() and os.path.exists(file_path):
             os.remove(file_path)
         return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Fetch the state of an analysis job, with its result once finished"""
+    job = job_manager.get_job(job_id, include_result=True)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/stats')
+def get_stats():
+    """Report job queue, LLM cache, analysis cache and LLM scheduler counters"""
+    return jsonify({
+        'jobs': job_manager.get_stats(),
+        'llm_cache': llm_cache.stats() if llm_cache else None,
+        'analysis_cache': storage.cache_stats(),
+        'llm_scheduler': llm_scheduler.stats()
+    })
     
 # =============================
 # DB Endpoints
 # =============================
 @app.route('/db/analysis/<company_id>/<ticket_id>')
 def get_analysis(company_id, ticket_id):
-    """Fetch specific analysis record"""
-    result = storage.get_analysis(company_id, ticket_id)
+    """Fetch specific analysis record; ?full=true includes the raw Scout and Analyst output"""
+    full = request.args.get('full', 'false').lower() == 'true'
+    result = storage.get_analysis(company_id, ticket_id, full=full)
     if result['success']:
         return jsonify(result)
     return jsonify({'success': False, 'error': result['error']}), 404
 
+@app.route('/db/analyses/<company_id>')
+def list_analyses(company_id):
+    """Fetch a page of analysis summaries, newest first"""
+    limit = request.args.get('limit', 20, type=int)
+    cursor = request.args.get('cursor')
+
+    result = storage.list_analyses(company_id, limit=limit, cursor=cursor)
+    if result['success']:
+        return jsonify(result)
+    return jsonify({'success': False, 'error': result['error']}), 400
+
+@app.route('/db/stats/<company_id>')
+def get_dashboard_stats(company_id):
+    """Fetch dashboard statistics for a company"""
+    bucket = request.args.get('bucket', 'day')
+    result = storage.get_dashboard_stats(company_id, bucket=bucket)
+    if result['success']:
+        return jsonify(result)
+    return jsonify({'success': False, 'error': result['error']}), 400
+
 @app.route('/db/task/status', methods=['POST'])
 def update_task_status():
     """Update status of a specific task"""
@@ -149,12 +222,31 @@ def update_task_status():
         return jsonify(result)
     return jsonify({'success': False, 'error': result['error']}), 500
 
+@app.route('/db/tasks/status', methods=['POST'])
+def update_task_statuses():
+    """Update the status of many tasks, possibly across tickets, in one request"""
+    data = request.json
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    company_id = data.get('company_id')
+    changes = data.get('changes')
+    
+    if not company_id or not isinstance(changes, list) or not changes:
+        return jsonify({'error': 'Missing required parameters'}), 400
+    
+    result = storage.update_task_statuses(company_id, changes)
+    if 'error' in result:
+        return jsonify({'success': False, 'error': result['error']}), 500
+    return jsonify(result)
+
 # =============================
 # Error Handlers
 # =============================
 @app.errorhandler(413)
 def request_entity_too_large(error):
-    return jsonify({'error': 'File too large (max 16MB)'}), 413
+    max_mb = app.config['MAX_CONTENT_LENGTH'] // (1024 * 1024)
+    return jsonify({'error': f'File too large (max {max_mb}MB)'}), 413
 
 @app.errorhandler(500)
 def internal_server_error(error):
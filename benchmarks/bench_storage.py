@@ -0,0 +1,301 @@
+"""
+Benchmark the analysis storage backends
+
+Save paths of MongoDBStorage, on the same synthetic analyses:
+    find+write  the previous find_one followed by update_one/insert_one
+    upsert      save_analysis: ticket upsert, payload upsert and summary
+                replace, three round trips per analysis
+    bulk        save_analyses_bulk, one unordered bulk_write per collection
+                and batch
+
+Backend comparison: the same workload (save, ticket reads, dashboard
+listing, paging, single and batched task updates and stats) against MongoDBStorage and the
+embedded SQLiteStorage.
+
+Async reads: full ticket reads issued one after another, then --concurrency
+at a time through AsyncAnalysisStorage, which overlaps their round trips.
+
+By default an in-process mongomock client stands in for MongoDB and every
+call to the server sleeps for --latency-ms to model the network round trip
+it would cost. Pass --uri to run against a real server instead. mongomock
+does not implement the pipeline operators the task updates use, so those
+steps are skipped for the stand-in.
+
+Usage:
+    python benchmarks/bench_storage.py [--analyses 500] [--issues 8] [--batch 100]
+                                       [--latency-ms 1.0] [--concurrency 8] [--uri mongodb://...]
+"""
+import os
+import sys
+import copy
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+
+# Allow running from the project root without installing the package
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+import utils.mongodb_storage as mongodb_storage
+from utils.sqlite_storage import SQLiteStorage
+from utils.async_storage import AsyncAnalysisStorage
+
+
+def make_analysis(index, issue_count):
+    """Build a synthetic analysis shaped like the agents' output"""
+    issues = [{
+        'issue_type': f'Issue {i}',
+        'description': 'Users report the app freezes when uploading large files. ' * 3,
+        'responsible_team': 'Engineering',
+        'criticality': 'High',
+        'recommended_actions': ['Profile the upload path', 'Add a progress indicator'],
+        'resolution_strategy': 'Stream uploads and report progress.',
+        'sources': [f'user{j}: upload froze at 90%' for j in range(5)],
+        'tags': ['performance', 'bug'],
+        'timeline': 'immediate'
+    } for i in range(issue_count)]
+
+    return {
+        'process_id': str(uuid.uuid4()),
+        'query': f'What are the key issues? #{index}',
+        'scout_analysis': {'summary': 'Feedback summary. ' * 20, 'issue_types': issues},
+        'analyst_insights': {'team_assignments': issues, 'cross_team_recommendations': ['Improve uploads']},
+        'final_report': {'executive_summary': 'Executive summary. ' * 10, 'issues': issues},
+        'metadata': {'record_count': 500}
+    }
+
+
+class LatencyCollection:
+    """Collection proxy that sleeps before every server call to model a round trip"""
+    ROUND_TRIP_METHODS = {'find', 'find_one', 'insert_one', 'update_one', 'replace_one', 'bulk_write',
+                          'find_one_and_update', 'aggregate'}
+
+    def __init__(self, collection, latency):
+        self.collection = collection
+        self.latency = latency
+        self.round_trips = 0
+
+    def __getattr__(self, name):
+        attribute = getattr(self.collection, name)
+        if name not in self.ROUND_TRIP_METHODS:
+            return attribute
+
+        def call(*args, **kwargs):
+            self.round_trips += 1
+            time.sleep(self.latency)
+            return attribute(*args, **kwargs)
+        return call
+
+
+class LatencyDatabase:
+    """Database proxy handing out LatencyCollection wrappers"""
+    def __init__(self, db, latency):
+        self.db = db
+        self.collections = {}
+        self.latency = latency
+
+    def __getattr__(self, name):
+        return self[name]
+
+    def __getitem__(self, name):
+        if name not in self.collections:
+            self.collections[name] = LatencyCollection(self.db[name], self.latency)
+        return self.collections[name]
+
+    def round_trips(self):
+        return sum(collection.round_trips for collection in self.collections.values())
+
+
+def find_then_write(storage, analysis_data, company_id, ticket_id):
+    """Previous save path: look the ticket up, then update or insert it"""
+    document = storage._prepare_analysis(analysis_data, company_id, ticket_id)
+    collection = storage.db.companies_tickets
+    if collection.find_one({"ticket_id": ticket_id}):
+        collection.update_one({"ticket_id": ticket_id}, {"$set": document})
+    else:
+        collection.insert_one(document)
+    storage._save_summary(document)
+
+
+def reset(storage):
+    if isinstance(storage, SQLiteStorage):
+        reset_sqlite(storage)
+        return
+    storage.db.companies_tickets.delete_many({})
+    storage.db.ticket_summaries.delete_many({})
+    storage.db.analysis_payloads.delete_many({})
+
+
+def timed(label, count, func, db):
+    round_trips = db.round_trips() if isinstance(db, LatencyDatabase) else None
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    line = f"{label:>10}: {count / elapsed:,.0f} analyses/sec ({elapsed:.2f}s)"
+    if round_trips is not None:
+        line += f", {db.round_trips() - round_trips} round trips"
+    print(line)
+
+
+def run_workload(storage, analyses, company_id):
+    """Time each step of a dashboard-like workload; returns (step, ops/sec or None) pairs"""
+    ticket_ids = [f'ticket_{i}' for i in range(len(analyses))]
+    steps = [
+        ('save', lambda: [storage.save_analysis(copy.deepcopy(analysis), company_id, ticket_id)
+                          for analysis, ticket_id in zip(analyses, ticket_ids)], len(analyses)),
+        ('get_analysis', lambda: [storage.get_analysis(company_id, ticket_id) for ticket_id in ticket_ids],
+         len(ticket_ids)),
+        ('get_analysis_full', lambda: [storage.get_analysis(company_id, ticket_id, full=True)
+                                       for ticket_id in ticket_ids], len(ticket_ids)),
+        ('get_all_analyses', lambda: [storage.get_all_analyses(company_id) for _ in range(20)], 20),
+        ('list_analyses', lambda: list_all_pages(storage, company_id), None),
+        ('update_task_status', lambda: [storage.update_task_status(company_id, ticket_id, 0, 'resolved')
+                                        for ticket_id in ticket_ids], len(ticket_ids)),
+        ('update_task_statuses', lambda: [storage.update_task_statuses(company_id, [
+            {'ticket_id': ticket_id, 'task_index': 1, 'status': 'processing'} for ticket_id in ticket_ids[start:start + 30]
+        ]) for start in range(0, len(ticket_ids), 30)], len(ticket_ids)),
+        ('dashboard_stats', lambda: [storage.get_dashboard_stats(company_id) for _ in range(20)], 20),
+    ]
+
+    results = []
+    for name, func, count in steps:
+        start = time.perf_counter()
+        try:
+            outcome = func()
+        except NotImplementedError:
+            results.append((name, None))
+            continue
+        elapsed = time.perf_counter() - start
+        results.append((name, (count or outcome) / elapsed))
+    return results
+
+
+def list_all_pages(storage, company_id):
+    """Walk every page of list_analyses; returns the number of pages"""
+    pages, cursor = 0, None
+    while True:
+        result = storage.list_analyses(company_id, limit=50, cursor=cursor)
+        pages += 1
+        cursor = result.get('next_cursor')
+        if not cursor:
+            return pages
+
+
+def compare_backends(backends, analyses, company_id):
+    """Run the workload on every backend and print ops/sec side by side"""
+    columns = {}
+    for label, storage in backends:
+        reset(storage)
+        columns[label] = dict(run_workload(storage, analyses, company_id))
+        reset(storage)
+
+    labels = [label for label, _ in backends]
+    print(f"\n{'ops/sec':>20}" + ''.join(f"{label:>14}" for label in labels))
+    for step in columns[labels[0]]:
+        cells = []
+        for label in labels:
+            value = columns[label][step]
+            cells.append(f"{'n/a':>14}" if value is None else f"{value:>14,.0f}")
+        print(f"{step:>20}" + ''.join(cells))
+
+
+def compare_async_reads(storage, analyses, company_id, concurrency):
+    """Time full ticket reads issued sequentially and concurrently through AsyncAnalysisStorage"""
+    ticket_ids = [f'ticket_{i}' for i in range(len(analyses))]
+    reset(storage)
+    storage.save_analyses_bulk([
+        {'analysis': copy.deepcopy(analysis), 'company_id': company_id, 'ticket_id': ticket_id}
+        for analysis, ticket_id in zip(analyses, ticket_ids)
+    ])
+    async_storage = AsyncAnalysisStorage(storage, max_workers=concurrency)
+
+    async def read_all():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def read(ticket_id):
+            async with semaphore:
+                return await async_storage.get_analysis(company_id, ticket_id, full=True)
+        return await asyncio.gather(*(read(ticket_id) for ticket_id in ticket_ids))
+
+    def read_sequential():
+        for ticket_id in ticket_ids:
+            storage.get_analysis(company_id, ticket_id, full=True)
+
+    try:
+        print()
+        # Start both runs with a cold read cache so each does the same round trips
+        if storage.analysis_cache is not None:
+            storage.analysis_cache.clear()
+        timed('sequential', len(ticket_ids), read_sequential, storage.db)
+        if storage.analysis_cache is not None:
+            storage.analysis_cache.clear()
+        timed(f'async x{concurrency}', len(ticket_ids), lambda: asyncio.run(read_all()), storage.db)
+    finally:
+        async_storage.shutdown()
+        reset(storage)
+
+
+def reset_sqlite(storage):
+    with storage._transaction() as conn:
+        conn.execute("DELETE FROM companies_tickets")
+        conn.execute("DELETE FROM ticket_summaries")
+        conn.execute("DELETE FROM analysis_payloads")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--analyses', type=int, default=500, help='Number of analyses saved per method')
+    parser.add_argument('--issues', type=int, default=8, help='Issues per analysis')
+    parser.add_argument('--batch', type=int, default=100, help='Analyses per bulk_write')
+    parser.add_argument('--latency-ms', type=float, default=1.0, help='Simulated round trip for the mongomock stand-in')
+    parser.add_argument('--concurrency', type=int, default=8, help='Reads in flight for the async comparison')
+    parser.add_argument('--uri', help='MongoDB URI; defaults to an in-process mongomock client')
+    parser.add_argument('--db', default='kollab_bench', help='Database used for the benchmark')
+    args = parser.parse_args()
+
+    if not args.uri:
+        import mongomock
+        mongodb_storage.MongoClient = mongomock.MongoClient
+
+    storage = mongodb_storage.MongoDBStorage(connection_string=args.uri, database_name=args.db)
+    if not args.uri:
+        storage.db = LatencyDatabase(storage.db, args.latency_ms / 1000)
+    analyses = [make_analysis(i, args.issues) for i in range(args.analyses)]
+    company_id = 'bench_company'
+    backend = args.uri or f"mongomock with {args.latency_ms}ms simulated round trips"
+    print(f"{args.analyses} analyses with {args.issues} issues each, {backend}")
+
+    def run_find_then_write():
+        for i, analysis in enumerate(analyses):
+            find_then_write(storage, copy.deepcopy(analysis), company_id, f'ticket_{i}')
+
+    def run_upsert():
+        for i, analysis in enumerate(analyses):
+            storage.save_analysis(copy.deepcopy(analysis), company_id, f'ticket_{i}')
+
+    def run_bulk():
+        for start in range(0, len(analyses), args.batch):
+            storage.save_analyses_bulk([
+                {'analysis': copy.deepcopy(analysis), 'company_id': company_id, 'ticket_id': f'ticket_{start + i}'}
+                for i, analysis in enumerate(analyses[start:start + args.batch])
+            ])
+
+    try:
+        for label, func in (('find+write', run_find_then_write), ('upsert', run_upsert), ('bulk', run_bulk)):
+            reset(storage)
+            timed(label, args.analyses, func, storage.db)
+    finally:
+        reset(storage)
+
+    compare_async_reads(storage, analyses, company_id, args.concurrency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        sqlite_storage = SQLiteStorage(os.path.join(directory, 'bench.sqlite3'))
+        compare_backends([('mongodb', storage), ('sqlite', sqlite_storage)], analyses, company_id)
+        sqlite_storage.conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark TextPreprocessor throughput for the NLTK and regex tokenizer backends
+
+Builds feedback-like records from every string in the bundled test datasets,
+repeats them up to the requested record count and reports records/sec for
+each backend, plus how often the two backends produce identical output.
+
+Usage:
+    python benchmarks/bench_text_processor.py [--records 20000] [--repeat 3]
+"""
+import os
+import sys
+import time
+import argparse
+
+# Allow running from the project root without installing the package
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from utils.file_processor import iter_records
+from utils.text_processor import TextPreprocessor
+
+DATASET_DIR = os.path.join(project_root, 'test_datasets')
+
+
+def collect_strings(value, strings):
+    """Recursively collect non-trivial string leaves from parsed records"""
+    if isinstance(value, dict):
+        for item in value.values():
+            collect_strings(item, strings)
+    elif isinstance(value, list):
+        for item in value:
+            collect_strings(item, strings)
+    elif isinstance(value, str) and len(value.split()) > 2:
+        strings.append(value)
+
+
+def load_dataset_texts():
+    """Load feedback-like strings from every readable file in test_datasets"""
+    strings = []
+    for name in sorted(os.listdir(DATASET_DIR)):
+        path = os.path.join(DATASET_DIR, name)
+        try:
+            for record in iter_records(path):
+                collect_strings(record, strings)
+        except ValueError as e:
+            print(f"Skipping {name}: {e}")
+    return strings
+
+
+def run_backend(tokenizer, records, repeat):
+    """Return the best records/sec over several runs and the output of the last run"""
+    processor = TextPreprocessor(tokenizer=tokenizer)
+    best = 0.0
+    output = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = [record for batch in processor.batch_records(records)
+                  for record in processor.preprocess_batch(batch)]
+        elapsed = time.perf_counter() - start
+        best = max(best, len(records) / elapsed)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=20000, help='Number of records to preprocess')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per backend; the best is reported')
+    args = parser.parse_args()
+
+    texts = load_dataset_texts()
+    if not texts:
+        print("No text found in test_datasets")
+        return
+
+    records = [{'text': texts[i % len(texts)]} for i in range(args.records)]
+    print(f"{len(texts)} distinct texts from {DATASET_DIR}, {len(records)} records per run")
+
+    results = {}
+    for tokenizer in ('nltk', 'regex'):
+        try:
+            results[tokenizer] = run_backend(tokenizer, records, args.repeat)
+        except LookupError:
+            print(f"{tokenizer:>6}: skipped, NLTK tokenizer data is not installed")
+            continue
+        print(f"{tokenizer:>6}: {results[tokenizer][0]:,.0f} records/sec")
+
+    if len(results) == 2:
+        speedup = results['regex'][0] / results['nltk'][0]
+        same = sum(1 for a, b in zip(results['nltk'][1], results['regex'][1]) if a == b)
+        print(f"speedup: {speedup:.1f}x, identical output for {same / len(records):.1%} of records")
+
+
+if __name__ == '__main__':
+    main()
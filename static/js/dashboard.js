@@ -1,6 +1,5 @@
 document.addEventListener('DOMContentLoaded', function() {
     // DOM Elements - Dashboard
-    const ticketCards = document.querySelectorAll('.ticket-card');
     const statusFilter = document.getElementById('status-filter');
     const searchInput = document.getElementById('search-input');
     const ticketsContainer = document.querySelector('.tickets-container');
@@ -33,6 +32,9 @@ document.addEventListener('DOMContentLoaded', function() {
     let currentCompanyId = document.querySelector('.dashboard-header h2').textContent.trim().toLowerCase().replace(/\s+/g, '_');
     let currentTicketId = null;
     let currentAnalysisData = null;
+    let pendingStatusChanges = [];
+    let statusFlushTimer = null;
+    const STATUS_BATCH_DELAY_MS = 400;
     
     // Event Listeners
     
@@ -44,6 +46,8 @@ document.addEventListener('DOMContentLoaded', function() {
     function filterTickets() {
         const statusValue = statusFilter.value;
         const searchValue = searchInput.value.toLowerCase();
+        // Queried on each call since pushed updates can add cards
+        const ticketCards = ticketsContainer.querySelectorAll('.ticket-card');
         
         ticketCards.forEach(card => {
             const status = card.dataset.status;
@@ -85,13 +89,22 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Add click event to all ticket cards to show manage tasks panel
-    document.querySelectorAll('.spread-tasks-btn').forEach(btn => {
+    document.querySelectorAll('.spread-tasks-btn').forEach(bindManageTasksButton);
+    
+    function bindManageTasksButton(btn) {
         btn.addEventListener('click', function(e) {
             e.preventDefault();
             const ticketId = this.dataset.ticketId;
             showTaskDetails(ticketId);
         });
+    }
+    
+    // Live updates: storage changes for this company are pushed over Socket.IO
+    const socket = io();
+    socket.on('connect', () => {
+        socket.emit('subscribe_company', { company_id: currentCompanyId });
     });
+    socket.on('storage_event', handleStorageEvent);
     
     // Close task details panel
     closeTaskDetailsBtn.addEventListener('click', function() {
@@ -119,13 +132,25 @@ document.addEventListener('DOMContentLoaded', function() {
         modalDownloadBtn.addEventListener('click', function() {
             if (!currentAnalysisData) return;
             
-            const dataStr = "data:text/json;charset=utf-8," + encodeURIComponent(JSON.stringify(currentAnalysisData, null, 2));
-            const downloadAnchor = document.createElement('a');
-            downloadAnchor.setAttribute("href", dataStr);
-            downloadAnchor.setAttribute("download", `ticket-${currentTicketId}.json`);
-            document.body.appendChild(downloadAnchor);
-            downloadAnchor.click();
-            downloadAnchor.remove();
+            // The raw Scout and Analyst output is only loaded for downloads
+            fetch(`/db/analysis/${currentCompanyId}/${currentTicketId}?full=true`)
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success || !data.data) {
+                        throw new Error(data.error || 'Failed to load full analysis');
+                    }
+                    
+                    const dataStr = "data:text/json;charset=utf-8," + encodeURIComponent(JSON.stringify(data.data, null, 2));
+                    const downloadAnchor = document.createElement('a');
+                    downloadAnchor.setAttribute("href", dataStr);
+                    downloadAnchor.setAttribute("download", `ticket-${currentTicketId}.json`);
+                    document.body.appendChild(downloadAnchor);
+                    downloadAnchor.click();
+                    downloadAnchor.remove();
+                })
+                .catch(error => {
+                    alert(`Error downloading analysis: ${error.message}`);
+                });
         });
     }
     
@@ -399,62 +424,210 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // Update task status via API
+    // Queue a task status change; changes made in quick succession are sent together
     function updateTaskStatus(ticketId, taskIndex, newStatus) {
-        // Send status update request
-        fetch('/db/task/status', {
+        pendingStatusChanges.push({
+            ticket_id: ticketId,
+            task_index: taskIndex,
+            status: newStatus
+        });
+        
+        clearTimeout(statusFlushTimer);
+        statusFlushTimer = setTimeout(flushTaskStatusChanges, STATUS_BATCH_DELAY_MS);
+    }
+    
+    // Send all queued task status changes in one request
+    function flushTaskStatusChanges() {
+        const changes = pendingStatusChanges;
+        pendingStatusChanges = [];
+        if (changes.length === 0) return;
+        
+        fetch('/db/tasks/status', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
             body: JSON.stringify({
                 company_id: currentCompanyId,
-                ticket_id: ticketId,
-                task_index: taskIndex,
-                status: newStatus
+                changes: changes
             })
         })
         .then(response => response.json())
         .then(data => {
-            if (!data.success) {
+            if (!data.tickets) {
                 throw new Error(data.error || 'Failed to update task status');
             }
             
-            // Update the UI to reflect the change
-            const taskCard = document.querySelector(`.task-card[data-task-index="${taskIndex}"]`);
-            if (taskCard) {
-                // Remove old status class and add new one
-                taskCard.className = taskCard.className.replace(/status-\w+/, `status-${newStatus}`);
-            }
+            const failed = [];
+            data.tickets.forEach(ticket => {
+                const ticketChanges = changes.filter(change => change.ticket_id === ticket.ticket_id);
+                if (ticket.success) {
+                    applyTaskStatusChanges(ticket.ticket_id, ticketChanges, ticket.counts);
+                } else {
+                    failed.push(`${ticket.ticket_id}: ${ticket.error}`);
+                    resetTaskStatusSelects(ticketChanges);
+                }
+            });
             
-            // Update the status counts
-            if (data.counts) {
-                taskCountNew.textContent = data.counts.new || 0;
-                taskCountProcessing.textContent = data.counts.processing || 0;
-                taskCountResolved.textContent = data.counts.resolved || 0;
+            if (data.errors && data.errors.length > 0) {
+                failed.push(...data.errors.map(error => error.error));
+                resetTaskStatusSelects(data.errors.map(error => changes[error.index]));
             }
-            
-            // Also update the main dashboard ticket status indicators if available
-            const ticketCard = document.querySelector(`.ticket-card[data-ticket-id="${ticketId}"]`);
-            if (ticketCard && data.counts) {
-                const taskCountsEl = ticketCard.querySelector('.ticket-task-status');
-                if (taskCountsEl) {
-                    const newCount = taskCountsEl.querySelector('.task-count.new');
-                    const processingCount = taskCountsEl.querySelector('.task-count.processing');
-                    const resolvedCount = taskCountsEl.querySelector('.task-count.resolved');
-                    
-                    if (newCount) newCount.textContent = data.counts.new || 0;
-                    if (processingCount) processingCount.textContent = data.counts.processing || 0;
-                    if (resolvedCount) resolvedCount.textContent = data.counts.resolved || 0;
-                }
+            if (failed.length > 0) {
+                alert(`Error updating task status: ${failed.join('; ')}`);
             }
         })
         .catch(error => {
             alert(`Error updating task status: ${error.message}`);
-            // Reset the select to previous value
-            const select = document.querySelector(`.task-status-select[data-task-index="${taskIndex}"]`);
-            if (select) {
-                select.value = currentAnalysisData.final_report.issues[taskIndex].status || 'new';
+            resetTaskStatusSelects(changes);
+        });
+    }
+    
+    // Reflect applied status changes and the ticket's new counts in the UI
+    function applyTaskStatusChanges(ticketId, changes, counts) {
+        if (ticketId === currentTicketId) {
+            changes.forEach(change => {
+                // Remove old status class and add new one
+                const taskCard = document.querySelector(`.task-card[data-task-index="${change.task_index}"]`);
+                if (taskCard) {
+                    taskCard.className = taskCard.className.replace(/status-\w+/, `status-${change.status}`);
+                }
+                if (currentAnalysisData && currentAnalysisData.final_report.issues[change.task_index]) {
+                    currentAnalysisData.final_report.issues[change.task_index].status = change.status;
+                }
+            });
+            
+            // Update the status counts
+            if (counts) {
+                taskCountNew.textContent = counts.new || 0;
+                taskCountProcessing.textContent = counts.processing || 0;
+                taskCountResolved.textContent = counts.resolved || 0;
+            }
+        }
+        
+        // Also update the main dashboard ticket status indicators if available
+        updateTicketCard(ticketId, { task_status_counts: counts });
+    }
+    
+    // Apply a pushed storage change event to the dashboard
+    function handleStorageEvent(event) {
+        if (event.company_id !== currentCompanyId) return;
+        
+        if (event.type === 'ticket_saved') {
+            if (!document.querySelector(`.ticket-card[data-ticket-id="${event.ticket_id}"]`)) {
+                addTicketCard(event.summary);
+            }
+            updateTicketCard(event.ticket_id, event.summary);
+        } else if (event.type === 'ticket_updated') {
+            updateTicketCard(event.ticket_id, event);
+            // Task changes made elsewhere also update the open task panel
+            if (event.tasks && event.ticket_id === currentTicketId && currentAnalysisData) {
+                event.tasks.forEach(change => {
+                    const select = document.querySelector(`.task-status-select[data-task-index="${change.task_index}"]`);
+                    if (select) select.value = change.status;
+                });
+                applyTaskStatusChanges(event.ticket_id, event.tasks, event.task_status_counts);
+            }
+        }
+    }
+    
+    // Patch a ticket card's status and task counts, keeping the header totals in step
+    function updateTicketCard(ticketId, fields) {
+        const ticketCard = document.querySelector(`.ticket-card[data-ticket-id="${ticketId}"]`);
+        if (!ticketCard) return;
+        
+        if (fields.status && fields.status !== ticketCard.dataset.status) {
+            adjustStatCount(ticketCard.dataset.status, -1);
+            adjustStatCount(fields.status, 1);
+            ticketCard.dataset.status = fields.status;
+            
+            const statusEl = ticketCard.querySelector('.ticket-status');
+            statusEl.className = `ticket-status status-${fields.status}`;
+            statusEl.textContent = fields.status.charAt(0).toUpperCase() + fields.status.slice(1);
+        }
+        
+        const counts = fields.task_status_counts;
+        const taskCountsEl = ticketCard.querySelector('.ticket-task-status');
+        if (counts && taskCountsEl) {
+            const newCount = taskCountsEl.querySelector('.task-count.new');
+            const processingCount = taskCountsEl.querySelector('.task-count.processing');
+            const resolvedCount = taskCountsEl.querySelector('.task-count.resolved');
+            
+            if (newCount) newCount.textContent = counts.new || 0;
+            if (processingCount) processingCount.textContent = counts.processing || 0;
+            if (resolvedCount) resolvedCount.textContent = counts.resolved || 0;
+        }
+        
+        filterTickets();
+    }
+    
+    // Insert a card for a ticket saved after the page was rendered
+    function addTicketCard(summary) {
+        const counts = summary.task_status_counts || {};
+        const ticketCard = document.createElement('div');
+        ticketCard.className = 'ticket-card';
+        ticketCard.dataset.ticketId = summary.ticket_id;
+        ticketCard.innerHTML = `
+            <div class="ticket-header">
+                <span class="ticket-id"></span>
+                <span class="ticket-status"></span>
+            </div>
+            <div class="ticket-body">
+                <h4 class="ticket-title"></h4>
+                <p class="ticket-summary"></p>
+                <div class="ticket-meta">
+                    <span class="ticket-date"></span>
+                    <span class="ticket-issues">${summary.issue_count || 0} issues</span>
+                    <span class="ticket-task-status">
+                        <span class="task-count new">${counts.new || 0}</span>
+                        <span class="task-count processing">${counts.processing || 0}</span>
+                        <span class="task-count resolved">${counts.resolved || 0}</span>
+                    </span>
+                </div>
+            </div>
+            <div class="ticket-actions">
+                <button class="action-btn spread-tasks-btn">
+                    <i class="fas fa-tasks"></i> Manage Tasks
+                </button>
+            </div>
+        `;
+        
+        // User-provided text is set as text, never as HTML
+        const summaryText = summary.summary || '';
+        ticketCard.querySelector('.ticket-id').textContent = `Ticket #${summary.ticket_id.substring(0, 8)}`;
+        ticketCard.querySelector('.ticket-title').textContent = summary.query || '';
+        ticketCard.querySelector('.ticket-summary').textContent = summaryText.length > 150 ? `${summaryText.substring(0, 147)}...` : summaryText;
+        ticketCard.querySelector('.ticket-date').textContent = summary.created_at ? new Date(summary.created_at * 1000).toLocaleString() : 'Unknown date';
+        
+        const manageButton = ticketCard.querySelector('.spread-tasks-btn');
+        manageButton.dataset.ticketId = summary.ticket_id;
+        bindManageTasksButton(manageButton);
+        
+        const noTickets = ticketsContainer.querySelector('.no-tickets');
+        if (noTickets) noTickets.remove();
+        ticketsContainer.prepend(ticketCard);
+        adjustStatCount('total', 1);
+        
+        // Set through updateTicketCard so the header status totals count the new ticket
+        ticketCard.dataset.status = '';
+    }
+    
+    // Add delta to one of the header statistics
+    function adjustStatCount(name, delta) {
+        const statEl = document.getElementById(`stat-${name}`);
+        if (statEl) {
+            statEl.textContent = Math.max(0, (parseInt(statEl.textContent) || 0) + delta);
+        }
+    }
+    
+    // Reset the selects of rejected changes to the last saved value
+    function resetTaskStatusSelects(changes) {
+        changes.forEach(change => {
+            if (!change || change.ticket_id !== currentTicketId || !currentAnalysisData) return;
+            const select = document.querySelector(`.task-status-select[data-task-index="${change.task_index}"]`);
+            const issue = currentAnalysisData.final_report.issues[change.task_index];
+            if (select && issue) {
+                select.value = issue.status || 'new';
             }
         });
     }
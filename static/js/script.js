@@ -30,6 +30,9 @@ document.addEventListener('DOMContentLoaded', function() {
     // Variables
     let uploadedFile = null;
     let analysisResults = null;
+    let currentJobId = null;
+    let currentCompanyId = null;
+    let scoutStreamElement = null;
     let progressSteps = {
         'upload': { weight: 10, completed: false },
         'scout': { weight: 45, completed: false },
@@ -51,6 +54,11 @@ document.addEventListener('DOMContentLoaded', function() {
     });
     
     socket.on('scout_log', (data) => {
+        // Streamed Scout output arrives as deltas appended to one growing message
+        if (data.delta !== undefined) {
+            appendScoutStream(data.delta);
+            return;
+        }
         addStatusMessage(data.message, 'scout');
         updateProgress(data.message);
     });
@@ -60,6 +68,15 @@ document.addEventListener('DOMContentLoaded', function() {
         updateProgress(data.message);
     });
     
+    socket.on('job_update', (job) => {
+        if (!currentJobId || job.job_id !== currentJobId) return;
+        
+        if (job.state === 'completed' || job.state === 'failed') {
+            currentJobId = null;
+            fetchJobResult(job.job_id);
+        }
+    });
+    
     // Try to load company ID from localStorage
     if (localStorage.getItem('companyId')) {
         companyIdInput.value = localStorage.getItem('companyId');
@@ -126,6 +143,8 @@ document.addEventListener('DOMContentLoaded', function() {
         addStatusMessage('Uploading and analyzing data...', 'system');
         analyzeBtn.disabled = true;
         
+        currentCompanyId = companyId;
+        
         fetch('/api/analyze', {
             method: 'POST',
             body: formData
@@ -136,6 +155,31 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error(data.error);
             }
             
+            // The analysis runs as a background job; follow it over Socket.IO
+            currentJobId = data.job_id;
+            addStatusMessage(`Analysis queued (job ${data.job_id.substring(0, 8)})`, 'system');
+            socket.emit('subscribe_job', { job_id: data.job_id });
+        })
+        .catch(error => {
+            addStatusMessage(`Error: ${error.message}`, 'error');
+            analyzeBtn.disabled = false;
+        });
+    });
+    
+    // Fetch the result of a finished job and display it
+    function fetchJobResult(jobId) {
+        fetch(`/api/jobs/${jobId}`)
+        .then(response => response.json())
+        .then(job => {
+            if (job.error) {
+                throw new Error(job.error);
+            }
+            
+            const data = job.result || {};
+            if (data.error) {
+                throw new Error(data.error);
+            }
+            
             // Store results
             analysisResults = data;
             
@@ -152,7 +196,7 @@ document.addEventListener('DOMContentLoaded', function() {
             if (data.saved && data.ticket_id) {
                 savedNotification.style.display = 'block';
                 savedText.textContent = `Analysis saved as Ticket #${data.ticket_id}`;
-                viewDashboardLink.href = `/dashboard/${companyId}`;
+                viewDashboardLink.href = `/dashboard/${currentCompanyId}`;
             } else {
                 savedNotification.style.display = 'none';
             }
@@ -162,7 +206,7 @@ document.addEventListener('DOMContentLoaded', function() {
             addStatusMessage(`Error: ${error.message}`, 'error');
             analyzeBtn.disabled = false;
         });
-    });
+    }
     
     // Progress Bar Handling
     function resetProgress() {
@@ -202,7 +246,20 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Status Message Handling
+    function appendScoutStream(text) {
+        if (!scoutStreamElement) {
+            scoutStreamElement = document.createElement('div');
+            scoutStreamElement.className = 'message scout stream';
+            statusMessages.appendChild(scoutStreamElement);
+        }
+        scoutStreamElement.textContent += text;
+        statusMessages.scrollTop = statusMessages.scrollHeight;
+    }
+    
     function addStatusMessage(message, type = 'info') {
+        // Any other message ends the current stream block
+        scoutStreamElement = null;
+        
         const messageElement = document.createElement('div');
         messageElement.className = `message ${type}`;
         messageElement.textContent = message;
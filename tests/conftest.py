@@ -0,0 +1,16 @@
+import pytest
+
+from utils.prompt_packer import estimate_tokens
+
+
+class EstimatingCounter:
+    """Token counter using the offline estimate, so tests never load a tokenizer"""
+    exact = False
+
+    def count(self, text):
+        return estimate_tokens(text)
+
+
+@pytest.fixture
+def token_counter():
+    return EstimatingCounter()
@@ -0,0 +1,97 @@
+import asyncio
+import inspect
+
+import mongomock
+import pytest
+
+import utils.mongodb_storage as mongodb_storage
+from utils.async_storage import AsyncAnalysisStorage
+from utils.event_bus import EventBus
+from utils.mongodb_storage import MongoDBStorage
+from utils.sqlite_storage import SQLiteStorage
+from utils.storage import AnalysisStorage
+
+
+def analysis(issue_count):
+    return {
+        'query': 'What breaks?',
+        'final_report': {
+            'executive_summary': 'Summary',
+            'issues': [{'issue_type': f'Issue {index}', 'tags': ['bug']} for index in range(issue_count)]
+        },
+        'scout_analysis': {'raw': 'scout output'}
+    }
+
+
+@pytest.fixture(params=['mongomock', 'sqlite'])
+def async_storage(request, monkeypatch, tmp_path):
+    if request.param == 'mongomock':
+        monkeypatch.setattr(mongodb_storage, 'MongoClient', mongomock.MongoClient)
+        storage = MongoDBStorage('mongodb://localhost:27017/', 'kollab_test')
+    else:
+        storage = SQLiteStorage(str(tmp_path / 'kollab.sqlite3'))
+    wrapper = AsyncAnalysisStorage(storage, max_workers=4)
+    yield wrapper
+    wrapper.shutdown()
+
+
+def test_exposes_the_storage_method_set():
+    public = {name for name, _ in inspect.getmembers(AnalysisStorage, inspect.isfunction) if not name.startswith('_')}
+    assert public <= {name for name in dir(AsyncAnalysisStorage) if not name.startswith('_')}
+
+
+def test_round_trip(async_storage):
+    async def scenario():
+        saved = await asyncio.gather(*(
+            async_storage.save_analysis(analysis(2), 'acme', f'T{index}') for index in range(5)
+        ))
+        assert all(result['success'] for result in saved)
+        bulk = await async_storage.save_analyses_bulk([{'analysis': analysis(1), 'company_id': 'acme', 'ticket_id': 'B1'}])
+        assert bulk['saved'] == 1
+
+        reads = await asyncio.gather(*(async_storage.get_analysis('acme', f'T{index}') for index in range(5)))
+        assert [read['data']['ticket_id'] for read in reads] == [f'T{index}' for index in range(5)]
+        full = await async_storage.get_analysis('acme', 'T0', full=True)
+        assert full['data']['scout_analysis'] == {'raw': 'scout output'}
+
+        assert len((await async_storage.get_all_analyses('acme'))['data']) == 6
+        page = await async_storage.list_analyses('acme', limit=4)
+        assert len(page['data']) == 4 and page['next_cursor']
+
+        assert (await async_storage.update_analysis_status('acme', 'B1', 'failed'))['success']
+        assert (await async_storage.rebuild_summaries('acme')) == 6
+        stats = await async_storage.get_dashboard_stats('acme')
+        assert stats['data']['total_tickets'] == 6
+        assert stats['data']['tag_counts'] == {'bug': 11}
+        assert async_storage.cache_stats() is not None
+
+    asyncio.run(scenario())
+
+
+def test_task_updates_on_sqlite(tmp_path):
+    # mongomock cannot evaluate the pipeline updates, so these run on SQLite only
+    async_storage = AsyncAnalysisStorage(SQLiteStorage(str(tmp_path / 'kollab.sqlite3')))
+
+    async def scenario():
+        await async_storage.save_analysis(analysis(3), 'acme', 'T1')
+        single = await async_storage.update_task_status('acme', 'T1', 0, 'resolved')
+        assert single['counts'] == {'new': 2, 'processing': 0, 'resolved': 1}
+        bulk = await async_storage.update_task_statuses('acme', [
+            {'ticket_id': 'T1', 'task_index': 1, 'status': 'resolved'},
+            {'ticket_id': 'T1', 'task_index': 2, 'status': 'resolved'},
+        ])
+        assert bulk['tickets'][0]['overall_status'] == 'resolved'
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        async_storage.shutdown()
+
+
+def test_start_change_stream_delegates(tmp_path):
+    # SQLite has no change feed; mongomock does not implement watch
+    async_storage = AsyncAnalysisStorage(SQLiteStorage(str(tmp_path / 'kollab.sqlite3')))
+    try:
+        assert async_storage.start_change_stream(EventBus()) is False
+    finally:
+        async_storage.shutdown()
@@ -0,0 +1,85 @@
+import os
+
+import utils.cache as cache
+from utils.cache import LRUCache, LLMResultCache
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set('a', 1)
+    lru.set('b', 2)
+    assert lru.get('a') == 1
+    lru.set('c', 3)
+
+    assert lru.get('b') is None
+    assert (lru.get('a'), lru.get('c')) == (1, 3)
+    stats = lru.stats()
+    assert (stats['entries'], stats['evictions'], stats['hits'], stats['misses']) == (2, 1, 3, 1)
+
+
+def test_lru_entries_expire(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    lru = LRUCache(ttl_seconds=10)
+    lru.set('a', 1)
+
+    clock.now += 10
+    assert lru.get('a') == 1
+    clock.now += 1
+    assert lru.get('a', 'gone') == 'gone'
+    assert lru.stats()['entries'] == 0
+
+
+def test_lru_delete_and_clear():
+    lru = LRUCache()
+    lru.set('a', 1)
+    lru.set('b', 2)
+    lru.delete('a')
+    lru.delete('missing')
+    assert lru.get('a') is None
+    lru.clear()
+    assert lru.stats()['entries'] == 0
+
+
+def test_llm_key_depends_on_model_and_description():
+    key = LLMResultCache.make_key('gpt-4o', 'prompt')
+    assert key == LLMResultCache.make_key('gpt-4o', 'prompt')
+    assert key != LLMResultCache.make_key('gpt-4o-mini', 'prompt')
+    assert key != LLMResultCache.make_key('gpt-4o', 'prompt ')
+
+
+def test_llm_cache_survives_restart_through_disk(tmp_path):
+    LLMResultCache(cache_dir=str(tmp_path)).set('gpt-4o', 'prompt', '{"ok": true}')
+
+    restarted = LLMResultCache(cache_dir=str(tmp_path))
+    assert restarted.get('gpt-4o', 'prompt') == '{"ok": true}'
+    assert restarted.get('gpt-4o', 'prompt') == '{"ok": true}'
+    assert restarted.get('gpt-4o', 'other') is None
+    stats = restarted.stats()
+    assert (stats['hits'], stats['misses'], stats['disk_hits']) == (2, 1, 1)
+
+
+def test_llm_cache_drops_expired_disk_entries(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache, 'time', clock)
+    LLMResultCache(ttl_seconds=60, cache_dir=str(tmp_path)).set('gpt-4o', 'prompt', 'value')
+
+    clock.now += 61
+    assert LLMResultCache(ttl_seconds=60, cache_dir=str(tmp_path)).get('gpt-4o', 'prompt') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_llm_cache_limits_disk_entries(tmp_path):
+    llm_cache = LLMResultCache(cache_dir=str(tmp_path), max_disk_entries=3)
+    for index in range(5):
+        llm_cache.set('gpt-4o', f'prompt {index}', 'value')
+
+    assert len(os.listdir(tmp_path)) == 3
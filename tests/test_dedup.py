@@ -0,0 +1,39 @@
+import pytest
+
+from utils.dedup import NearDuplicateDetector
+
+
+@pytest.fixture
+def detector():
+    return NearDuplicateDetector(threshold=0.8)
+
+
+def test_exact_duplicates_after_normalization(detector):
+    texts = ['App crashes on login!', 'app crashes on LOGIN', 'Battery drains overnight']
+    assert detector.group(texts) == [[0, 1], [2]]
+
+
+def test_near_duplicates_grouped(detector):
+    base = 'the mobile app crashes every time i try to upload a photo from my gallery on android'
+    texts = [base, base + ' phone', 'please add a dark mode to the settings screen']
+    assert detector.group(texts) == [[0, 1], [2]]
+
+
+def test_distinct_texts_stay_separate(detector):
+    texts = ['login fails with error 500', 'checkout button does nothing', 'search results are slow']
+    assert detector.group(texts) == [[0], [1], [2]]
+
+
+def test_texts_without_words_are_not_collapsed(detector):
+    texts = ['!!!', '😡😡', '???', 'Sync is broken', 'sync is broken']
+    assert detector.group(texts) == [[0], [1], [2], [3, 4]]
+
+
+def test_groups_ordered_by_first_occurrence(detector):
+    texts = ['b issue', 'a issue', 'B issue', 'a ISSUE']
+    assert detector.group(texts) == [[0, 2], [1, 3]]
+
+
+def test_num_perm_must_divide_into_bands():
+    with pytest.raises(ValueError):
+        NearDuplicateDetector(num_perm=64, bands=10)
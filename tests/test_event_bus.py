@@ -0,0 +1,51 @@
+from utils.event_bus import EventBus, STORAGE_EVENT, socketio_relay
+from utils.sqlite_storage import SQLiteStorage
+
+
+class FakeSocket:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+def test_failing_handler_does_not_stop_delivery():
+    bus = EventBus()
+    received = []
+
+    def explode(event):
+        raise RuntimeError('handler bug')
+
+    bus.subscribe(explode)
+    unsubscribe = bus.subscribe(received.append)
+    bus.publish({'type': 'ticket_saved', 'company_id': 'acme', 'ticket_id': 'T1'})
+    unsubscribe()
+    bus.publish({'type': 'ticket_saved', 'company_id': 'acme', 'ticket_id': 'T2'})
+
+    assert [event['ticket_id'] for event in received] == ['T1']
+
+
+def test_relay_emits_to_company_room():
+    socket = FakeSocket()
+    socketio_relay(socket)({'type': 'ticket_updated', 'company_id': 'acme', 'ticket_id': 'T1'})
+
+    assert socket.emitted == [(STORAGE_EVENT, {'type': 'ticket_updated', 'company_id': 'acme', 'ticket_id': 'T1'},
+                               'company:acme')]
+
+
+def test_storage_publishes_saves_and_task_updates(tmp_path):
+    bus = EventBus()
+    events = []
+    bus.subscribe(events.append)
+    storage = SQLiteStorage(str(tmp_path / 'kollab.sqlite3'), event_bus=bus)
+
+    storage.save_analysis({'query': 'q', 'final_report': {'issues': [{}, {}]}}, 'acme', 'T1')
+    storage.update_task_status('acme', 'T1', 1, 'resolved')
+    storage.update_task_status('acme', 'T1', 7, 'resolved')
+
+    assert [event['type'] for event in events] == ['ticket_saved', 'ticket_updated']
+    assert events[0]['summary']['issue_count'] == 2
+    assert events[1]['tasks'] == [{'task_index': 1, 'status': 'resolved'}]
+    assert events[1]['task_status_counts'] == {'new': 1, 'processing': 0, 'resolved': 1}
+    assert events[1]['status'] == 'processing'
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+import utils.file_processor as file_processor
+from utils.file_processor import iter_records, iter_json_records, process_file
+
+RECORDS = [
+    {'text': 'App crashes on login', 'rating': 1, 'nested': {'list': [1, 2, {'x': '}]'}]}},
+    {'text': 'Great support, "fast" reply', 'rating': 5},
+    {'text': 'Slow sync', 'rating': 12345678901234},
+]
+
+
+@pytest.fixture(params=[4, 64 * 1024])
+def read_size(request, monkeypatch):
+    # Small reads force values to straddle read boundaries
+    monkeypatch.setattr(file_processor, 'JSON_READ_SIZE', request.param)
+    return request.param
+
+
+def write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('content', [
+    json.dumps(RECORDS),
+    json.dumps(RECORDS, indent=2),
+    '\n'.join(json.dumps(record) for record in RECORDS),
+    ''.join(json.dumps(record) for record in RECORDS),
+])
+def test_json_layouts_stream_the_same_records(tmp_path, read_size, content):
+    assert list(iter_json_records(write(tmp_path, 'feedback.json', content))) == RECORDS
+
+
+def test_json_top_level_scalars_and_objects(tmp_path, read_size):
+    assert list(iter_json_records(write(tmp_path, 'one.json', json.dumps(RECORDS[0])))) == [RECORDS[0]]
+    assert list(iter_json_records(write(tmp_path, 'numbers.json', '[1, 22, 333]'))) == [1, 22, 333]
+    assert list(iter_json_records(write(tmp_path, 'empty.json', '[]'))) == []
+
+
+@pytest.mark.parametrize('content', ['[{"text": "a"}, {"text": "b"}', '[{"text": "a"}, {"text": '])
+def test_json_truncated_file_raises(tmp_path, read_size, content):
+    with pytest.raises(ValueError):
+        list(iter_records(write(tmp_path, 'broken.json', content)))
+
+
+def test_json_stream_matches_whole_file_parse(tmp_path, read_size):
+    path = write(tmp_path, 'feedback.json', json.dumps(RECORDS))
+    assert list(iter_records(path)) == process_file(path)[0]
+
+
+def test_ndjson_skips_blank_lines(tmp_path):
+    content = '\n'.join(json.dumps(record) for record in RECORDS[:2]) + '\n\n'
+    assert list(iter_records(write(tmp_path, 'feedback.jsonl', content))) == RECORDS[:2]
+
+
+def test_csv_streams_in_chunks(tmp_path):
+    rows = ''.join(f'{index},Feedback {index}\n' for index in range(5))
+    path = write(tmp_path, 'feedback.csv', 'id,text\n' + rows)
+
+    records = list(iter_records(path, chunk_size=2))
+    assert records == [{'id': index, 'text': f'Feedback {index}'} for index in range(5)]
+    assert records == process_file(path)[0]
+
+
+def test_text_file_is_one_record_by_default(tmp_path):
+    content = 'First complaint\n\nSecond line of the same letter\n'
+    path = write(tmp_path, 'letter.txt', content)
+
+    assert list(iter_records(path)) == [{'text': content}]
+    assert list(iter_records(path)) == process_file(path)[0]
+
+
+def test_text_lines_split_when_requested(tmp_path):
+    path = write(tmp_path, 'feedback.txt', ' First complaint \n\nSecond complaint\n')
+
+    assert list(iter_records(path, split_text_lines=True)) == [
+        {'text': 'First complaint'},
+        {'text': 'Second complaint'},
+    ]
+
+
+def test_csv_like_text_is_parsed_as_rows(tmp_path):
+    path = write(tmp_path, 'feedback.txt', 'id,text\n1,Slow\n2,Crash\nbad row\n')
+
+    assert list(iter_records(path)) == [{'id': '1', 'text': 'Slow'}, {'id': '2', 'text': 'Crash'}]
+
+
+def test_unsupported_format_raises(tmp_path):
+    with pytest.raises(ValueError, match='Unsupported file format'):
+        list(iter_records(write(tmp_path, 'feedback.pdf', 'data')))
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import JobManager, JobQueueFullError, JOB_COMPLETED, JOB_FAILED, JOB_RUNNING
+
+
+class FakeSocket:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event, data, to=None):
+        self.events.append((event, data['state'], to))
+
+
+def wait_finished(manager, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get_job(job_id, include_result=True)
+        if job['state'] in (JOB_COMPLETED, JOB_FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+
+def test_job_result_available_after_completion():
+    socket = FakeSocket()
+    manager = JobManager(socket, max_workers=1)
+
+    job = manager.submit(lambda value: {'answer': value}, 42, job_id='job-1', company_id='acme')
+    assert job['job_id'] == 'job-1'
+    assert 'result' not in job
+
+    finished = wait_finished(manager, 'job-1')
+    assert finished['state'] == JOB_COMPLETED
+    assert finished['result'] == {'answer': 42}
+    assert finished['company_id'] == 'acme'
+    assert [state for _, state, _ in socket.events][-1] == JOB_COMPLETED
+    assert all(room == 'job-1' for _, _, room in socket.events)
+
+
+def test_error_results_and_exceptions_fail_the_job():
+    manager = JobManager(max_workers=1)
+
+    def explode():
+        raise RuntimeError('boom')
+
+    manager.submit(lambda: {'error': 'no records'}, job_id='error-dict')
+    manager.submit(explode, job_id='raises')
+
+    assert wait_finished(manager, 'error-dict')['error'] == 'no records'
+    failed = wait_finished(manager, 'raises')
+    assert failed['state'] == JOB_FAILED
+    assert failed['error'] == 'boom'
+
+
+def test_full_queue_rejects_jobs():
+    manager = JobManager(max_workers=1, max_pending=2)
+    release = threading.Event()
+    manager.submit(release.wait, job_id='a')
+    manager.submit(release.wait, job_id='b')
+
+    with pytest.raises(JobQueueFullError):
+        manager.submit(release.wait, job_id='c')
+    assert manager.get_stats()['jobs']['queued'] + manager.get_stats()['jobs']['running'] == 2
+
+    release.set()
+    wait_finished(manager, 'a')
+    wait_finished(manager, 'b')
+    manager.submit(lambda: None, job_id='c')
+    assert wait_finished(manager, 'c')['state'] == JOB_COMPLETED
+
+
+def test_finished_jobs_pruned_after_retention():
+    manager = JobManager(max_workers=1, retention_seconds=0)
+    manager.submit(lambda: None, job_id='old')
+    wait_finished(manager, 'old')
+    time.sleep(0.01)
+
+    manager.submit(lambda: None, job_id='new')
+    assert manager.get_job('old') is None
+    assert manager.get_job('unknown') is None
+
+
+def test_set_message_updates_progress():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+    manager.submit(release.wait, job_id='a')
+    while manager.get_job('a')['state'] != JOB_RUNNING:
+        time.sleep(0.01)
+
+    manager.set_message('a', 'Scout done')
+    assert manager.get_job('a')['message'] == 'Scout done'
+    release.set()
+    wait_finished(manager, 'a')
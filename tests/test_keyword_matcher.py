@@ -0,0 +1,82 @@
+import json
+from collections import Counter
+
+import pytest
+
+import utils.keyword_matcher as keyword_matcher
+from utils.keyword_matcher import KeywordMatcher, KeywordMatcherRegistry, load_company_dictionaries
+
+DICTIONARIES = {
+    'tags': {
+        'bug': ['bug', 'crash', 'not working'],
+        'performance': ['slow', 'lag'],
+        'billing': ['bill', 'payment'],
+    },
+    'teams': {
+        'Engineering': ['engineering'],
+        'Customer Success': ['customer success'],
+    }
+}
+
+
+@pytest.fixture(params=['automaton', 'find'])
+def make_matcher(request, monkeypatch):
+    if request.param == 'automaton' and keyword_matcher.ahocorasick is None:
+        pytest.skip("pyahocorasick not installed")
+    if request.param == 'find':
+        monkeypatch.setattr(keyword_matcher, 'ahocorasick', None)
+    return lambda **kwargs: KeywordMatcher(DICTIONARIES, **kwargs)
+
+
+def test_find_reports_labels_in_dictionary_order(make_matcher):
+    matcher = make_matcher()
+
+    found = matcher.find("The app is SLOW and then it crashes; ask Customer Success")
+    assert found == {'tags': ['bug', 'performance'], 'teams': ['Customer Success']}
+    assert matcher.find("Engineering should fix it", groups={'teams'}) == {'teams': ['Engineering']}
+
+
+def test_word_boundary(make_matcher):
+    assert make_matcher().find("Flagging the billboard")['tags'] == ['performance', 'billing']
+    assert make_matcher(word_boundary=True).find("Flagging the billboard")['tags'] == []
+    assert make_matcher(word_boundary=True).find("lag, then a bill")['tags'] == ['performance', 'billing']
+
+
+def test_count_records_counts_each_text_once(make_matcher):
+    texts = [
+        "Payment failed",
+        "Crash, crash and another crash",
+        "",
+        "Slow, and the bill is wrong",
+        "Not working since the bug fix",
+    ]
+
+    counts = make_matcher().count_records(texts, 'tags')
+    assert counts == Counter({'billing': 2, 'bug': 2, 'performance': 1})
+    assert list(counts) == ['billing', 'bug', 'performance']
+    assert make_matcher().count_records([], 'tags') == Counter()
+
+
+def test_match_does_not_span_records(make_matcher):
+    assert make_matcher().count_records(["not", "working"], 'tags') == Counter()
+
+
+def test_registry_merges_company_dictionaries():
+    registry = KeywordMatcherRegistry(DICTIONARIES, {'acme': {'teams': {'Platform': ['platform']}}})
+
+    assert registry.get('globex') is registry.default
+    acme = registry.get('acme')
+    assert acme is registry.get('acme')
+    assert acme.find("platform and engineering", groups={'teams'})['teams'] == ['Engineering', 'Platform']
+    assert registry.default.find("platform", groups={'teams'})['teams'] == []
+
+
+def test_load_company_dictionaries(tmp_path):
+    path = tmp_path / 'keywords.json'
+    path.write_text(json.dumps({'acme': {'tags': {'bug': ['glitch']}}}))
+    assert load_company_dictionaries(str(path)) == {'acme': {'tags': {'bug': ['glitch']}}}
+
+    path.write_text('[1, 2]')
+    assert load_company_dictionaries(str(path)) == {}
+    assert load_company_dictionaries(str(tmp_path / 'missing.json')) == {}
+    assert load_company_dictionaries(None) == {}
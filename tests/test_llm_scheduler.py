@@ -0,0 +1,147 @@
+import threading
+import time
+
+import pytest
+
+import utils.llm_scheduler as llm_scheduler
+from utils.llm_scheduler import LLMScheduler, parse_company_weights
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not reached")
+        time.sleep(0.005)
+
+
+def test_parse_company_weights():
+    assert parse_company_weights('acme=2, globex=0.5') == {'acme': 2.0, 'globex': 0.5}
+    assert parse_company_weights('acme=0,=3,globex=x,initech=1,') == {'initech': 1.0}
+    assert parse_company_weights('') == {}
+    assert parse_company_weights(None) == {}
+
+
+def test_max_concurrent_must_be_positive():
+    with pytest.raises(ValueError):
+        LLMScheduler(max_concurrent=0)
+
+
+def test_waiting_calls_are_fair_shared_by_company():
+    scheduler = LLMScheduler(max_concurrent=1)
+    blocker = scheduler.acquire('other', 1)
+    order = []
+
+    def call(company_id, tokens):
+        request = scheduler.acquire(company_id, tokens)
+        order.append(company_id)
+        scheduler.release(request)
+
+    # acme queues three large calls before globex queues one small call
+    threads = []
+    for company_id, tokens in [('acme', 100), ('acme', 100), ('acme', 100), ('globex', 10)]:
+        thread = threading.Thread(target=call, args=(company_id, tokens))
+        thread.start()
+        threads.append(thread)
+        queued = len(threads)
+        wait_for(lambda: scheduler.stats()['queue_depth'] == queued)
+
+    scheduler.release(blocker)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['globex', 'acme', 'acme', 'acme']
+    stats = scheduler.stats()
+    assert stats['dispatched'] == 5
+    assert stats['companies']['acme']['dispatched'] == 3
+    assert stats['queue_depth'] == 0 and stats['active'] == 0
+
+
+def test_weights_scale_the_share():
+    scheduler = LLMScheduler(max_concurrent=1, company_weights={'acme': 20})
+    blocker = scheduler.acquire('other', 1)
+    order = []
+
+    def call(company_id):
+        request = scheduler.acquire(company_id, 100)
+        order.append(company_id)
+        scheduler.release(request)
+
+    threads = []
+    for company_id in ['globex', 'acme', 'acme']:
+        thread = threading.Thread(target=call, args=(company_id,))
+        thread.start()
+        threads.append(thread)
+        queued = len(threads)
+        wait_for(lambda: scheduler.stats()['queue_depth'] == queued)
+
+    scheduler.release(blocker)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ['acme', 'acme', 'globex']
+
+
+def test_request_budget_delays_calls(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, 'BUDGET_WINDOW_SECONDS', 0.2)
+    scheduler = LLMScheduler(max_concurrent=4, requests_per_minute=2)
+
+    started = time.monotonic()
+    for _ in range(3):
+        scheduler.release(scheduler.acquire('acme', 1))
+
+    assert time.monotonic() - started >= 0.15
+    assert scheduler.stats()['budget_waits'] == 1
+
+
+def test_token_budget_uses_actual_usage(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, 'BUDGET_WINDOW_SECONDS', 0.2)
+    scheduler = LLMScheduler(max_concurrent=4, tokens_per_minute=100)
+
+    # The reserved 90 tokens are corrected to 10, leaving room for the next call
+    scheduler.release(scheduler.acquire('acme', 90), used_tokens=10)
+    started = time.monotonic()
+    scheduler.release(scheduler.acquire('acme', 80))
+    assert time.monotonic() - started < 0.1
+    assert scheduler.stats()['window_tokens'] == 90
+
+    # A call over the remaining budget waits for the window to clear
+    scheduler.release(scheduler.acquire('acme', 50))
+    assert time.monotonic() - started >= 0.15
+    assert scheduler.stats()['budget_waits'] == 1
+
+
+def test_run_prices_prompt_and_response(token_counter):
+    scheduler = LLMScheduler(completion_tokens=100, token_counter=token_counter)
+
+    assert scheduler.run(lambda: 'short answer', company_id='acme', prompt='some prompt text') == 'short answer'
+    stats = scheduler.stats()
+    expected = token_counter.count('some prompt text') + token_counter.count('short answer')
+    assert stats['window_tokens'] == expected
+    assert stats['active'] == 0
+
+
+def test_run_releases_failed_calls():
+    scheduler = LLMScheduler()
+
+    def explode():
+        raise RuntimeError('rate limited')
+
+    with pytest.raises(RuntimeError):
+        scheduler.run(explode, company_id='acme')
+    stats = scheduler.stats()
+    assert (stats['failed'], stats['active']) == (1, 0)
+
+
+def test_call_outliving_the_window_does_not_inflate_tokens(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, 'BUDGET_WINDOW_SECONDS', 0.05)
+    scheduler = LLMScheduler(max_concurrent=5, tokens_per_minute=10000)
+
+    requests = [scheduler.acquire('acme', 1000) for _ in range(5)]
+    time.sleep(0.1)
+    # The reservations have left the window while the calls are still running
+    assert (scheduler.stats()['window_requests'], scheduler.stats()['window_tokens']) == (0, 0)
+    for request in requests:
+        scheduler.release(request, used_tokens=3000)
+
+    assert scheduler.stats()['window_tokens'] == 0
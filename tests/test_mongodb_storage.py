@@ -0,0 +1,171 @@
+import os
+import uuid
+
+import mongomock
+import pytest
+from pymongo.errors import BulkWriteError
+
+import utils.mongodb_storage as mongodb_storage
+from utils.mongodb_storage import MongoDBStorage
+
+# Pipeline updates need a real server; mongomock does not evaluate them
+MONGODB_TEST_URI = os.environ.get('MONGODB_TEST_URI')
+requires_mongodb = pytest.mark.skipif(not MONGODB_TEST_URI, reason="MONGODB_TEST_URI not set")
+
+
+def analysis(statuses):
+    return {
+        'query': 'What breaks?',
+        'final_report': {
+            'executive_summary': 'Summary',
+            'issues': [{'issue_type': f'Issue {index}', 'status': status} for index, status in enumerate(statuses)]
+        }
+    }
+
+
+@pytest.fixture
+def mock_storage(monkeypatch):
+    monkeypatch.setattr(mongodb_storage, 'MongoClient', mongomock.MongoClient)
+    return MongoDBStorage('mongodb://localhost:27017/', 'kollab_test', cache_size=0)
+
+
+@pytest.fixture
+def mongo_storage():
+    storage = MongoDBStorage(MONGODB_TEST_URI, f"kollab_test_{uuid.uuid4().hex}",
+                             server_selection_timeout_ms=5000, cache_size=0)
+    yield storage
+    storage.client.drop_database(storage.database_name)
+    storage.client.close()
+
+
+def test_task_status_pipeline_treats_status_as_literal():
+    storage = MongoDBStorage.__new__(MongoDBStorage)
+    stages = storage._task_status_pipeline({1: '$title'})
+    segments = stages[0]['$set']['final_report.issues']['$concatArrays']
+    assert segments[1]['$map']['in'] == {'$mergeObjects': ['$$issue', {'status': {'$literal': '$title'}}]}
+
+
+@requires_mongodb
+def test_update_task_status_recomputes_counts(mongo_storage):
+    mongo_storage.save_analysis(analysis(['new', 'new', 'resolved']), 'acme', 'T1')
+
+    result = mongo_storage.update_task_status('acme', 'T1', 1, 'processing')
+    assert result['success']
+    assert result['overall_status'] == 'processing'
+    assert result['counts'] == {'new': 1, 'processing': 1, 'resolved': 1}
+
+    stored = mongo_storage.get_analysis('acme', 'T1')['data']
+    assert [issue['status'] for issue in stored['final_report']['issues']] == ['new', 'processing', 'resolved']
+    assert [issue['issue_type'] for issue in stored['final_report']['issues']] == ['Issue 0', 'Issue 1', 'Issue 2']
+    summary = mongo_storage.list_analyses('acme')['data'][0]
+    assert summary['status'] == 'processing'
+    assert summary['task_status_counts'] == result['counts']
+
+
+@requires_mongodb
+def test_update_task_status_stores_operator_like_status_verbatim(mongo_storage):
+    mongo_storage.save_analysis(analysis(['new', 'new']), 'acme', 'T1')
+
+    assert mongo_storage.update_task_status('acme', 'T1', 0, '$query')['success']
+    assert mongo_storage.update_task_status('acme', 'T1', 1, {'$size': '$final_report.issues'})['success']
+
+    issues = mongo_storage.get_analysis('acme', 'T1')['data']['final_report']['issues']
+    assert issues[0]['status'] == '$query'
+    assert issues[1]['status'] == {'$size': '$final_report.issues'}
+
+
+@requires_mongodb
+def test_update_task_status_missing_task_or_ticket(mongo_storage):
+    mongo_storage.save_analysis(analysis(['new']), 'acme', 'T1')
+
+    assert mongo_storage.update_task_status('acme', 'T1', 3, 'resolved')['error'] == 'Task not found in analysis'
+    assert mongo_storage.update_task_status('acme', 'T9', 0, 'resolved')['error'] == 'Analysis not found'
+    assert mongo_storage.update_task_status('acme', 'T1', 'x', 'resolved')['error'] == 'Task not found in analysis'
+
+
+def test_save_and_load_analysis(mock_storage):
+    data = analysis(['new', 'resolved'])
+    data['scout_analysis'] = {'summary': 'Scout summary'}
+    result = mock_storage.save_analysis(data, 'acme', 'T1')
+    assert result == {'success': True, 'ticket_id': 'T1'}
+
+    stored = mock_storage.get_analysis('acme', 'T1')['data']
+    assert 'scout_analysis' not in stored
+    assert stored['task_status_counts'] == {'new': 1, 'processing': 0, 'resolved': 1}
+    full = mock_storage.get_analysis('acme', 'T1', full=True)['data']
+    assert full['scout_analysis'] == {'summary': 'Scout summary'}
+    assert mock_storage.get_analysis('acme', 'T2') == {'success': False, 'error': 'Analysis not found'}
+
+
+def test_resave_recounts_task_statuses(mock_storage):
+    mock_storage.save_analysis(analysis(['new', 'new']), 'acme', 'T1')
+
+    # A loaded document carries its counts; saving it with more issues must not keep them
+    document = mock_storage.get_analysis('acme', 'T1', full=True)['data']
+    document['final_report']['issues'].append({'issue_type': 'Issue 2', 'status': 'resolved'})
+    mock_storage.save_analysis(document, 'acme', 'T1')
+
+    stored = mock_storage.db.companies_tickets.find_one({'ticket_id': 'T1'})
+    assert stored['task_status_counts'] == {'new': 2, 'processing': 0, 'resolved': 1}
+    summary = mock_storage.db.ticket_summaries.find_one({'ticket_id': 'T1'})
+    assert summary['task_status_counts'] == stored['task_status_counts']
+    assert summary['issue_count'] == 3
+
+
+def test_save_analyses_bulk(mock_storage):
+    result = mock_storage.save_analyses_bulk([
+        {'analysis': analysis(['new']), 'company_id': 'acme', 'ticket_id': 'T1'},
+        {'analysis': None, 'company_id': 'acme'},
+        {'analysis': analysis(['resolved']), 'company_id': 'acme', 'ticket_id': 'T2'},
+    ])
+    assert (result['saved'], result['failed']) == (2, 1)
+    assert [item['success'] for item in result['results']] == [True, False, True]
+    listed = mock_storage.list_analyses('acme')['data']
+    assert sorted(summary['ticket_id'] for summary in listed) == ['T1', 'T2']
+
+
+def test_update_task_statuses_reports_rejected_ticket_writes(mock_storage, monkeypatch):
+    mock_storage.save_analysis(analysis(['new', 'new']), 'acme', 'T1')
+    mock_storage.save_analysis(analysis(['new']), 'acme', 'T2')
+
+    def bulk_write(operations, ordered=True):
+        # The server rejected the second operation (T2) and applied the first
+        raise BulkWriteError({'writeErrors': [{'index': 1, 'code': 2, 'errmsg': 'Invalid $set'}],
+                              'nModified': 1})
+    monkeypatch.setattr(mock_storage.db.companies_tickets, 'bulk_write', bulk_write)
+
+    result = mock_storage.update_task_statuses('acme', [
+        {'ticket_id': 'T1', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T2', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T3', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T1', 'status': 'resolved'},
+    ])
+
+    assert result['tickets'][1] == {'ticket_id': 'T2', 'success': False, 'error': 'Invalid $set'}
+    assert result['tickets'][2] == {'ticket_id': 'T3', 'success': False, 'error': 'Analysis not found'}
+    assert result['tickets'][0]['success']
+    assert result['errors'] == [{'index': 3, 'error': 'Invalid task_index'}]
+    assert (result['success'], result['updated'], result['failed']) == (False, 1, 2)
+
+
+@requires_mongodb
+def test_update_task_statuses_groups_changes_per_ticket(mongo_storage):
+    mongo_storage.save_analysis(analysis(['new', 'new', 'new']), 'acme', 'T1')
+    mongo_storage.save_analysis(analysis(['new']), 'acme', 'T2')
+
+    result = mongo_storage.update_task_statuses('acme', [
+        {'ticket_id': 'T1', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T1', 'task_index': 2, 'status': '$status'},
+        {'ticket_id': 'T2', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T2', 'task_index': 4, 'status': 'resolved'},
+        {'ticket_id': 'T9', 'task_index': 0, 'status': 'resolved'},
+    ])
+
+    tickets = {ticket['ticket_id']: ticket for ticket in result['tickets']}
+    assert tickets['T1']['success']
+    assert tickets['T1']['counts'] == {'new': 1, 'processing': 0, 'resolved': 1}
+    assert tickets['T2'] == {'ticket_id': 'T2', 'success': False, 'error': 'Task not found in analysis'}
+    assert tickets['T9'] == {'ticket_id': 'T9', 'success': False, 'error': 'Analysis not found'}
+    issues = mongo_storage.get_analysis('acme', 'T1')['data']['final_report']['issues']
+    assert [issue['status'] for issue in issues] == ['resolved', 'new', '$status']
+    assert mongo_storage.get_analysis('acme', 'T2')['data']['final_report']['issues'][0]['status'] == 'new'
@@ -0,0 +1,108 @@
+import pytest
+
+from utils.prompt_packer import PromptPacker, estimate_tokens
+
+
+def entry(text, **fields):
+    return {'text': text, **fields}
+
+
+@pytest.fixture
+def packer(token_counter):
+    return PromptPacker(token_counter, policy='file_order')
+
+
+def test_estimate_tokens_counts_words_and_punctuation():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('app crashes!') == 4
+    # Words count one token per started 4 characters
+    assert estimate_tokens('internationalization') == 5
+
+
+def test_unknown_policy_rejected(token_counter):
+    with pytest.raises(ValueError):
+        PromptPacker(token_counter, policy='random')
+
+
+def test_pack_without_budget_keeps_everything(packer):
+    packed = packer.pack([entry('one'), entry('two')], None)
+    assert packed['entries'] == ['one', 'two']
+    assert (packed['included'], packed['dropped'], packed['dropped_tokens']) == (2, 0, 0)
+
+
+def test_pack_fills_budget_and_skips_entries_that_do_not_fit(packer):
+    items = [entry('aaaa ' * 5), entry('bbbb ' * 20), entry('cccc')]
+    packed = packer.pack(items, 10)
+    # The large middle entry is skipped, the small one after it still fits
+    assert packed['entries'] == [items[0]['text'], 'cccc']
+    assert packed['used_tokens'] <= 10
+    assert (packed['dropped'], packed['dropped_tokens']) == (1, 20)
+
+
+def test_diversity_policy_represents_every_group(token_counter):
+    packer = PromptPacker(token_counter, policy='diversity')
+    items = [entry(f'billing {i}', category='billing') for i in range(5)] + [entry('login', category='auth')]
+    packed = packer.pack(items, 2 * packer.count_tokens('billing 0') + packer.separator_tokens)
+    assert packed['entries'] == ['billing 0', 'login']
+
+
+def test_recency_policy_prefers_newest(token_counter):
+    packer = PromptPacker(token_counter, policy='recency')
+    items = [entry('old', timestamp=1), entry('undated'), entry('new', timestamp=3)]
+    assert packer.pack(items, 1)['entries'] == ['new']
+
+
+def test_length_policy_prefers_shortest(token_counter):
+    packer = PromptPacker(token_counter, policy='length')
+    items = [entry('a much longer entry'), entry('short')]
+    assert packer.pack(items, 2)['entries'] == ['short']
+
+
+def test_pack_shards_caps_the_shard_count(packer):
+    # Three entries of 0.6x the shard budget need three shards; the cap allows two
+    items = [entry('word ' * 6) for _ in range(3)]
+    packed = packer.pack_shards(items, 10, max_shards=2)
+    assert len(packed['shards']) == 2
+    assert all(len(shard) == 1 for shard in packed['shards'])
+    assert (packed['included'], packed['dropped'], packed['dropped_tokens']) == (2, 1, 6)
+
+
+def test_pack_shards_without_cap_places_every_entry(packer):
+    items = [entry(f'item{i} ' * 3) for i in range(7)]
+    packed = packer.pack_shards(items, 12)
+    assert [len(shard) for shard in packed['shards']] == [2, 2, 2, 1]
+    assert packed['dropped'] == 0
+    for shard in packed['shards']:
+        assert sum(packer.count_tokens(text) for text in shard) + packer.separator_tokens * (len(shard) - 1) <= 12
+
+
+def test_pack_shards_leaves_out_least_preferred_entries(token_counter):
+    packer = PromptPacker(token_counter, policy='recency')
+    items = [entry(f'entry {i}', timestamp=i) for i in range(4)]
+    packed = packer.pack_shards(items, packer.count_tokens('entry 0'), max_shards=2)
+    assert packed['shards'] == [['entry 3'], ['entry 2']]
+
+
+def test_pack_shards_drops_oversized_entries(packer):
+    packed = packer.pack_shards([entry('tiny'), entry('huge ' * 50)], 10)
+    assert packed['shards'] == [['tiny']]
+    assert packed['dropped'] == 1
+
+
+class MergingCounter:
+    """Exact counter under which joined entries cost more than their separate counts"""
+    exact = True
+
+    def count(self, text):
+        return len(text.split()) + text.count('\n\n') ** 2
+
+
+def test_pack_shards_requeues_entries_removed_by_exact_count():
+    packer = PromptPacker(MergingCounter(), policy='file_order')
+    items = [entry(f'entry {index}') for index in range(4)]
+
+    # Estimated 2 + 3 + 3 = 8 fits three entries; counted exactly they cost 10
+    packed = packer.pack_shards(items, 8)
+    assert packed['shards'] == [['entry 0', 'entry 1'], ['entry 2', 'entry 3']]
+    assert (packed['included'], packed['dropped'], packed['dropped_tokens']) == (4, 0, 0)
+
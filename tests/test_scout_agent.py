@@ -0,0 +1,223 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import agents.scout_agent as scout_agent
+from agents.analyst_agent import AnalystIssuePipeline
+from agents.scout_agent import ScoutAgent
+from utils import tracing
+from utils.tracing import Trace
+from utils.keyword_matcher import KeywordMatcherRegistry
+from utils.prompt_packer import PromptPacker
+
+
+@pytest.fixture
+def scout(token_counter):
+    # The CrewAI agent is not needed for the data handling under test
+    agent = ScoutAgent.__new__(ScoutAgent)
+    agent.socketio = None
+    agent.keyword_matchers = KeywordMatcherRegistry()
+    agent.deduplicator = None
+    agent.prompt_packer = PromptPacker(token_counter)
+    agent.shard_token_limit = 100
+    agent.max_shards = None
+    return agent
+
+
+RECORDS = [
+    {'text': 'App  crashes\non login', 'user': 'ann', 'location': 'NY', 'category': 'bug', 'timestamp': 1700000000},
+    {'text': '', 'user': 'bob'},
+    {'message': 'Slow sync', 'username': 'cy', 'country': 'FR', 'channel': 'email'},
+    {'comment': 'Dark mode please', 'user': None, 'location': float('nan'), 'type': 'ux'},
+    {'score': 3, 'note': 'no text field'},
+]
+
+
+def test_extract_metadata_builds_feedback_items(scout):
+    metadata, items = scout.extract_metadata(RECORDS)
+    assert items == [
+        {'text': 'App crashes on login', 'user': 'ann', 'location': 'NY', 'category': 'bug',
+         'source': None, 'timestamp': 1700000000},
+        {'text': 'Slow sync', 'user': 'cy', 'location': 'FR', 'category': None,
+         'source': 'email', 'timestamp': None},
+        {'text': 'Dark mode please', 'user': None, 'location': None, 'category': 'ux',
+         'source': None, 'timestamp': None},
+        {'text': '3 no text field', 'user': None, 'location': None, 'category': None,
+         'source': None, 'timestamp': None},
+    ]
+    assert metadata['users'] == {'ann': 1, 'bob': 1, 'cy': 1}
+    assert metadata['user_location'] == {'NY': 1, 'FR': 1}
+    assert metadata['categories'] == {'bug': 1, 'ux': 1}
+    assert metadata['sources'] == {'email': 1}
+
+
+def test_scan_records_matches_single_batch(scout):
+    single, single_items, single_count = scout.scan_records([RECORDS])
+    batched, batched_items, batched_count = scout.scan_records(RECORDS[i:i + 2] for i in range(0, len(RECORDS), 2))
+    assert batched_count == single_count == len(RECORDS)
+    assert batched_items == single_items
+    for field in ('users', 'user_location', 'categories', 'field_statistics', 'common_fields', 'avg_length'):
+        assert batched[field] == single[field]
+    assert list(batched['users']) == list(single['users'])
+
+
+def test_metadata_extraction_span_excludes_batch_production(scout):
+    def slow_batches():
+        for start in range(0, len(RECORDS), 2):
+            time.sleep(0.1)
+            yield RECORDS[start:start + 2]
+
+    trace = Trace('proc-1')
+    with tracing.activate(trace):
+        scout.scan_records(slow_batches())
+
+    spans = trace.to_dict()['spans']
+    assert [span['name'] for span in spans] == ['metadata_extraction']
+    assert spans[0]['attributes'] == {'records': len(RECORDS)}
+    assert spans[0]['duration_ms'] < 150
+
+
+def test_scan_records_empty(scout):
+    metadata, items, record_count = scout.scan_records([[], []])
+    assert (items, record_count, metadata['avg_length']) == ([], 0, 0)
+
+
+class FakeTask:
+    def __init__(self, description):
+        self.description = description
+
+
+def run_scout(scout, records, max_shards):
+    """Run process_scout_query with the LLM stubbed out; returns the result and the prompts sent"""
+    prompts = []
+    scout.max_workers = 2
+    scout.max_shards = max_shards
+    scout._create_agent = lambda: None
+    scout.build_scout_task = lambda *args, **kwargs: FakeTask(scout.build_scout_prompt(*args[:5], kwargs.get('shard_info')))
+
+    def run_scout_task(task, company_id=None, **kwargs):
+        prompts.append(task.description)
+        return {'issue_types': [{'type': 'Crash', 'priority': 'High', 'examples': [], 'sources': [], 'tags': []}],
+                'common_themes': [], 'overall_sentiment': 'Negative', 'summary': 'Crashes'}
+    scout.run_scout_task = run_scout_task
+
+    result = scout.process_scout_query({'content': records, 'query': 'Why?', 'process_id': 'p1', 'company_id': 'acme'})
+    return result, prompts
+
+
+def prompt_tokens(scout, prompt):
+    return sum(scout.prompt_packer.count_tokens(text) for text in (
+        prompt, scout.AGENT_ROLE, scout.AGENT_GOAL, scout.AGENT_BACKSTORY, scout.EXPECTED_OUTPUT
+    ))
+
+
+def test_process_scout_query_caps_shards_and_fits_prompts(scout):
+    records = [{'text': f'complaint {i} ' + 'word ' * 30} for i in range(3)]
+    metadata, items, record_count = scout.scan_records([records])
+    entries = scout.format_feedback_entries([item['text'] for item in items])
+    overhead = scout.prompt_overhead_tokens('Why?', record_count, {**metadata, 'distinct_feedback': 3}, len(entries))
+    # Room for one entry per prompt, so all three need three prompts
+    scout.shard_token_limit = overhead + scout.prompt_packer.count_tokens(entries[0]) + 5
+
+    logs = []
+    scout.emit_log = logs.append
+    result, prompts = run_scout(scout, records, max_shards=2)
+
+    assert result['metadata']['shard_count'] == 2
+    assert result['metadata']['dropped_feedback'] == 1
+    assert any('Left out 1 feedback items' in log and 'cap of 2 Scout prompts' in log for log in logs)
+    assert len(prompts) == 2
+    assert all(prompt_tokens(scout, prompt) <= scout.shard_token_limit for prompt in prompts)
+
+
+def test_process_scout_query_rejects_limit_below_instructions(scout):
+    scout.shard_token_limit = 10
+    result, prompts = run_scout(scout, [{'text': 'app crashes'}], max_shards=None)
+    assert 'error' in result
+    assert prompts == []
+
+
+def test_process_scout_query_analyzes_all_feedback_without_cap(scout):
+    records = [{'text': f'complaint {i} ' + 'word ' * 30} for i in range(3)]
+    metadata, items, record_count = scout.scan_records([records])
+    entries = scout.format_feedback_entries([item['text'] for item in items])
+    overhead = scout.prompt_overhead_tokens('Why?', record_count, {**metadata, 'distinct_feedback': 3}, len(entries))
+    scout.shard_token_limit = overhead + scout.prompt_packer.count_tokens(entries[0]) + 5
+
+    result, prompts = run_scout(scout, records, max_shards=None)
+
+    assert result['metadata']['shard_count'] == 3
+    assert result['metadata']['dropped_feedback'] == 0
+    assert len(prompts) == 3
+
+
+class FakeSocket:
+    def __init__(self):
+        self.emitted = []
+
+    def emit(self, event, data, to=None):
+        self.emitted.append((event, data, to))
+
+
+def stream_chunk(content):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+
+
+def test_streamed_scout_output_starts_analyst_per_issue(scout, monkeypatch):
+    issues = [
+        {'type': 'Crash on login', 'priority': 'High', 'examples': ['crash'], 'sources': [], 'tags': ['bug']},
+        {'type': 'Slow sync', 'priority': 'Low', 'examples': ['slow'], 'sources': [], 'tags': ['performance']},
+    ]
+    response = json.dumps({'issue_types': issues, 'common_themes': ['stability'],
+                           'overall_sentiment': 'Negative', 'summary': 'Crashes and slowness'})
+    first_issue_end = response.index('}', response.index('Crash on login')) + 1
+    analyzed = []
+    first_analyzed = threading.Event()
+
+    def analyze_issue(issue, query, company_id):
+        analyzed.append(issue['type'])
+        first_analyzed.set()
+        return {'issue_type': issue['type']}
+
+    def completion(model, messages, stream):
+        assert stream and model == scout.model_name
+        assert messages[0]['content'].startswith(f"You are {scout.AGENT_ROLE}.")
+        yield stream_chunk(response[:first_issue_end])
+        # The Analyst call for the first issue runs before Scout has finished streaming
+        assert first_analyzed.wait(5)
+        yield stream_chunk(None)
+        for start in range(first_issue_end, len(response), 7):
+            yield stream_chunk(response[start:start + 7])
+
+    monkeypatch.setattr(scout_agent, 'litellm', SimpleNamespace(completion=completion))
+    socket = FakeSocket()
+    scout.socketio = socket
+    scout.cache = None
+    scout.scheduler = None
+    scout.stream_llm = True
+    scout.model_name = 'azure/gpt-4o-mini'
+    scout.shard_token_limit = 10000
+    scout.build_scout_task = lambda *args, **kwargs: SimpleNamespace(
+        description=scout.build_scout_prompt(*args[:5], kwargs.get('shard_info')),
+        expected_output=scout.EXPECTED_OUTPUT,
+        agent=SimpleNamespace(role=scout.AGENT_ROLE, goal=scout.AGENT_GOAL, backstory=scout.AGENT_BACKSTORY)
+    )
+    pipeline = AnalystIssuePipeline(SimpleNamespace(analyze_issue=analyze_issue), 'Why?', 'acme', max_workers=2)
+
+    try:
+        result = scout.process_scout_query({'content': [{'text': 'App crashes'}, {'text': 'Sync is slow'}],
+                                            'query': 'Why?', 'process_id': 'job-1', 'company_id': 'acme',
+                                            'on_issue': pipeline.submit})
+        insights = pipeline.results(result['scout_analysis']['issue_types'])
+    finally:
+        pipeline.shutdown()
+
+    assert result['scout_analysis']['issue_types'] == issues
+    assert insights == [{'issue_type': 'Crash on login'}, {'issue_type': 'Slow sync'}]
+    assert analyzed == ['Crash on login', 'Slow sync']
+    deltas = [data['delta'] for event, data, room in socket.emitted if event == 'scout_log' and room == 'job-1']
+    assert len(deltas) >= 2
+    assert ''.join(deltas) == response
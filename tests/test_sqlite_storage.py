@@ -0,0 +1,205 @@
+import pytest
+
+from utils.sqlite_storage import SQLiteStorage
+
+
+def analysis(statuses, **report):
+    return {
+        'query': 'What breaks?',
+        'final_report': {
+            'executive_summary': 'Summary',
+            'issues': [{'issue_type': f'Issue {index}', 'status': status} for index, status in enumerate(statuses)],
+            **report
+        }
+    }
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return SQLiteStorage(str(tmp_path / 'kollab.sqlite3'), cache_size=0)
+
+
+def test_save_and_get_round_trip(storage):
+    assert storage.save_analysis(analysis(['new', 'resolved']), 'acme', 'T1') == {'success': True, 'ticket_id': 'T1'}
+
+    stored = storage.get_analysis('acme', 'T1')['data']
+    assert stored['company_id'] == 'acme'
+    assert [issue['status'] for issue in stored['final_report']['issues']] == ['new', 'resolved']
+    assert stored['task_status_counts'] == {'new': 1, 'processing': 0, 'resolved': 1}
+    assert not storage.get_analysis('acme', 'missing')['success']
+    assert not storage.get_analysis('globex', 'T1')['success']
+
+
+def test_resave_replaces_issues_and_counts(storage):
+    storage.save_analysis(analysis(['new', 'new']), 'acme', 'T1')
+    storage.save_analysis(analysis(['resolved']), 'acme', 'T1')
+
+    stored = storage.get_analysis('acme', 'T1')['data']
+    assert len(stored['final_report']['issues']) == 1
+    assert stored['task_status_counts'] == {'new': 0, 'processing': 0, 'resolved': 1}
+    assert storage.list_analyses('acme')['data'][0]['task_status_counts'] == stored['task_status_counts']
+
+
+def test_update_task_status_recomputes_counts(storage):
+    storage.save_analysis(analysis(['new', 'new', 'resolved']), 'acme', 'T1')
+
+    result = storage.update_task_status('acme', 'T1', '1', 'processing')
+    assert result['success']
+    assert result['task_index'] == 1
+    assert result['overall_status'] == 'processing'
+    assert result['counts'] == {'new': 1, 'processing': 1, 'resolved': 1}
+
+    stored = storage.get_analysis('acme', 'T1')['data']
+    assert [issue['status'] for issue in stored['final_report']['issues']] == ['new', 'processing', 'resolved']
+    assert stored['status'] == 'processing'
+    summary = storage.list_analyses('acme')['data'][0]
+    assert summary['task_status_counts'] == result['counts']
+    assert summary['status'] == 'processing'
+
+
+@pytest.mark.parametrize('ticket_id, task_index, error', [
+    ('T1', 5, 'Task not found in analysis'),
+    ('T1', -1, 'Task not found in analysis'),
+    ('T1', 'x', 'Task not found in analysis'),
+    ('missing', 0, 'Analysis not found'),
+])
+def test_update_task_status_rejects_unknown_tasks(storage, ticket_id, task_index, error):
+    storage.save_analysis(analysis(['new']), 'acme', 'T1')
+
+    assert storage.update_task_status('acme', ticket_id, task_index, 'resolved') == {'success': False, 'error': error}
+    assert storage.get_analysis('acme', 'T1')['data']['final_report']['issues'][0]['status'] == 'new'
+
+
+def test_all_tasks_resolved_resolves_ticket(storage):
+    storage.save_analysis(analysis(['resolved', 'new']), 'acme', 'T1')
+
+    result = storage.update_task_status('acme', 'T1', 1, 'resolved')
+    assert result['overall_status'] == 'resolved'
+
+
+def test_update_task_statuses_reports_per_ticket(storage):
+    for ticket_id in ('T1', 'T2'):
+        storage.save_analysis(analysis(['new'] * 4), 'acme', ticket_id)
+
+    result = storage.update_task_statuses('acme', [
+        {'ticket_id': 'T1', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T1', 'task_index': '2', 'status': 'processing'},
+        {'ticket_id': 'T2', 'task_index': 1, 'status': 'resolved'},
+        {'ticket_id': 'T2', 'task_index': 9, 'status': 'resolved'},
+        {'ticket_id': 'missing', 'task_index': 0, 'status': 'resolved'},
+        {'ticket_id': 'T1', 'task_index': -1, 'status': 'resolved'},
+        {'task_index': 0, 'status': 'resolved'},
+        'junk',
+    ])
+
+    assert not result['success']
+    assert (result['updated'], result['failed']) == (1, 2)
+    assert result['tickets'] == [
+        {'ticket_id': 'T1', 'success': True, 'overall_status': 'processing',
+         'counts': {'new': 2, 'processing': 1, 'resolved': 1}},
+        {'ticket_id': 'T2', 'success': False, 'error': 'Task not found in analysis'},
+        {'ticket_id': 'missing', 'success': False, 'error': 'Analysis not found'},
+    ]
+    assert result['errors'] == [
+        {'index': 5, 'error': 'Invalid task_index'},
+        {'index': 6, 'error': 'Missing ticket_id or status'},
+        {'index': 7, 'error': 'Change must be an object'},
+    ]
+    # A ticket with a rejected change is left untouched
+    t2_issues = storage.get_analysis('acme', 'T2')['data']['final_report']['issues']
+    assert [issue['status'] for issue in t2_issues] == ['new'] * 4
+
+
+def test_update_analysis_status(storage):
+    storage.save_analysis(analysis([]), 'acme', 'T1')
+
+    assert storage.update_analysis_status('acme', 'T1', 'failed')['success']
+    assert storage.get_analysis('acme', 'T1')['data']['status'] == 'failed'
+    assert storage.update_analysis_status('acme', 'missing', 'failed') == {'success': False, 'error': 'Analysis not found'}
+
+
+def test_list_analyses_pages_with_cursor(storage):
+    for index in range(5):
+        storage.save_analysis(analysis([]), 'acme', f'T{index}')
+    storage.save_analysis(analysis([]), 'globex', 'G1')
+
+    seen = []
+    cursor = None
+    while True:
+        page = storage.list_analyses('acme', limit=2, cursor=cursor)
+        assert page['success']
+        assert len(page['data']) <= 2
+        seen += [summary['ticket_id'] for summary in page['data']]
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+
+    assert sorted(seen) == [f'T{index}' for index in range(5)]
+    assert len(seen) == len(set(seen))
+
+
+def test_save_analyses_bulk_reports_failures(storage):
+    result = storage.save_analyses_bulk([
+        {'analysis': analysis(['new']), 'company_id': 'acme', 'ticket_id': 'T1'},
+        {'analysis': None, 'company_id': 'acme'},
+    ])
+
+    assert (result['success'], result['saved'], result['failed']) == (False, 1, 1)
+    assert result['results'][0] == {'success': True, 'ticket_id': 'T1'}
+    assert storage.get_analysis('acme', 'T1')['success']
+
+
+def test_dashboard_stats(storage):
+    storage.save_analysis(analysis(['new', 'resolved'], tags=None), 'acme', 'T1')
+    storage.save_analysis({
+        'query': 'q',
+        'final_report': {'issues': [{'criticality': 'High', 'tags': ['bug', 'ui']}, {'tags': ['bug']}]}
+    }, 'acme', 'T2')
+    storage.save_analysis(analysis(['new']), 'globex', 'G1')
+
+    stats = storage.get_dashboard_stats('acme')['data']
+    assert stats['total_tickets'] == 2
+    assert stats['task_status_counts'] == {'new': 3, 'resolved': 1}
+    assert stats['criticality_counts'] == {'High': 1, 'Unspecified': 3}
+    assert stats['tag_counts'] == {'bug': 2, 'ui': 1}
+    assert sum(bucket['count'] for bucket in stats['tickets_over_time']) == 2
+
+
+def test_rebuild_summaries(storage):
+    storage.save_analysis(analysis(['new']), 'acme', 'T1')
+    storage.save_analysis(analysis(['new']), 'globex', 'G1')
+
+    assert storage.rebuild_summaries() == 2
+    assert storage.rebuild_summaries('acme') == 1
+    assert storage.list_analyses('acme')['data'][0]['ticket_id'] == 'T1'
+
+
+def test_read_through_cache_invalidated_by_writes(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'kollab.sqlite3'))
+    storage.save_analysis(analysis(['new']), 'acme', 'T1')
+
+    first = storage.get_analysis('acme', 'T1')['data']
+    assert storage.get_analysis('acme', 'T1')['data'] is first
+    assert storage.cache_stats()['hits'] == 1
+
+    storage.update_task_status('acme', 'T1', 0, 'resolved')
+    assert storage.get_analysis('acme', 'T1')['data']['final_report']['issues'][0]['status'] == 'resolved'
+    storage.update_analysis_status('acme', 'T1', 'failed')
+    assert storage.get_analysis('acme', 'T1')['data']['status'] == 'failed'
+    storage.save_analysis(analysis(['new', 'new']), 'acme', 'T1')
+    assert len(storage.get_analysis('acme', 'T1')['data']['final_report']['issues']) == 2
+
+
+def test_payload_stored_outside_main_document(storage):
+    document = analysis(['new'])
+    document['scout_analysis'] = {'raw': 'x' * 10000}
+    document['analyst_insights'] = {'raw': 'y' * 10000}
+    storage.save_analysis(document, 'acme', 'T1')
+
+    main = storage.get_analysis('acme', 'T1')['data']
+    assert 'scout_analysis' not in main and 'analyst_insights' not in main
+
+    full = storage.get_analysis('acme', 'T1', full=True)['data']
+    assert full['scout_analysis'] == document['scout_analysis']
+    assert full['analyst_insights'] == document['analyst_insights']
+    assert full['final_report'] == main['final_report']
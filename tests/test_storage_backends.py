@@ -0,0 +1,57 @@
+import os
+import uuid
+
+import pytest
+
+from utils.mongodb_storage import MongoDBStorage
+from utils.sqlite_storage import SQLiteStorage
+
+# Pipeline updates need a real server; mongomock does not evaluate them
+MONGODB_TEST_URI = os.environ.get('MONGODB_TEST_URI')
+requires_mongodb = pytest.mark.skipif(not MONGODB_TEST_URI, reason="MONGODB_TEST_URI not set")
+
+
+def analysis(statuses):
+    return {
+        'query': 'What breaks?',
+        'final_report': {
+            'executive_summary': 'Summary',
+            'issues': [{'issue_type': f'Issue {index}', 'status': status} for index, status in enumerate(statuses)]
+        }
+    }
+
+
+@pytest.fixture(params=['sqlite', pytest.param('mongodb', marks=requires_mongodb)])
+def storage(request, tmp_path):
+    if request.param == 'sqlite':
+        yield SQLiteStorage(str(tmp_path / 'kollab.sqlite3'), cache_size=0)
+        return
+    storage = MongoDBStorage(MONGODB_TEST_URI, f"kollab_test_{uuid.uuid4().hex}",
+                             server_selection_timeout_ms=5000, cache_size=0)
+    yield storage
+    storage.client.drop_database(storage.database_name)
+    storage.client.close()
+
+
+# Tasks with an unknown status are left out of the counts and of the overall status
+@pytest.mark.parametrize('statuses, task_index, new_status, overall_status, counts', [
+    (['new', 'blocked'], 0, 'resolved', 'resolved', {'new': 0, 'processing': 0, 'resolved': 1}),
+    (['new', 'blocked'], 0, 'processing', 'processing', {'new': 0, 'processing': 1, 'resolved': 0}),
+    (['blocked', 'resolved'], 1, 'new', 'new', {'new': 1, 'processing': 0, 'resolved': 0}),
+    (['blocked', 'new'], 1, 'waiting', 'new', {'new': 0, 'processing': 0, 'resolved': 0}),
+])
+def test_unknown_task_status_gives_the_same_overall_status(storage, statuses, task_index, new_status,
+                                                           overall_status, counts):
+    storage.save_analysis(analysis(statuses), 'acme', 'T1')
+
+    single = storage.update_task_status('acme', 'T1', task_index, new_status)
+    assert (single['overall_status'], single['counts']) == (overall_status, counts)
+
+    storage.save_analysis(analysis(statuses), 'acme', 'T2')
+    bulk = storage.update_task_statuses('acme', [{'ticket_id': 'T2', 'task_index': task_index, 'status': new_status}])
+    assert (bulk['tickets'][0]['overall_status'], bulk['tickets'][0]['counts']) == (overall_status, counts)
+
+    stored = storage.get_analysis('acme', 'T1')['data']
+    assert (stored['status'], stored['task_status_counts']) == (overall_status, counts)
+    summaries = {summary['ticket_id']: summary for summary in storage.list_analyses('acme')['data']}
+    assert summaries['T2']['status'] == overall_status
@@ -0,0 +1,56 @@
+import json
+import random
+
+from utils.stream_parser import IssueStreamParser
+
+RESPONSE = {
+    'summary': 'Mentions "issue_types": [ in a string',
+    'issue_types': [
+        {'type': 'Battery {drain} "fast" ]', 'examples': ['a', 'b}'], 'priority': 'High',
+         'nested': {'list': [1, {'z': 2}]}},
+        {'type': 'Login', 'priority': 'Low'},
+    ],
+    'common_themes': ['issue_types'],
+}
+TEXT = "Here you go:\n```json\n" + json.dumps(RESPONSE, indent=2) + "\n```"
+
+
+def feed_in_pieces(text, sizes):
+    parser = IssueStreamParser()
+    completed = []
+    position = 0
+    for size in sizes:
+        completed.extend(parser.feed(text[position:position + size]))
+        position += size
+    completed.extend(parser.feed(text[position:]))
+    return completed
+
+
+def test_entries_found_whatever_the_chunking():
+    rng = random.Random(7)
+    for _ in range(50):
+        sizes = [rng.randint(1, 7) for _ in range(len(TEXT))]
+        assert feed_in_pieces(TEXT, sizes) == RESPONSE['issue_types']
+
+
+def test_entry_returned_as_soon_as_it_closes():
+    parser = IssueStreamParser()
+    assert parser.feed('{"summary": "x", "issue_types": [{"type": "A"}, {"type": ') == [{'type': 'A'}]
+    assert parser.feed('"B"}') == [{'type': 'B'}]
+    assert parser.feed(']}') == []
+
+
+def test_undecodable_entry_skipped():
+    parser = IssueStreamParser()
+    assert parser.feed('{"issue_types": [{"type": bad}, {"type": "ok"}]}') == [{'type': 'ok'}]
+
+
+def test_only_the_first_watched_array_is_read():
+    parser = IssueStreamParser()
+    text = '{"issue_types": [{"type": "A"}], "other": {"issue_types": [{"type": "B"}]}}'
+    assert parser.feed(text) == [{'type': 'A'}]
+
+
+def test_other_keys_ignored():
+    parser = IssueStreamParser(key='issue_types')
+    assert parser.feed('{"common_themes": [{"type": "A"}], "issue_types": []}') == []
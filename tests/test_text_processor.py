@@ -0,0 +1,72 @@
+import pytest
+
+from utils.text_processor import TextPreprocessor
+
+
+@pytest.fixture
+def preprocessor():
+    return TextPreprocessor(batch_size=2, tokenizer='regex')
+
+
+def test_clean_text_removes_urls_tags_and_special_characters(preprocessor):
+    text = 'See https://example.com/a?b=1 or www.example.org <b>now</b>!! #1 :)\n\n  ok'
+    assert preprocessor.clean_text(text) == 'See or now!! 1 ok'
+
+
+def test_clean_text_removes_tag_containing_url(preprocessor):
+    assert preprocessor.clean_text('click <a href=http://x.io/y>here</a>') == 'click here'
+
+
+@pytest.mark.parametrize('text, expected', [
+    # Outputs of the original sequential cleanup (URLs, then tags, then special characters)
+    ('Love it \u2764\ufe0f<br/>Will buy again', 'Love it Will buy again'),
+    ('Great :)<br>Thanks', 'Great Thanks'),
+    ("'<b>bold</b>", 'bold'),
+    ('a < b', 'a b'),
+    ('x <3 y', 'x 3 y'),
+])
+def test_clean_text_strips_tags_after_special_characters(preprocessor, text, expected):
+    assert preprocessor.clean_text(text) == expected
+
+
+def test_clean_text_empty(preprocessor):
+    assert preprocessor.clean_text(None) == ''
+    assert preprocessor.clean_text('') == ''
+
+
+def test_regex_tokenizer_splits_contractions(preprocessor):
+    assert preprocessor.tokenize("I don't like it...") == ['I', 'don', "'", 't', 'like', 'it', '...']
+    assert preprocessor.tokenize("It's the user's app, isn't it?") == [
+        'It', "'", 's', 'the', 'user', "'", 's', 'app', ',', 'isn', "'", 't', 'it', '?'
+    ]
+
+
+def test_remove_stop_words_drops_contraction_parts(preprocessor):
+    assert preprocessor.remove_stop_words("I don't like the app") == "' like app"
+
+
+def test_unknown_tokenizer_rejected():
+    with pytest.raises(ValueError):
+        TextPreprocessor(tokenizer='spacy')
+
+
+def test_batch_records_accepts_lists_and_iterators(preprocessor):
+    records = [{'text': str(i)} for i in range(5)]
+    assert [len(batch) for batch in preprocessor.batch_records(records)] == [2, 2, 1]
+    assert [len(batch) for batch in preprocessor.batch_records(iter(records))] == [2, 2, 1]
+
+
+def test_preprocess_record_only_touches_text_fields(preprocessor):
+    record = {'text': 'The <i>app</i> crashes', 'user': '<admin>'}
+    assert preprocessor.preprocess_record(record) == {'text': 'app crashes', 'user': '<admin>'}
+    assert record['text'] == 'The <i>app</i> crashes'
+
+
+def test_parallel_preprocessing_keeps_order():
+    preprocessor = TextPreprocessor(batch_size=2, workers=2, chunk_size=1, tokenizer='regex')
+    try:
+        batches = list(preprocessor.batch_records([{'text': f'item {i} is broken'} for i in range(7)]))
+        processed = list(preprocessor.preprocess_batches(batches))
+    finally:
+        preprocessor.close()
+    assert [record['text'] for batch in processed for record in batch] == [f'item {i} broken' for i in range(7)]
@@ -0,0 +1,111 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from utils import tracing
+from utils.tracing import JsonlSpanExporter, Tracer
+
+
+class ListExporter:
+    def __init__(self):
+        self.traces = []
+
+    def export(self, trace_data):
+        self.traces.append(trace_data)
+
+
+def spans_by_name(trace_data):
+    return {span['name']: span for span in trace_data['spans']}
+
+
+def test_spans_nest_and_record_attributes():
+    exporter = ListExporter()
+    trace = Tracer([exporter]).start_trace('proc-1', company_id='acme')
+
+    with tracing.activate(trace):
+        with tracing.span('scout', records=10) as scout:
+            with tracing.span('scout_llm'):
+                pass
+            scout.set(shards=2)
+        tracing.add_span('preprocess_batch', time.time() - 0.01, records=5)
+
+    trace_data = trace.finish()
+    spans = spans_by_name(trace_data)
+    assert spans['scout']['parent_id'] is None
+    assert spans['scout_llm']['parent_id'] == spans['scout']['span_id']
+    assert spans['scout']['attributes'] == {'records': 10, 'shards': 2}
+    assert spans['preprocess_batch']['duration_ms'] >= 10
+    assert set(trace_data['stage_totals_ms']) == {'scout', 'scout_llm', 'preprocess_batch'}
+    assert trace_data['attributes'] == {'company_id': 'acme'}
+    assert exporter.traces == [trace_data]
+
+
+def test_failed_span_records_error():
+    trace = Tracer().start_trace('proc-1')
+
+    with tracing.activate(trace):
+        with pytest.raises(ValueError):
+            with tracing.span('analyst'):
+                raise ValueError('bad JSON')
+
+    assert trace.to_dict()['spans'][0]['attributes'] == {'error': 'bad JSON'}
+
+
+def test_no_active_trace_is_a_noop():
+    assert tracing.current_trace() is None
+    with tracing.span('scout') as current:
+        current.set(records=1)
+    tracing.add_span('preprocess_batch', time.time())
+
+
+def test_propagate_records_into_parent_span_from_threads():
+    trace = Tracer().start_trace('proc-1')
+
+    def work(index):
+        with tracing.span('analyst_issue', index=index):
+            return tracing.current_trace()
+
+    with tracing.activate(trace):
+        with tracing.span('analyst') as analyst:
+            with ThreadPoolExecutor(max_workers=3) as executor:
+                seen = list(executor.map(tracing.propagate(work), range(3)))
+        # Unpropagated work on a thread records nothing
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(work, 99).result() is None
+
+    assert seen == [trace] * 3
+    issue_spans = [span for span in trace.to_dict()['spans'] if span['name'] == 'analyst_issue']
+    assert sorted(span['attributes']['index'] for span in issue_spans) == [0, 1, 2]
+    assert all(span['parent_id'] == analyst.span_id for span in issue_spans)
+
+
+def test_finish_exports_once_and_survives_failing_exporters():
+    class FailingExporter:
+        def export(self, trace_data):
+            raise OSError('disk full')
+
+    exporter = ListExporter()
+    trace = Tracer([FailingExporter(), exporter]).start_trace('proc-1')
+    trace.finish()
+    trace.finish()
+
+    assert len(exporter.traces) == 1
+
+
+def test_jsonl_exporter_writes_one_line_per_span(tmp_path):
+    path = tmp_path / 'spans.jsonl'
+    trace = Tracer([JsonlSpanExporter(str(path))]).start_trace('proc-1', company_id='acme')
+
+    with tracing.activate(trace):
+        with tracing.span('scout'):
+            pass
+        with tracing.span('analyst'):
+            pass
+    trace.finish()
+    Tracer([JsonlSpanExporter(str(path))]).start_trace('proc-2').finish()
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['name'] for line in lines] == ['scout', 'analyst']
+    assert all(line['process_id'] == 'proc-1' and line['company_id'] == 'acme' for line in lines)
@@ -4,6 +4,7 @@ This avoids duplication of initialization code between app.py and process_agents
 """
 from flask import Flask
 from flask_socketio import SocketIO
+import atexit
 import logging
 import tempfile
 import os
@@ -13,7 +14,15 @@ from dotenv import load_dotenv
 from agents.scout_agent import ScoutAgent
 from agents.analyst_agent import AnalystAgent
 from utils.text_processor import TextPreprocessor
-from utils.mongodb_storage import MongoDBStorage
+from utils.storage import create_storage
+from utils.async_storage import AsyncAnalysisStorage
+from utils.event_bus import EventBus, socketio_relay
+from utils.job_queue import JobManager
+from utils.cache import LLMResultCache
+from utils.keyword_matcher import KeywordMatcherRegistry, load_company_dictionaries
+from utils.prompt_packer import PromptPacker, TokenCounter
+from utils.llm_scheduler import LLMScheduler, parse_company_weights
+from utils.tracing import Tracer, JsonlSpanExporter, HttpCollectorExporter
 
 # Load environment variables from .env file
 load_dotenv()
@@ -30,7 +39,8 @@ app = Flask(__name__,
             
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'kollab_secret_key')
 app.config['UPLOAD_FOLDER'] = tempfile.mkdtemp()
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB limit
+# Uploads are streamed through preprocessing, so the limit only bounds request/disk size
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_UPLOAD_MB', 16)) * 1024 * 1024
 socketio = SocketIO(app, cors_allowed_origins="*")
 
 # =============================
@@ -38,6 +48,43 @@ socketio = SocketIO(app, cors_allowed_origins="*")
 # =============================
 MONGODB_URI = os.environ.get('MONGODB_URI')
 MONGODB_DB = os.environ.get('MONGODB_DB', 'KollabAgentic')
+MONGODB_TIMEOUT_MS = int(os.environ.get('MONGODB_TIMEOUT_MS', 5000))
+MONGODB_MAX_POOL_SIZE = int(os.environ.get('MONGODB_MAX_POOL_SIZE', 100))
+STORAGE_ASYNC_WORKERS = int(os.environ.get('STORAGE_ASYNC_WORKERS', 8))  # keep at or below MONGODB_MAX_POOL_SIZE
+EVENT_CHANGE_STREAMS = os.environ.get('EVENT_CHANGE_STREAMS', 'false').lower() == 'true'  # needs a replica set
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongodb')  # 'mongodb' or 'sqlite'
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(project_root, 'kollab.sqlite3'))
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 256))  # 0 disables the cache
+ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', 300))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_QUEUE_LIMIT = int(os.environ.get('JOB_QUEUE_LIMIT', 50))
+SCOUT_MAX_WORKERS = int(os.environ.get('SCOUT_MAX_WORKERS', 4))
+SCOUT_SHARD_TOKENS = int(os.environ.get('SCOUT_SHARD_TOKENS', 100000))  # whole Scout prompt, instructions included
+SCOUT_DEDUP_THRESHOLD = float(os.environ.get('SCOUT_DEDUP_THRESHOLD', 0.8))  # 0 disables collapsing
+SCOUT_MAX_SHARDS = int(os.environ.get('SCOUT_MAX_SHARDS', 0))  # cap on Scout prompts per analysis, 0 analyzes all feedback
+SCOUT_PACKING_POLICY = os.environ.get('SCOUT_PACKING_POLICY', 'diversity')  # file_order, diversity, recency or length
+SCOUT_TOKEN_ENCODING = os.environ.get('SCOUT_TOKEN_ENCODING')  # tiktoken encoding, defaults to the model's
+SCOUT_STREAMING = os.environ.get('SCOUT_STREAMING', 'true').lower() == 'true'  # single-prompt Scout runs only
+ANALYST_ISSUE_WORKERS = int(os.environ.get('ANALYST_ISSUE_WORKERS', 0))  # opt-in, 0 analyzes all issues in one task
+PREPROCESS_BATCH_SIZE = int(os.environ.get('PREPROCESS_BATCH_SIZE', 200))
+PREPROCESS_WORKERS = int(os.environ.get('PREPROCESS_WORKERS', 1))
+PREPROCESS_CHUNK_SIZE = int(os.environ.get('PREPROCESS_CHUNK_SIZE', 1))
+PREPROCESS_TOKENIZER = os.environ.get('PREPROCESS_TOKENIZER', 'nltk')
+TEXT_SPLIT_LINES = os.environ.get('TEXT_SPLIT_LINES', 'false').lower() == 'true'  # one record per line of .txt uploads
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 256))
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 86400))
+LLM_CACHE_DIR = os.environ.get('LLM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'kollab_llm_cache'))
+LLM_CACHE_MAX_DISK_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_DISK_ENTRIES', 2000))
+LLM_MAX_CONCURRENT = int(os.environ.get('LLM_MAX_CONCURRENT', 4))
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get('LLM_REQUESTS_PER_MINUTE', 0))  # 0 disables the limit
+LLM_TOKENS_PER_MINUTE = int(os.environ.get('LLM_TOKENS_PER_MINUTE', 0))  # 0 disables the limit
+LLM_COMPLETION_TOKENS = int(os.environ.get('LLM_COMPLETION_TOKENS', 1000))  # reserved per call until the response is known
+LLM_COMPANY_WEIGHTS = os.environ.get('LLM_COMPANY_WEIGHTS')  # e.g. 'acme=2,globex=0.5', others weigh 1
+TRACE_JSONL_PATH = os.environ.get('TRACE_JSONL_PATH')  # file pipeline spans are appended to, one JSON line each
+TRACE_COLLECTOR_URL = os.environ.get('TRACE_COLLECTOR_URL')  # endpoint finished traces are POSTed to
+KEYWORD_WORD_BOUNDARY = os.environ.get('KEYWORD_WORD_BOUNDARY', 'false').lower() == 'true'
+KEYWORD_DICTIONARIES_FILE = os.environ.get('KEYWORD_DICTIONARIES_FILE')  # JSON of per-company tag/team keywords
 
 # =============================
 # Logging Configuration
@@ -45,28 +92,123 @@ MONGODB_DB = os.environ.get('MONGODB_DB', 'KollabAgentic')
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# =============================
+# Tracing Initialization
+# =============================
+# Each analysis records timed spans per pipeline stage; exporters are optional
+trace_exporters = []
+if TRACE_JSONL_PATH:
+    trace_exporters.append(JsonlSpanExporter(TRACE_JSONL_PATH))
+if TRACE_COLLECTOR_URL:
+    trace_exporters.append(HttpCollectorExporter(TRACE_COLLECTOR_URL))
+tracer = Tracer(trace_exporters)
+
 # =============================
 # Text Preprocessor Initialization
 # =============================
-text_processor = TextPreprocessor()
+text_processor = TextPreprocessor(
+    batch_size=PREPROCESS_BATCH_SIZE,
+    workers=PREPROCESS_WORKERS,
+    chunk_size=PREPROCESS_CHUNK_SIZE,
+    tokenizer=PREPROCESS_TOKENIZER
+)
+# Stop the preprocessing worker processes when the server exits
+atexit.register(text_processor.close)
 
 # =============================
 # Storage Initialization
 # =============================
-try:
-    storage = MongoDBStorage(
-        connection_string=MONGODB_URI,
-        database_name=MONGODB_DB
+# Storage writes publish change events, fanned out to per-company Socket.IO rooms
+event_bus = EventBus()
+event_bus.subscribe(socketio_relay(socketio))
+
+# Falls back to SQLite when MongoDB is selected but unreachable
+storage = create_storage(
+    backend=STORAGE_BACKEND,
+    mongodb_uri=MONGODB_URI,
+    mongodb_db=MONGODB_DB,
+    sqlite_path=SQLITE_PATH,
+    mongodb_timeout_ms=MONGODB_TIMEOUT_MS,
+    cache_size=ANALYSIS_CACHE_MAX_ENTRIES,
+    cache_ttl=ANALYSIS_CACHE_TTL,
+    mongodb_max_pool_size=MONGODB_MAX_POOL_SIZE,
+    event_bus=event_bus
+)
+if EVENT_CHANGE_STREAMS:
+    storage.start_change_stream(event_bus)
+# Coroutine API over the same backend for async handlers and workers
+async_storage = AsyncAnalysisStorage(storage, max_workers=STORAGE_ASYNC_WORKERS)
+atexit.register(async_storage.shutdown)
+
+# =============================
+# Job Queue Initialization
+# =============================
+job_manager = JobManager(
+    socket_instance=socketio,
+    max_workers=JOB_WORKERS,
+    max_pending=JOB_QUEUE_LIMIT
+)
+
+# =============================
+# LLM Result Cache Initialization
+# =============================
+llm_cache = None
+if LLM_CACHE_ENABLED:
+    llm_cache = LLMResultCache(
+        max_entries=LLM_CACHE_MAX_ENTRIES,
+        ttl_seconds=LLM_CACHE_TTL,
+        cache_dir=LLM_CACHE_DIR or None,
+        max_disk_entries=LLM_CACHE_MAX_DISK_ENTRIES
     )
-    logger.info(f"Connected to MongoDB")
-except Exception as e:
-    logger.warning(f"MongoDB connection failed: {str(e)}.")
+
+# =============================
+# Keyword Matcher Initialization
+# =============================
+# Built once and shared by both agents
+keyword_matchers = KeywordMatcherRegistry(
+    company_dictionaries=load_company_dictionaries(KEYWORD_DICTIONARIES_FILE),
+    word_boundary=KEYWORD_WORD_BOUNDARY
+)
+
+# =============================
+# Prompt Packer Initialization
+# =============================
+# Falls back to a conservative token estimate when the tiktoken vocabulary is unavailable
+prompt_packer = PromptPacker(
+    token_counter=TokenCounter(model_name="azure/gpt-4o-mini", encoding_name=SCOUT_TOKEN_ENCODING),
+    policy=SCOUT_PACKING_POLICY
+)
+
+# =============================
+# LLM Scheduler Initialization
+# =============================
+# Every Scout and Analyst LLM call waits here for a slot, shared fairly between companies
+llm_scheduler = LLMScheduler(
+    max_concurrent=LLM_MAX_CONCURRENT,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE or None,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE or None,
+    company_weights=parse_company_weights(LLM_COMPANY_WEIGHTS),
+    completion_tokens=LLM_COMPLETION_TOKENS,
+    token_counter=prompt_packer.token_counter
+)
 
 # =============================
 # Agent Initialization
 # =============================
-scout = ScoutAgent(socket_instance=socketio)
-analyst = AnalystAgent(socket_instance=socketio)
+scout = ScoutAgent(
+    socket_instance=socketio,
+    max_workers=SCOUT_MAX_WORKERS,
+    shard_token_limit=SCOUT_SHARD_TOKENS,
+    cache=llm_cache,
+    dedup_threshold=SCOUT_DEDUP_THRESHOLD,
+    keyword_matchers=keyword_matchers,
+    prompt_packer=prompt_packer,
+    max_shards=SCOUT_MAX_SHARDS or None,
+    scheduler=llm_scheduler,
+    stream_llm=SCOUT_STREAMING
+)
+analyst = AnalystAgent(socket_instance=socketio, cache=llm_cache, keyword_matchers=keyword_matchers,
+                       scheduler=llm_scheduler, issue_workers=ANALYST_ISSUE_WORKERS)
 
 # Print debug info about template and static paths
 logger.info(f"Template directory: {app.template_folder}")
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncAnalysisStorage:
+    """
+    Asyncio front end for an AnalysisStorage backend
+
+    Exposes the storage method set as coroutines. The blocking driver
+    calls run on a bounded thread pool, so awaiting storage I/O frees the
+    event loop instead of holding a request thread, while the number of
+    concurrent storage calls stays within max_workers. Size it at or below
+    the MongoDB connection pool so calls never queue for a connection
+    inside the driver.
+    """
+    def __init__(self, storage, max_workers=8):
+        """
+        Wrap a storage backend
+
+        Args:
+            storage: AnalysisStorage instance doing the actual I/O
+            max_workers: Maximum storage calls in flight at the same time
+        """
+        self.storage = storage
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='storage-io')
+
+    async def _run(self, method, *args, **kwargs):
+        """Run a blocking storage method on the executor and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(method, *args, **kwargs))
+
+    async def save_analysis(self, analysis_data, company_id, ticket_id=None):
+        """Save an analysis, inserting or overwriting the ticket"""
+        return await self._run(self.storage.save_analysis, analysis_data, company_id, ticket_id)
+
+    async def save_analyses_bulk(self, items):
+        """Save many analyses given as dicts with 'analysis', 'company_id' and optional 'ticket_id'"""
+        return await self._run(self.storage.save_analyses_bulk, items)
+
+    async def get_analysis(self, company_id, ticket_id, full=False):
+        """Retrieve a specific analysis by ticket ID"""
+        return await self._run(self.storage.get_analysis, company_id, ticket_id, full=full)
+
+    async def get_all_analyses(self, company_id):
+        """Get the summaries of all analyses for a company, newest first"""
+        return await self._run(self.storage.get_all_analyses, company_id)
+
+    async def list_analyses(self, company_id, limit=20, cursor=None):
+        """Get one page of analysis summaries for a company, newest first"""
+        return await self._run(self.storage.list_analyses, company_id, limit=limit, cursor=cursor)
+
+    async def get_dashboard_stats(self, company_id, bucket='day'):
+        """Compute status, task, criticality, tag and time-bucket counts for a company"""
+        return await self._run(self.storage.get_dashboard_stats, company_id, bucket=bucket)
+
+    async def update_analysis_status(self, company_id, ticket_id, new_status):
+        """Update the status of an analysis"""
+        return await self._run(self.storage.update_analysis_status, company_id, ticket_id, new_status)
+
+    async def update_task_status(self, company_id, ticket_id, task_index, new_status):
+        """Update the status of a specific task within an analysis"""
+        return await self._run(self.storage.update_task_status, company_id, ticket_id, task_index, new_status)
+
+    async def update_task_statuses(self, company_id, changes):
+        """Apply many task status changes, recomputing each touched ticket once"""
+        return await self._run(self.storage.update_task_statuses, company_id, changes)
+
+    async def rebuild_summaries(self, company_id=None):
+        """Rebuild ticket summaries from the full analysis documents"""
+        return await self._run(self.storage.rebuild_summaries, company_id)
+
+    def start_change_stream(self, event_bus):
+        """Start the wrapped backend's change feed; it runs on its own thread, so this does not block"""
+        return self.storage.start_change_stream(event_bus)
+
+    def cache_stats(self):
+        """Return read-through cache counters of the wrapped storage"""
+        return self.storage.cache_stats()
+
+    def shutdown(self, wait=True):
+        """Stop the executor once in-flight storage calls are done"""
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache with optional per-entry TTL
+    """
+    def __init__(self, max_entries=256, ttl_seconds=None):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Maximum number of entries kept before evicting the least recently used
+            ttl_seconds: Optional time-to-live for entries, None keeps entries until evicted
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self.entries[key]
+                self.misses += 1
+                return default
+
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries if over capacity"""
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        """Remove a key from the cache if present"""
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """Remove all entries"""
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+class LLMResultCache:
+    """
+    Content-addressed cache for LLM outputs
+
+    Entries are keyed by a hash of the model name and the rendered task
+    description. Lookups check an in-memory LRU tier first and then an
+    optional on-disk tier that survives restarts.
+    """
+    def __init__(self, max_entries=256, ttl_seconds=86400, cache_dir=None, max_disk_entries=2000):
+        """
+        Initialize the LLM result cache
+
+        Args:
+            max_entries: Maximum entries in the in-memory tier
+            ttl_seconds: Time-to-live for entries in both tiers
+            cache_dir: Directory for the persistent tier, None disables it
+            max_disk_entries: Maximum files kept in the persistent tier
+        """
+        self.memory = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(model_name, description):
+        """Build the cache key for a model and rendered task description"""
+        digest = hashlib.sha256()
+        digest.update(str(model_name).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(str(description).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, model_name, description):
+        """
+        Look up a cached LLM output
+
+        Args:
+            model_name: Name of the model that produced the output
+            description: Rendered task description sent to the model
+
+        Returns:
+            Cached output string, or None on a miss
+        """
+        key = self.make_key(model_name, description)
+
+        value = self.memory.get(key)
+        if value is None and self.cache_dir:
+            value = self._read_disk(key)
+            if value is not None:
+                # Promote to the memory tier
+                self.memory.set(key, value)
+                with self.lock:
+                    self.disk_hits += 1
+
+        with self.lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        return value
+
+    def set(self, model_name, description, value):
+        """
+        Store an LLM output
+
+        Args:
+            model_name: Name of the model that produced the output
+            description: Rendered task description sent to the model
+            value: Output string to cache
+        """
+        key = self.make_key(model_name, description)
+        self.memory.set(key, value)
+        if self.cache_dir:
+            self._write_disk(key, model_name, value)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        """Read an entry from the persistent tier, dropping it if expired"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if self.ttl_seconds is not None and time.time() - entry.get('created_at', 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        return entry.get('value')
+
+    def _write_disk(self, key, model_name, value):
+        """Write an entry to the persistent tier and enforce its size limit"""
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'created_at': time.time(), 'model': model_name, 'value': value}, f)
+            os.replace(tmp_path, path)
+            self._evict_disk()
+        except OSError as e:
+            logger.warning(f"Failed to write LLM cache entry: {str(e)}")
+
+    def _evict_disk(self):
+        """Remove the oldest files once the persistent tier exceeds its limit"""
+        with self.lock:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith('.json')]
+            if len(entries) <= self.max_disk_entries:
+                return
+
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            for entry in entries[:len(entries) - self.max_disk_entries]:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Return hit/miss counters for both tiers"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'disk_hits': self.disk_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory': self.memory.stats()
+            }
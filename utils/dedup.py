@@ -0,0 +1,133 @@
+import re
+import zlib
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Mersenne-style prime just above 2**32 for the MinHash permutations
+MINHASH_PRIME = np.uint64(4294967311)
+
+WORD_PATTERN = re.compile(r'\w+')
+
+class NearDuplicateDetector:
+    """
+    Groups near-identical texts using MinHash signatures and LSH banding
+
+    Texts that normalize to the same string are grouped exactly. The rest
+    are fingerprinted with MinHash over word shingles; texts that share an
+    LSH band bucket and whose estimated Jaccard similarity reaches the
+    threshold are put in the same group. Texts without any word characters,
+    such as punctuation or emoji only, have nothing to compare and each
+    stay in a group of their own.
+    """
+    def __init__(self, threshold=0.8, num_perm=64, bands=16, shingle_size=3, seed=1):
+        """
+        Initialize the detector
+
+        Args:
+            threshold: Minimum estimated Jaccard similarity to treat texts as duplicates
+            num_perm: Number of MinHash permutations per signature
+            bands: Number of LSH bands; num_perm must divide evenly into them
+            shingle_size: Number of words per shingle
+            seed: Seed for the permutation coefficients
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        # Coefficients stay below 2**31 so a * hash + b fits in uint64
+        self.perm_a = rng.randint(1, 2**31 - 1, size=num_perm).astype(np.uint64)
+        self.perm_b = rng.randint(0, 2**31 - 1, size=num_perm).astype(np.uint64)
+
+    def normalize(self, text):
+        """Lowercase text and reduce it to its word tokens"""
+        return WORD_PATTERN.findall(str(text).lower())
+
+    def signature(self, words):
+        """
+        Compute the MinHash signature of a tokenized text
+
+        Args:
+            words: List of word tokens
+
+        Returns:
+            numpy array of num_perm minimum hash values
+        """
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {' '.join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        permuted = (self.perm_a[:, None] * hashes[None, :] + self.perm_b[:, None]) % MINHASH_PRIME
+        return permuted.min(axis=1)
+
+    def group(self, texts):
+        """
+        Group near-duplicate texts
+
+        Args:
+            texts: List of text strings
+
+        Returns:
+            List of groups, each a list of indices into texts; groups and their
+            members are ordered by first occurrence
+        """
+        parent = list(range(len(texts)))
+
+        def find(index):
+            while parent[index] != index:
+                parent[index] = parent[parent[index]]
+                index = parent[index]
+            return index
+
+        def union(first, second):
+            root_first, root_second = find(first), find(second)
+            if root_first != root_second:
+                # Keep the earliest occurrence as the root
+                if root_second < root_first:
+                    root_first, root_second = root_second, root_first
+                parent[root_second] = root_first
+
+        # Exact duplicates after normalization are grouped without hashing
+        exact = {}
+        unique_indices = []
+        unique_words = []
+        for index, text in enumerate(texts):
+            words = self.normalize(text)
+            if not words:
+                continue
+            key = ' '.join(words)
+            if key in exact:
+                union(exact[key], index)
+            else:
+                exact[key] = index
+                unique_indices.append(index)
+                unique_words.append(words)
+
+        # MinHash + LSH over the distinct texts
+        signatures = {}
+        buckets = {}
+        for index, words in zip(unique_indices, unique_words):
+            signature = self.signature(words)
+            signatures[index] = signature
+
+            for band in range(self.bands):
+                start = band * self.rows
+                key = (band, signature[start:start + self.rows].tobytes())
+                candidate = buckets.setdefault(key, index)
+                if candidate != index and find(candidate) != find(index):
+                    similarity = np.count_nonzero(signatures[candidate] == signature) / self.num_perm
+                    if similarity >= self.threshold:
+                        union(candidate, index)
+
+        groups = {}
+        for index in range(len(texts)):
+            groups.setdefault(find(index), []).append(index)
+
+        return [groups[root] for root in sorted(groups)]
@@ -0,0 +1,68 @@
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Socket.IO event carrying storage change events to dashboards
+STORAGE_EVENT = 'storage_event'
+
+
+def company_room(company_id):
+    """Name of the Socket.IO room dashboards of a company join"""
+    return f"company:{company_id}"
+
+
+class EventBus:
+    """
+    In-process publish/subscribe bus for storage change events
+
+    Events are small dicts with at least 'type', 'company_id' and
+    'ticket_id'. Handlers run synchronously on the publishing thread, so
+    they should be quick; a failing handler is logged and does not affect
+    the publisher or the other handlers.
+    """
+    def __init__(self):
+        self.handlers = []
+        self.lock = threading.Lock()
+
+    def subscribe(self, handler):
+        """
+        Register a handler called with every published event
+
+        Args:
+            handler: Callable taking the event dict
+
+        Returns:
+            Callable that removes the handler again
+        """
+        with self.lock:
+            # Copy on write so publish can iterate without holding the lock
+            self.handlers = self.handlers + [handler]
+
+        def unsubscribe():
+            with self.lock:
+                self.handlers = [registered for registered in self.handlers if registered is not handler]
+        return unsubscribe
+
+    def publish(self, event):
+        """Deliver an event to every subscribed handler"""
+        for handler in self.handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error(f"Event handler failed for {event.get('type')} event: {str(e)}")
+
+
+def socketio_relay(socket_instance):
+    """
+    Build an EventBus handler that fans events out to per-company Socket.IO rooms
+
+    Args:
+        socket_instance: SocketIO instance used to emit
+
+    Returns:
+        Handler to pass to EventBus.subscribe
+    """
+    def relay(event):
+        socket_instance.emit(STORAGE_EVENT, event, to=company_room(event['company_id']))
+    return relay
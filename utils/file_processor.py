@@ -8,6 +8,9 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Size of each read when incrementally parsing JSON files
+JSON_READ_SIZE = 64 * 1024
+
 def process_file(file_path):
     """
     Process uploaded files of various formats and extract content
@@ -26,6 +29,9 @@ def process_file(file_path):
         elif file_extension in ['.json']:
             return process_json(file_path), 'json'
         
+        elif file_extension in ['.ndjson', '.jsonl']:
+            return list(iter_ndjson_records(file_path)), 'ndjson'
+        
         elif file_extension in ['.docx']:
             return process_docx(file_path), 'docx'
         
@@ -117,6 +123,176 @@ def process_text(file_path):
     # Handle as a single document
     return [{'text': content}]
 
+def iter_records(file_path, chunk_size=1000, split_text_lines=False):
+    """
+    Stream records from an uploaded file without loading it all into memory
+    
+    CSV is read in pandas chunks, JSON arrays and NDJSON are parsed
+    incrementally, and CSV-like text files are read row by row. Excel, DOCX
+    and plain text (unless split_text_lines) cannot be streamed and fall
+    back to whole-file records.
+    
+    Args:
+        file_path: Path of the file to read
+        chunk_size: Number of rows pandas reads per CSV chunk
+        split_text_lines: Whether plain text yields one record per non-empty line
+            instead of one record for the whole file
+        
+    Returns:
+        Generator yielding one record at a time
+    """
+    file_extension = os.path.splitext(file_path)[1].lower()
+    
+    try:
+        if file_extension in ['.csv']:
+            yield from iter_csv_records(file_path, chunk_size)
+        
+        elif file_extension in ['.json']:
+            yield from iter_json_records(file_path)
+        
+        elif file_extension in ['.ndjson', '.jsonl']:
+            yield from iter_ndjson_records(file_path)
+        
+        elif file_extension in ['.txt']:
+            yield from iter_text_records(file_path, split_text_lines)
+        
+        else:
+            content, file_type = process_file(file_path)
+            yield from content
+            
+    except ValueError:
+        raise
+    except Exception as e:
+        logger.error(f"Error streaming file {file_path}: {str(e)}")
+        raise ValueError(f"Error processing file: {str(e)}")
+
+def iter_csv_records(file_path, chunk_size=1000):
+    """Stream CSV rows as records, reading the file in pandas chunks"""
+    yielded = False
+    try:
+        for chunk in pd.read_csv(file_path, chunksize=chunk_size):
+            for record in chunk.to_dict('records'):
+                yielded = True
+                yield record
+        return
+    except Exception:
+        # Rows already handed out can't be taken back, so only fall back before the first one
+        if yielded:
+            raise
+    
+    # Fallback to manual CSV processing if pandas fails
+    with open(file_path, 'r', encoding='utf-8') as f:
+        csv_reader = csv.reader(f)
+        headers = next(csv_reader, None)
+        
+        if not headers:
+            return
+        
+        for row in csv_reader:
+            if len(row) == len(headers):
+                yield {headers[i]: row[i] for i in range(len(headers))}
+
+def iter_json_records(file_path):
+    """
+    Incrementally parse a JSON file into records
+    
+    Handles a top-level array (each element is a record), a single object
+    (one record) and concatenated or newline-delimited objects.
+    """
+    decoder = json.JSONDecoder()
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer = ''
+        pos = 0
+        eof = False
+        in_array = None
+        
+        while True:
+            # Skip whitespace, and commas between array elements
+            while pos < len(buffer) and (buffer[pos].isspace() or (in_array and buffer[pos] == ',')):
+                pos += 1
+            
+            if pos >= len(buffer):
+                if eof:
+                    if in_array:
+                        raise ValueError("Unterminated JSON array")
+                    break
+                # Everything in the buffer has been consumed
+                buffer = f.read(JSON_READ_SIZE)
+                pos = 0
+                eof = not buffer
+                continue
+            
+            # Work out the file layout from the first significant character
+            if in_array is None:
+                in_array = buffer[pos] == '['
+                if in_array:
+                    pos += 1
+                continue
+            
+            if in_array and buffer[pos] == ']':
+                break
+            
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value ending exactly at the buffer edge (e.g. a number) may be truncated
+                if end == len(buffer) and not eof:
+                    raise json.JSONDecodeError("Value may continue in next block", buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = f.read(JSON_READ_SIZE)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            
+            yield value
+            pos = end
+            
+            # Drop consumed text so the buffer stays bounded
+            if pos > JSON_READ_SIZE:
+                buffer = buffer[pos:]
+                pos = 0
+
+def iter_ndjson_records(file_path):
+    """Stream newline-delimited JSON, one record per non-empty line"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def iter_text_records(file_path, split_lines=False):
+    """
+    Stream a plain text file
+    
+    CSV-like text is parsed row by row. Other text becomes one record for
+    the whole file, like process_text, or one record per non-empty line
+    when split_lines is set.
+    """
+    with open(file_path, 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+        
+        # If content seems to be CSV format, parse it row by row
+        if ',' in first_line:
+            headers = next(csv.reader([first_line]))
+            for row in csv.reader(f):
+                if len(row) == len(headers):
+                    yield {headers[i]: row[i] for i in range(len(headers))}
+            return
+        
+        if not split_lines:
+            # Handle as a single document
+            yield {'text': first_line + f.read()}
+            return
+        
+        if first_line.strip():
+            yield {'text': first_line.strip()}
+        for line in f:
+            if line.strip():
+                yield {'text': line.strip()}
+
 def extract_text_from_records(records):
     """Extract text content from a list of records for analysis"""
     texts = []
@@ -0,0 +1,164 @@
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Job lifecycle states
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED)
+
+
+class JobQueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+    pass
+
+
+class JobManager:
+    """
+    Runs long analysis jobs on a bounded worker pool and tracks their state
+    so clients can poll over HTTP or subscribe over Socket.IO
+    """
+    def __init__(self, socket_instance=None, max_workers=2, max_pending=50, retention_seconds=3600):
+        """
+        Initialize the job manager
+
+        Args:
+            socket_instance: SocketIO instance used to push job updates
+            max_workers: Number of jobs allowed to run at the same time
+            max_pending: Maximum number of queued and running jobs
+            retention_seconds: How long finished jobs are kept for polling
+        """
+        self.socketio = socket_instance
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, job_id=None, company_id=None, **kwargs):
+        """
+        Queue a job for execution on the worker pool
+
+        Args:
+            func: Callable to run; its return value becomes the job result
+            job_id: Optional job identifier, generated if not provided
+            company_id: Company the job belongs to
+
+        Returns:
+            Dict with the public job state
+        """
+        job_id = job_id or str(uuid.uuid4())
+
+        with self.lock:
+            self._prune_finished()
+            pending = sum(1 for job in self.jobs.values() if job['state'] not in FINISHED_STATES)
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"Job queue is full ({pending} jobs pending)")
+
+            self.jobs[job_id] = {
+                'job_id': job_id,
+                'company_id': company_id,
+                'state': JOB_QUEUED,
+                'message': 'Queued for analysis',
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'result': None,
+                'error': None
+            }
+
+        self.executor.submit(self._run, job_id, func, args, kwargs)
+        self._notify(job_id)
+        return self.get_job(job_id)
+
+    def _run(self, job_id, func, args, kwargs):
+        """Execute a job on a worker thread and record its outcome"""
+        self._update(job_id, state=JOB_RUNNING, started_at=time.time(), message='Analysis started')
+
+        try:
+            result = func(*args, **kwargs)
+
+            # Pipeline functions report failures as a dict with an error key
+            if isinstance(result, dict) and 'error' in result:
+                self._update(job_id, state=JOB_FAILED, error=result['error'], result=result,
+                             finished_at=time.time(), message=f"Error: {result['error']}")
+            else:
+                self._update(job_id, state=JOB_COMPLETED, result=result,
+                             finished_at=time.time(), message='Analysis complete')
+
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            self._update(job_id, state=JOB_FAILED, error=str(e),
+                         finished_at=time.time(), message=f'Error: {str(e)}')
+
+    def set_message(self, job_id, message):
+        """Record the latest progress message for a job"""
+        self._update(job_id, message=message)
+
+    def _update(self, job_id, **fields):
+        """Update job fields and push the new state to subscribers"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            job.update(fields)
+
+        self._notify(job_id)
+
+    def _notify(self, job_id):
+        """Emit the current job state to the job's Socket.IO room"""
+        if self.socketio:
+            job = self.get_job(job_id)
+            if job:
+                self.socketio.emit('job_update', job, to=job_id)
+
+    def _prune_finished(self):
+        """Drop finished jobs older than the retention window (lock must be held)"""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self.jobs.items()
+                   if job['state'] in FINISHED_STATES and job['finished_at'] and job['finished_at'] < cutoff]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+    def get_job(self, job_id, include_result=False):
+        """
+        Get the public state of a job
+
+        Args:
+            job_id: Job identifier
+            include_result: Whether to include the job result payload
+
+        Returns:
+            Dict with job state, or None if the job is unknown
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return None
+
+            job_state = {key: value for key, value in job.items() if key != 'result'}
+            if include_result and job['state'] in FINISHED_STATES:
+                job_state['result'] = job['result']
+
+        return job_state
+
+    def get_stats(self):
+        """Return counts of jobs by state"""
+        with self.lock:
+            counts = {JOB_QUEUED: 0, JOB_RUNNING: 0, JOB_COMPLETED: 0, JOB_FAILED: 0}
+            for job in self.jobs.values():
+                counts[job['state']] += 1
+
+        return {
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'jobs': counts
+        }
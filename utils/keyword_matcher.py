@@ -0,0 +1,290 @@
+import json
+import logging
+import threading
+from bisect import bisect_right
+from itertools import accumulate
+from collections import Counter
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+# Separator used when joining texts for dataset-wide keyword scans
+RECORD_SEPARATOR = '\x00'
+
+# Built-in dictionaries: group -> label -> keywords
+DEFAULT_DICTIONARIES = {
+    # Common tag categories to look for in feedback
+    'tags': {
+        'refund': ['refund', 'money back', 'return payment'],
+        'replacement': ['replacement', 'replace', 'new product'],
+        'update': ['update', 'upgrade', 'new version', 'software'],
+        'bug': ['bug', 'error', 'crash', 'not working'],
+        'feature': ['feature', 'add', 'missing', 'would be nice'],
+        'usability': ['difficult', 'confusing', 'hard to use', 'not intuitive'],
+        'performance': ['slow', 'lag', 'freeze', 'performance'],
+        'billing': ['bill', 'charge', 'subscription', 'payment'],
+        'support': ['support', 'help', 'service', 'contact'],
+        'quality': ['quality', 'poor', 'bad', 'excellent', 'good']
+    },
+    # Team names recognized in recommendation text
+    'teams': {
+        'Product': ['product'],
+        'Engineering': ['engineering'],
+        'Support': ['support'],
+        'QA': ['qa'],
+        'Marketing': ['marketing'],
+        'Sales': ['sales'],
+        'Design': ['design'],
+        'Customer Success': ['customer success'],
+        'Operations': ['operations'],
+        'Finance': ['finance']
+    }
+}
+
+
+def is_word_char(char):
+    """Return True for characters that continue a word"""
+    return char.isalnum() or char == '_'
+
+
+def merge_dictionaries(base, overrides):
+    """
+    Merge keyword dictionaries
+
+    Args:
+        base: Dictionaries as group -> label -> keywords
+        overrides: Dictionaries in the same shape; a label here replaces
+            the base keywords for that label, new labels are appended
+
+    Returns:
+        New merged dictionaries
+    """
+    merged = {group: dict(entries) for group, entries in base.items()}
+    for group, entries in (overrides or {}).items():
+        merged.setdefault(group, {}).update(entries)
+    return merged
+
+
+def load_company_dictionaries(path):
+    """
+    Load per-company keyword dictionaries from a JSON file
+
+    The file maps company IDs to dictionaries in the same shape as
+    DEFAULT_DICTIONARIES, e.g. {"acme": {"teams": {"Platform": ["platform"]}}}.
+
+    Args:
+        path: Path of the JSON file, or None
+
+    Returns:
+        Dict of company ID -> dictionaries, empty if the file is missing or invalid
+    """
+    if not path:
+        return {}
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            company_dictionaries = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load keyword dictionaries from {path}: {str(e)}")
+        return {}
+
+    if not isinstance(company_dictionaries, dict):
+        logger.warning(f"Keyword dictionaries in {path} must be a JSON object")
+        return {}
+
+    return company_dictionaries
+
+
+class KeywordMatcher:
+    """
+    Multi-pattern keyword matcher over labelled dictionaries
+
+    All keywords of all groups are compiled into one Aho-Corasick automaton
+    so a text is scanned once for every tag and team. Matching is
+    case-insensitive and, when word_boundary is set, a keyword only matches
+    where it is not part of a longer word. Without the pyahocorasick package
+    each keyword is located with str.find instead, which gives the same
+    results.
+    """
+    def __init__(self, dictionaries=None, word_boundary=False):
+        """
+        Build the matcher
+
+        Args:
+            dictionaries: Dict of group -> label -> keywords, defaults to DEFAULT_DICTIONARIES
+            word_boundary: Whether keywords must match whole words
+        """
+        dictionaries = DEFAULT_DICTIONARIES if dictionaries is None else dictionaries
+        self.word_boundary = word_boundary
+
+        # Labels per group keep dictionary order so results are stable
+        self.labels = {}
+        # Keyword -> list of (group, label) it signals
+        self.keywords = {}
+        for group, entries in dictionaries.items():
+            self.labels[group] = list(entries)
+            for label, keywords in entries.items():
+                for keyword in keywords:
+                    keyword = str(keyword).lower()
+                    if not keyword or RECORD_SEPARATOR in keyword:
+                        continue
+                    targets = self.keywords.setdefault(keyword, [])
+                    if (group, label) not in targets:
+                        targets.append((group, label))
+
+        self.automaton = None
+        if ahocorasick is not None and self.keywords:
+            self.automaton = ahocorasick.Automaton()
+            for keyword, targets in self.keywords.items():
+                self.automaton.add_word(keyword, (len(keyword), targets))
+            self.automaton.make_automaton()
+
+    def _is_bounded(self, text, start, end):
+        """Check that text[start:end] is not part of a longer word"""
+        if not self.word_boundary:
+            return True
+        if start > 0 and is_word_char(text[start - 1]):
+            return False
+        if end < len(text) and is_word_char(text[end]):
+            return False
+        return True
+
+    def _record_hits(self, blob, record_starts, groups=None):
+        """
+        Find which records contain each label's keywords
+
+        Args:
+            blob: Lowercased record texts joined with RECORD_SEPARATOR
+            record_starts: Sorted offsets where each record starts in blob
+            groups: Optional collection of groups to report
+
+        Returns:
+            Dict of (group, label) -> set of positions into record_starts
+        """
+        hits = {}
+
+        if self.automaton is not None:
+            # Single pass over the blob reporting every keyword occurrence
+            for end, (length, targets) in self.automaton.iter(blob):
+                start = end - length + 1
+                if not self._is_bounded(blob, start, end + 1):
+                    continue
+                record = bisect_right(record_starts, start) - 1
+                for target in targets:
+                    if groups is None or target[0] in groups:
+                        hits.setdefault(target, set()).add(record)
+            return hits
+
+        for keyword, targets in self.keywords.items():
+            targets = [target for target in targets if groups is None or target[0] in groups]
+            if not targets:
+                continue
+
+            matched = set()
+            position = blob.find(keyword)
+            while position != -1:
+                if not self._is_bounded(blob, position, position + len(keyword)):
+                    position = blob.find(keyword, position + 1)
+                    continue
+                record = bisect_right(record_starts, position) - 1
+                matched.add(record)
+                # One hit is enough per record, resume at the next one
+                if record + 1 >= len(record_starts):
+                    break
+                position = blob.find(keyword, record_starts[record + 1])
+
+            if matched:
+                for target in targets:
+                    hits.setdefault(target, set()).update(matched)
+
+        return hits
+
+    def find(self, text, groups=None):
+        """
+        Find every label whose keywords occur in a text
+
+        Args:
+            text: Text to scan
+            groups: Optional collection of groups to report, defaults to all
+
+        Returns:
+            Dict of group -> list of matched labels in dictionary order
+        """
+        hits = self._record_hits(str(text).lower(), [0], groups)
+        return {
+            group: [label for label in labels if (group, label) in hits]
+            for group, labels in self.labels.items()
+            if groups is None or group in groups
+        }
+
+    def count_records(self, texts, group):
+        """
+        Count how many texts match each label of a group
+
+        Args:
+            texts: List of text strings
+            group: Dictionary group to count, e.g. 'tags'
+
+        Returns:
+            Counter of label -> number of matching texts, with labels inserted
+            in order of their first matching text
+        """
+        texts = [str(text).lower() for text in texts]
+        if not texts:
+            return Counter()
+
+        blob = RECORD_SEPARATOR.join(texts)
+        record_starts = list(accumulate([len(text) + 1 for text in texts[:-1]], initial=0))
+        hits = self._record_hits(blob, record_starts, {group})
+
+        # Order labels by first matching text, then by dictionary order within it
+        order = {label: index for index, label in enumerate(self.labels[group])}
+        first_hits = sorted((min(records), order[label], label, len(records))
+                            for (_, label), records in hits.items())
+
+        counts = Counter()
+        for _, _, label, count in first_hits:
+            counts[label] = count
+        return counts
+
+
+class KeywordMatcherRegistry:
+    """
+    Builds keyword matchers once and hands out the right one per company
+
+    Companies without their own dictionaries share the default matcher.
+    A company matcher merges the company's dictionaries over the defaults
+    and is built on first use.
+    """
+    def __init__(self, dictionaries=None, company_dictionaries=None, word_boundary=False):
+        """
+        Initialize the registry and build the default matcher
+
+        Args:
+            dictionaries: Default dictionaries, defaults to DEFAULT_DICTIONARIES
+            company_dictionaries: Dict of company ID -> dictionaries merged over the defaults
+            word_boundary: Whether keywords must match whole words
+        """
+        self.dictionaries = DEFAULT_DICTIONARIES if dictionaries is None else dictionaries
+        self.company_dictionaries = company_dictionaries or {}
+        self.word_boundary = word_boundary
+        self.default = KeywordMatcher(self.dictionaries, word_boundary)
+        self.matchers = {}
+        self.lock = threading.Lock()
+
+    def get(self, company_id=None):
+        """Return the matcher for a company, falling back to the default matcher"""
+        if company_id not in self.company_dictionaries:
+            return self.default
+
+        with self.lock:
+            matcher = self.matchers.get(company_id)
+            if matcher is None:
+                dictionaries = merge_dictionaries(self.dictionaries, self.company_dictionaries[company_id])
+                matcher = KeywordMatcher(dictionaries, self.word_boundary)
+                self.matchers[company_id] = matcher
+            return matcher
@@ -0,0 +1,287 @@
+import time
+import heapq
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Length of the sliding window the per-minute budgets are enforced over
+BUDGET_WINDOW_SECONDS = 60
+
+# Number of recent queue waits kept for the wait-time percentiles
+WAIT_SAMPLE_SIZE = 1000
+
+
+def parse_company_weights(value):
+    """
+    Parse company scheduling weights from a 'company=weight,...' string
+
+    Args:
+        value: String such as 'acme=2,globex=0.5', empty or None for no weights
+
+    Returns:
+        Dict mapping company_id to a positive float weight
+    """
+    weights = {}
+    for pair in (value or '').split(','):
+        if not pair.strip():
+            continue
+        company_id, _, weight = pair.partition('=')
+        try:
+            weight = float(weight)
+        except ValueError:
+            weight = 0
+        if not company_id.strip() or weight <= 0:
+            logger.warning(f"Ignoring invalid LLM scheduler weight '{pair.strip()}'")
+            continue
+        weights[company_id.strip()] = weight
+    return weights
+
+
+class _Request:
+    """A queued LLM call waiting for a slot"""
+    __slots__ = ('company_id', 'tokens', 'finish_tag', 'start_tag', 'enqueued_at', 'record')
+
+    def __init__(self, company_id, tokens, start_tag, finish_tag, enqueued_at):
+        self.company_id = company_id
+        self.tokens = tokens
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.enqueued_at = enqueued_at
+        # [dispatch time, tokens, expired] entry in the budget window, set on dispatch
+        self.record = None
+
+
+class LLMScheduler:
+    """
+    Admits LLM calls under a global concurrency cap and per-minute budgets
+
+    Waiting calls are ordered by start-time fair queuing keyed by company:
+    each call is tagged with a virtual finish time that advances by its
+    token cost divided by the company's weight, and the call with the
+    smallest tag is admitted next. A company submitting many large prompts
+    therefore only gets its weighted share of the slots while others are
+    waiting, and a company that was idle starts at the current virtual time
+    instead of having built up credit.
+
+    The request and token budgets are enforced over a sliding 60 second
+    window of admitted calls. A call's tokens are reserved on admission from
+    its prompt plus an expected completion size, and corrected to the
+    actual prompt and response size once it returns.
+    """
+    def __init__(self, max_concurrent=4, requests_per_minute=None, tokens_per_minute=None,
+                 company_weights=None, completion_tokens=1000, token_counter=None):
+        """
+        Initialize the scheduler
+
+        Args:
+            max_concurrent: Maximum LLM calls in flight at the same time
+            requests_per_minute: Maximum calls admitted per minute, None for no limit
+            tokens_per_minute: Maximum prompt plus completion tokens per minute, None for no limit
+            company_weights: Optional dict of company_id to share weight, others weigh 1
+            completion_tokens: Completion tokens reserved per call until its actual size is known
+            token_counter: Optional TokenCounter used to price prompts and responses
+        """
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute or None
+        self.tokens_per_minute = tokens_per_minute or None
+        self.company_weights = dict(company_weights or {})
+        self.completion_tokens = completion_tokens
+        self.token_counter = token_counter
+
+        self.condition = threading.Condition()
+        self.queue = []  # heap of (finish_tag, sequence, request)
+        self.sequence = 0
+        self.virtual_time = 0.0
+        self.last_finish = {}  # company_id -> finish tag of its latest queued call
+        self.active = 0
+        self.window = deque()  # [dispatch time, tokens, expired] of calls admitted in the budget window
+        self.window_tokens = 0
+
+        # Metrics
+        self.companies = {}
+        self.dispatched = 0
+        self.failed = 0
+        self.budget_waits = 0
+        self.waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self.max_wait = 0.0
+
+    def _company(self, company_id):
+        """Return the per-company counters, creating them on first use"""
+        counters = self.companies.get(company_id)
+        if counters is None:
+            counters = self.companies[company_id] = {'queued': 0, 'active': 0, 'dispatched': 0, 'wait_seconds': 0.0}
+        return counters
+
+    def _expire_window(self, now):
+        """Drop admitted calls that have left the budget window"""
+        while self.window and self.window[0][0] <= now - BUDGET_WINDOW_SECONDS:
+            record = self.window.popleft()
+            self.window_tokens -= record[1]
+            # A call still running past the window must not correct the total on release
+            record[2] = True
+
+    def _budget_wait(self, tokens, now):
+        """Return the seconds until a call of the given size fits the budgets, 0 if it fits now"""
+        self._expire_window(now)
+        wait = 0.0
+
+        if self.requests_per_minute and len(self.window) >= self.requests_per_minute:
+            oldest = self.window[len(self.window) - self.requests_per_minute]
+            wait = max(wait, oldest[0] + BUDGET_WINDOW_SECONDS - now)
+
+        if self.tokens_per_minute and self.window and self.window_tokens + tokens > self.tokens_per_minute:
+            # Wait for enough of the oldest calls to expire; a call larger than
+            # the whole budget is admitted once the window is empty
+            excess = self.window_tokens + tokens - self.tokens_per_minute
+            for dispatched_at, record_tokens, _ in self.window:
+                excess -= record_tokens
+                if excess <= 0:
+                    break
+            wait = max(wait, dispatched_at + BUDGET_WINDOW_SECONDS - now)
+
+        return wait
+
+    def acquire(self, company_id=None, tokens=0):
+        """
+        Block until a call may run and claim a slot for it
+
+        Args:
+            company_id: Company the call is made for
+            tokens: Estimated prompt plus completion tokens of the call
+
+        Returns:
+            Request handle to pass to release
+        """
+        with self.condition:
+            now = time.monotonic()
+            weight = self.company_weights.get(company_id, 1.0)
+            start_tag = max(self.virtual_time, self.last_finish.get(company_id, 0.0))
+            finish_tag = start_tag + max(tokens, 1) / weight
+            self.last_finish[company_id] = finish_tag
+
+            request = _Request(company_id, tokens, start_tag, finish_tag, now)
+            self.sequence += 1
+            heapq.heappush(self.queue, (finish_tag, self.sequence, request))
+            self._company(company_id)['queued'] += 1
+
+            budget_limited = False
+            while True:
+                if self.queue[0][2] is request and self.active < self.max_concurrent:
+                    wait = self._budget_wait(tokens, time.monotonic())
+                    if wait <= 0:
+                        break
+                    if not budget_limited:
+                        budget_limited = True
+                        self.budget_waits += 1
+                    self.condition.wait(wait)
+                else:
+                    self.condition.wait()
+
+            heapq.heappop(self.queue)
+            now = time.monotonic()
+            self.virtual_time = max(self.virtual_time, start_tag)
+            if not self.queue:
+                # Nobody is behind the current virtual time, so past tags no longer matter
+                self.last_finish = {company: tag for company, tag in self.last_finish.items() if tag > self.virtual_time}
+
+            request.record = [now, tokens, False]
+            self.window.append(request.record)
+            self.window_tokens += tokens
+            self.active += 1
+
+            waited = now - request.enqueued_at
+            self.waits.append(waited)
+            self.max_wait = max(self.max_wait, waited)
+            self.dispatched += 1
+            counters = self._company(company_id)
+            counters['queued'] -= 1
+            counters['active'] += 1
+            counters['dispatched'] += 1
+            counters['wait_seconds'] += waited
+
+            # The next call in line may be admissible as well
+            self.condition.notify_all()
+            return request
+
+    def release(self, request, used_tokens=None, failed=False):
+        """
+        Free the slot of a finished call
+
+        Args:
+            request: Handle returned by acquire
+            used_tokens: Actual tokens of the call, replaces the estimate in the token budget
+            failed: Whether the call raised
+        """
+        with self.condition:
+            if used_tokens is not None and not request.record[2]:
+                self.window_tokens += used_tokens - request.record[1]
+                request.record[1] = used_tokens
+            self.active -= 1
+            self._company(request.company_id)['active'] -= 1
+            if failed:
+                self.failed += 1
+            self.condition.notify_all()
+
+    def count_tokens(self, text):
+        """Price text with the token counter, 0 when the scheduler has none"""
+        return self.token_counter.count(text) if self.token_counter and text else 0
+
+    def run(self, func, company_id=None, prompt=None):
+        """
+        Run an LLM call once the scheduler admits it
+
+        Args:
+            func: Callable making the LLM call
+            company_id: Company the call is made for
+            prompt: Prompt text, used to size the call for the token budget
+
+        Returns:
+            The return value of func
+        """
+        prompt_tokens = self.count_tokens(prompt)
+        request = self.acquire(company_id, prompt_tokens + self.completion_tokens)
+        try:
+            result = func()
+        except Exception:
+            self.release(request, failed=True)
+            raise
+        used_tokens = prompt_tokens + self.count_tokens(str(result)) if self.token_counter else None
+        self.release(request, used_tokens=used_tokens)
+        return result
+
+    def stats(self):
+        """Return queue depth, wait time and budget usage counters"""
+        with self.condition:
+            self._expire_window(time.monotonic())
+            waits = sorted(self.waits)
+            return {
+                'max_concurrent': self.max_concurrent,
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'active': self.active,
+                'queue_depth': len(self.queue),
+                'dispatched': self.dispatched,
+                'failed': self.failed,
+                'budget_waits': self.budget_waits,
+                'window_requests': len(self.window),
+                'window_tokens': self.window_tokens,
+                'wait_seconds': {
+                    'avg': sum(waits) / len(waits) if waits else 0.0,
+                    'p95': waits[int(len(waits) * 0.95)] if waits else 0.0,
+                    'max': self.max_wait
+                },
+                'companies': {
+                    str(company_id): {
+                        'weight': self.company_weights.get(company_id, 1.0),
+                        'queued': counters['queued'],
+                        'active': counters['active'],
+                        'dispatched': counters['dispatched'],
+                        'avg_wait_seconds': counters['wait_seconds'] / counters['dispatched'] if counters['dispatched'] else 0.0
+                    }
+                    for company_id, counters in self.companies.items()
+                }
+            }
@@ -1,43 +1,119 @@
 import time
+import zlib
 import logging
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
-from bson.objectid import ObjectId
+import threading
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument, UpdateOne, ReplaceOne
+from pymongo.errors import PyMongoError, BulkWriteError
+from utils.storage import AnalysisStorage
 
 logger = logging.getLogger(__name__)
 
-class MongoDBStorage:
+class MongoDBStorage(AnalysisStorage):
     """
     Handles MongoDB storage operations for analysis results
     """
-    def __init__(self, connection_string="mongodb://localhost:27017/", database_name="KollabAgentic"):
+    # $slice count meaning "to the end of the array" (largest int32)
+    MAX_ARRAY_SLICE = 2**31 - 1
+    
+    # Indexes created at startup: collection -> list of (name, keys, options)
+    INDEXES = {
+        'companies_tickets': [
+            ('company_ticket', [("company_id", ASCENDING), ("ticket_id", ASCENDING)], {'unique': True}),
+            ('company_saved_at', [("company_id", ASCENDING), ("metadata.saved_at", DESCENDING)], {}),
+        ],
+        'ticket_summaries': [
+            ('company_ticket', [("company_id", ASCENDING), ("ticket_id", ASCENDING)], {'unique': True}),
+            ('company_created_at', [("company_id", ASCENDING), ("created_at", DESCENDING),
+                                    ("ticket_id", DESCENDING)], {}),
+        ],
+        'analysis_payloads': [
+            ('company_ticket', [("company_id", ASCENDING), ("ticket_id", ASCENDING)], {'unique': True}),
+        ],
+    }
+    
+    def __init__(self, connection_string="mongodb://localhost:27017/", database_name="KollabAgentic",
+                 server_selection_timeout_ms=30000, cache_size=256, cache_ttl=300, max_pool_size=100,
+                 event_bus=None):
         """
         Initialize MongoDB connection
         
         Args:
             connection_string: MongoDB connection URI
             database_name: Name of database to use
+            server_selection_timeout_ms: How long to wait for a reachable server
+            cache_size: Maximum analyses in the read-through cache, 0 disables it
+            cache_ttl: Time-to-live of cached analyses in seconds
+            max_pool_size: Maximum connections the client opens to each server
+            event_bus: Optional EventBus receiving change events after writes
         """
         self.connection_string = connection_string
         self.database_name = database_name
+        self.server_selection_timeout_ms = server_selection_timeout_ms
+        self.max_pool_size = max_pool_size
+        self.event_bus = event_bus
         self.client = None
         self.db = None
+        self._init_analysis_cache(cache_size, cache_ttl)
         self._connect()
+        self._ensure_indexes()
         
     def _connect(self):
         """Establish connection to MongoDB"""
         try:
-            self.client = MongoClient(self.connection_string)
+            self.client = MongoClient(self.connection_string,
+                                      serverSelectionTimeoutMS=self.server_selection_timeout_ms,
+                                      maxPoolSize=self.max_pool_size)
+            # The client connects lazily; ping so an unreachable server fails here
+            self.client.admin.command('ping')
             self.db = self.client[self.database_name]
             logger.info(f"Connected to MongoDB database: {self.database_name}")
         except PyMongoError as e:
             logger.error(f"Failed to connect to MongoDB: {str(e)}")
             raise
     
+    def _ensure_indexes(self):
+        """
+        Create the indexes the storage queries rely on and verify they exist
+        
+        Index creation is idempotent. Failures, e.g. a unique index that
+        conflicts with existing duplicate tickets, are logged rather than
+        raised so the app can still start.
+        
+        Returns:
+            True if every index is present
+        """
+        all_present = True
+        for collection_name, indexes in self.INDEXES.items():
+            collection = self.db[collection_name]
+            for name, keys, options in indexes:
+                try:
+                    collection.create_index(keys, name=name, **options)
+                except PyMongoError as e:
+                    logger.error(f"Failed to create index {name} on {collection_name}: {str(e)}")
+            
+            try:
+                existing = collection.index_information()
+            except PyMongoError as e:
+                logger.error(f"Failed to verify indexes on {collection_name}: {str(e)}")
+                all_present = False
+                continue
+            
+            missing = [name for name, keys, options in indexes if name not in existing]
+            if missing:
+                logger.warning(f"Missing indexes on {collection_name}: {', '.join(missing)}")
+                all_present = False
+        
+        return all_present
+    
     def save_analysis(self, analysis_data, company_id, ticket_id=None):
         """
         Save analysis data to MongoDB
         
+        Takes three writes: an upsert of the ticket document (no lookup
+        first), an upsert of its compressed payload and a replace of its
+        dashboard summary. Use save_analyses_bulk to save many analyses with
+        one bulk write per collection.
+        
         Args:
             analysis_data: Dict containing analysis results
             company_id: Company identifier for organizing data
@@ -47,48 +123,27 @@ class MongoDBStorage:
             Dict with status and ticket_id
         """
         try:
-            # Generate ticket ID if not provided
-            if not ticket_id:
-                timestamp = int(time.time())
-                ticket_id = f"{company_id}_{timestamp}"
-            
-            # Add status field if not present
-            if 'status' not in analysis_data:
-                analysis_data['status'] = 'new'
-                
-            # Add metadata if not present
-            if 'metadata' not in analysis_data:
-                analysis_data['metadata'] = {}
-                
-            # Add save timestamp
-            analysis_data['metadata']['saved_at'] = int(time.time())
-            analysis_data['ticket_id'] = ticket_id
-            analysis_data['company_id'] = company_id
-            
-            # Initialize task status if not present in issues
-            if 'final_report' in analysis_data and 'issues' in analysis_data['final_report']:
-                for issue in analysis_data['final_report']['issues']:
-                    if 'status' not in issue:
-                        issue['status'] = 'new'
-            
-            # Create a clean copy without any ObjectId that might be present
-            # This ensures we don't have serialization issues later
-            analysis_data_clean = self._ensure_serializable(analysis_data)
-            
-            # Check if a document for this ticket_id already exists
-            existing_doc = self.db.companies_tickets.find_one({"ticket_id": ticket_id})
-            
-            if existing_doc:
-                # Update existing document
-                result = self.db.companies_tickets.update_one(
-                    {"ticket_id": ticket_id},
-                    {"$set": analysis_data_clean}
-                )
-                logger.info(f"Updated existing analysis in MongoDB, ticket_id: {ticket_id}")
-            else:
-                # Insert new document
-                result = self.db.companies_tickets.insert_one(analysis_data_clean)
+            document = self._prepare_analysis(analysis_data, company_id, ticket_id)
+            ticket_id = document['ticket_id']
+            payload = self._split_payload(document)
+            
+            # An upsert inserts new tickets and overwrites existing ones without a lookup
+            result = self.db.companies_tickets.update_one(
+                {"company_id": company_id, "ticket_id": ticket_id},
+                self._analysis_update(document, payload),
+                upsert=True
+            )
+            if payload:
+                self._save_payload(company_id, ticket_id, payload)
+            if result.upserted_id is not None:
                 logger.info(f"Saved new analysis to MongoDB, ticket_id: {ticket_id}")
+            else:
+                logger.info(f"Updated existing analysis in MongoDB, ticket_id: {ticket_id}")
+            
+            # Keep the dashboard summary in step with the full document
+            self._save_summary(document)
+            self._invalidate_analysis(company_id, ticket_id)
+            self._publish_saved(document)
             
             return {
                 'success': True,
@@ -101,29 +156,150 @@ class MongoDBStorage:
                 'success': False,
                 'error': str(e)
             }
-
-    def _ensure_serializable(self, data):
+    
+    def save_analyses_bulk(self, items):
         """
-        Recursively process a dictionary to ensure all values are JSON serializable
+        Save many analyses with one unordered bulk write
+        
+        Intended for backfills and imports. A failing item does not stop the
+        others from being written.
         
         Args:
-            data: Dict or list to process
+            items: List of dicts with 'analysis', 'company_id' and an optional 'ticket_id'
             
         Returns:
-            Dict or list with all values being JSON serializable
+            Dict with saved/failed counts and a per-item list of results in input order
         """
-        if isinstance(data, dict):
-            return {k: self._ensure_serializable(v) for k, v in data.items() if k != '_id'}
-        elif isinstance(data, list):
-            return [self._ensure_serializable(item) for item in data]
-        elif isinstance(data, ObjectId):
-            return str(data)  # Convert ObjectId to string
-        else:
-            return data
+        results = [None] * len(items)
+        documents = []
+        operations = []
+        
+        for index, item in enumerate(items):
+            company_id = item.get('company_id')
+            if not company_id or not isinstance(item.get('analysis'), dict):
+                results[index] = {'success': False, 'error': 'Missing analysis or company_id'}
+                continue
+            
+            # Suffix generated ticket IDs so items saved in the same second don't collide
+            ticket_id = item.get('ticket_id') or f"{company_id}_{int(time.time())}_{index}"
+            document = self._prepare_analysis(item['analysis'], company_id, ticket_id)
+            payload = self._split_payload(document)
+            documents.append((index, document, payload))
+            operations.append(UpdateOne(
+                {"company_id": company_id, "ticket_id": ticket_id},
+                self._analysis_update(document, payload),
+                upsert=True
+            ))
+        
+        write_errors = {}
+        if operations:
+            try:
+                self.db.companies_tickets.bulk_write(operations, ordered=False)
+            except BulkWriteError as e:
+                for error in e.details.get('writeErrors', []):
+                    write_errors[error['index']] = error.get('errmsg', 'Write failed')
+            except PyMongoError as e:
+                logger.error(f"Error bulk saving analyses to MongoDB: {str(e)}")
+                write_errors = {position: str(e) for position in range(len(operations))}
+        
+        saved_documents = []
+        payload_operations = []
+        for position, (index, document, payload) in enumerate(documents):
+            if position in write_errors:
+                results[index] = {'success': False, 'ticket_id': document['ticket_id'], 'error': write_errors[position]}
+            else:
+                results[index] = {'success': True, 'ticket_id': document['ticket_id']}
+                saved_documents.append(document)
+                if payload:
+                    payload_operations.append(UpdateOne(
+                        {"company_id": document['company_id'], "ticket_id": document['ticket_id']},
+                        {"$set": payload},
+                        upsert=True
+                    ))
+            self._invalidate_analysis(document['company_id'], document['ticket_id'])
+        
+        if payload_operations:
+            try:
+                self.db.analysis_payloads.bulk_write(payload_operations, ordered=False)
+            except PyMongoError as e:
+                logger.error(f"Error bulk saving analysis payloads to MongoDB: {str(e)}")
+        
+        if saved_documents:
+            try:
+                self.db.ticket_summaries.bulk_write([
+                    ReplaceOne({"company_id": summary['company_id'], "ticket_id": summary['ticket_id']},
+                               summary, upsert=True)
+                    for summary in map(self._build_summary, saved_documents)
+                ], ordered=False)
+            except PyMongoError as e:
+                # Analyses are saved; summaries can be rebuilt with rebuild_summaries()
+                logger.error(f"Error bulk saving ticket summaries to MongoDB: {str(e)}")
+            for document in saved_documents:
+                self._publish_saved(document)
+        
+        saved = len(saved_documents)
+        logger.info(f"Bulk saved {saved} of {len(items)} analyses to MongoDB")
+        return {
+            'success': saved == len(items),
+            'saved': saved,
+            'failed': len(items) - saved,
+            'results': results
+        }
+    
+    def _analysis_update(self, document, payload):
+        """Build the update for a main document, dropping payload fields embedded by older saves"""
+        update = {"$set": document}
+        if payload:
+            update["$unset"] = {field: "" for field in payload}
+        return update
+    
+    def _save_payload(self, company_id, ticket_id, payload):
+        """Write compressed payload fields to the analysis_payloads collection"""
+        self.db.analysis_payloads.update_one(
+            {"company_id": company_id, "ticket_id": ticket_id},
+            {"$set": payload},
+            upsert=True
+        )
+    
+    def _save_summary(self, analysis_data):
+        """Write the summary of an analysis document to the ticket_summaries collection"""
+        summary = self._build_summary(analysis_data)
+        self.db.ticket_summaries.replace_one(
+            {"company_id": summary['company_id'], "ticket_id": summary['ticket_id']},
+            summary,
+            upsert=True
+        )
+    
+    def rebuild_summaries(self, company_id=None):
+        """
+        Rebuild ticket summaries from the full analysis documents
+        
+        Used to backfill summaries for tickets saved before the summary
+        collection existed.
+        
+        Args:
+            company_id: Optional company to rebuild, defaults to all companies
+            
+        Returns:
+            Number of summaries written
+        """
+        query = {"company_id": company_id} if company_id else {}
+        projection = {
+            "_id": 0, "company_id": 1, "ticket_id": 1, "status": 1, "query": 1,
+            "metadata.saved_at": 1, "final_report.executive_summary": 1, "final_report.issues.status": 1
+        }
+        
+        count = 0
+        for analysis_data in self.db.companies_tickets.find(query, projection):
+            self._save_summary(analysis_data)
+            count += 1
+        
+        logger.info(f"Rebuilt {count} ticket summaries")
+        return count
 
-    def get_analysis(self, company_id, ticket_id):
+    def _load_analysis(self, company_id, ticket_id):
         """
-        Retrieve a specific analysis by ticket ID
+        Retrieve a specific analysis by ticket ID from MongoDB
         
         Args:
             company_id: Company identifier
@@ -133,10 +309,12 @@ class MongoDBStorage:
             Dict containing the analysis data or error
         """
         try:
-            # Find document by ticket_id
+            # Find document by ticket_id, leaving out payload fields embedded by older saves
+            projection = {"_id": 0}
+            projection.update({field: 0 for field in self.PAYLOAD_FIELDS})
             analysis_data = self.db.companies_tickets.find_one(
                 {"ticket_id": ticket_id, "company_id": company_id},
-                {"_id": 0}  # Exclude MongoDB _id from results
+                projection
             )
             
             if not analysis_data:
@@ -154,10 +332,51 @@ class MongoDBStorage:
                 'error': str(e)
             }
     
+    def _load_payload(self, company_id, ticket_id):
+        """
+        Read the compressed payload fields of an analysis
+        
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            
+        Returns:
+            Dict containing the decompressed payload fields or error
+        """
+        query = {"company_id": company_id, "ticket_id": ticket_id}
+        try:
+            stored = self.db.analysis_payloads.find_one(query, {"_id": 0, "company_id": 0, "ticket_id": 0}) or {}
+            payload = {
+                field: self._decompress_payload(stored[field])
+                for field in self.PAYLOAD_FIELDS if field in stored
+            }
+            
+            # Tickets saved before payloads were split out still embed them
+            missing = [field for field in self.PAYLOAD_FIELDS if field not in payload]
+            if missing:
+                projection = {"_id": 0}
+                projection.update({field: 1 for field in missing})
+                payload.update(self.db.companies_tickets.find_one(query, projection) or {})
+            
+            return {
+                'success': True,
+                'data': payload
+            }
+            
+        except (PyMongoError, zlib.error, ValueError) as e:
+            logger.error(f"Error retrieving analysis payload from MongoDB: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def get_all_analyses(self, company_id):
         """
         Get all analyses for a company
         
+        Reads the materialized ticket summaries, so the cost does not depend
+        on the size of the full reports.
+        
         Args:
             company_id: Company identifier
             
@@ -165,49 +384,20 @@ class MongoDBStorage:
             List of analysis summary objects
         """
         try:
-            # Find all documents for this company_id
-            cursor = self.db.companies_tickets.find(
+            # Newest first, sorted by the database
+            cursor = self.db.ticket_summaries.find(
                 {"company_id": company_id},
-                {"_id": 0}  # Exclude MongoDB _id from results
-            )
+                {"_id": 0, "company_id": 0}
+            ).sort("created_at", -1)
+            analyses = list(cursor)
             
-            analyses = []
+            if not analyses and self._backfill_summaries(company_id):
+                cursor = self.db.ticket_summaries.find(
+                    {"company_id": company_id},
+                    {"_id": 0, "company_id": 0}
+                ).sort("created_at", -1)
+                analyses = list(cursor)
             
-            for analysis_data in cursor:
-                # Count tasks by status
-                task_status_counts = {'new': 0, 'processing': 0, 'resolved': 0}
-                if 'final_report' in analysis_data and 'issues' in analysis_data['final_report']:
-                    for issue in analysis_data['final_report']['issues']:
-                        status = issue.get('status', 'new')
-                        if status in task_status_counts:
-                            task_status_counts[status] += 1
-                
-                # Calculate overall status based on task statuses
-                total_tasks = sum(task_status_counts.values())
-                if total_tasks == 0:
-                    overall_status = analysis_data.get('status', 'new')
-                elif task_status_counts['resolved'] == total_tasks:
-                    overall_status = 'resolved'
-                elif task_status_counts['new'] == total_tasks:
-                    overall_status = 'new'
-                else:
-                    overall_status = 'processing'
-                
-                # Create a summary object with key information
-                summary = {
-                    'ticket_id': analysis_data.get('ticket_id'),
-                    'created_at': analysis_data.get('metadata', {}).get('saved_at', 0),
-                    'status': overall_status,  # Use calculated overall status
-                    'task_status_counts': task_status_counts,
-                    'query': analysis_data.get('query', 'No query available'),
-                    'summary': analysis_data.get('final_report', {}).get('executive_summary', 'No summary available'),
-                    'issue_count': len(analysis_data.get('final_report', {}).get('issues', [])),
-                }
-                
-                analyses.append(summary)
-            
-            # Sort by creation date, newest first
-            analyses.sort(key=lambda x: x['created_at'], reverse=True)
             return {
                 'success': True,
                 'data': analyses
@@ -220,6 +410,158 @@ class MongoDBStorage:
                 'error': str(e)
             }
     
+    def _backfill_summaries(self, company_id):
+        """Backfill summaries for a company whose tickets predate the summary collection"""
+        if self.db.companies_tickets.find_one({"company_id": company_id}, {"_id": 1}):
+            return self.rebuild_summaries(company_id) > 0
+        return False
+    
+    def list_analyses(self, company_id, limit=20, cursor=None):
+        """
+        Get one page of analysis summaries for a company, newest first
+        
+        Pages are keyed on (created_at, ticket_id) rather than skipped over,
+        so every page costs the same index range scan.
+        
+        Args:
+            company_id: Company identifier
+            limit: Maximum number of summaries to return, capped at MAX_PAGE_SIZE
+            cursor: Opaque cursor from a previous page, None for the first page
+            
+        Returns:
+            Dict with the page of summaries and the cursor of the next page, None on the last page
+        """
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+        
+        query = {"company_id": company_id}
+        if cursor:
+            try:
+                created_at, ticket_id = self._decode_cursor(cursor)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
+            query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "ticket_id": {"$lt": ticket_id}}
+            ]
+        
+        try:
+            def fetch_page():
+                # One extra document tells whether another page follows
+                return list(self.db.ticket_summaries.find(query, {"_id": 0, "company_id": 0})
+                            .sort([("created_at", DESCENDING), ("ticket_id", DESCENDING)])
+                            .limit(limit + 1))
+            
+            page = fetch_page()
+            if not page and not cursor and self._backfill_summaries(company_id):
+                page = fetch_page()
+            
+            next_cursor = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = self._encode_cursor(page[-1])
+            
+            return {
+                'success': True,
+                'data': page,
+                'next_cursor': next_cursor
+            }
+            
+        except PyMongoError as e:
+            logger.error(f"Error listing analyses from MongoDB: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def get_dashboard_stats(self, company_id, bucket='day'):
+        """
+        Compute dashboard statistics for a company with one aggregation
+        
+        Args:
+            company_id: Company identifier
+            bucket: Time bucket for ticket counts, one of TIME_BUCKETS
+            
+        Returns:
+            Dict with total_tickets, status_counts, task_status_counts,
+            criticality_counts, tag_counts and tickets_over_time
+            (list of {'bucket_start', 'count'} oldest first)
+        """
+        if bucket not in self.TIME_BUCKETS:
+            return {'success': False, 'error': f'Unknown time bucket: {bucket}'}
+        bucket_seconds = self.TIME_BUCKETS[bucket]
+        
+        def count_tasks(status):
+            return {"$size": {"$filter": {
+                "input": "$tasks",
+                "as": "task",
+                "cond": {"$eq": [{"$ifNull": ["$$task.status", "new"]}, status]}
+            }}}
+        
+        def histogram(field):
+            return [{"$group": {"_id": field, "count": {"$sum": 1}}}]
+        
+        pipeline = [
+            {"$match": {"company_id": company_id}},
+            {"$project": {
+                "_id": 0,
+                "status": 1,
+                "saved_at": {"$ifNull": ["$metadata.saved_at", 0]},
+                "tasks": {"$ifNull": ["$final_report.issues", []]}
+            }},
+            {"$addFields": {
+                "new_tasks": count_tasks('new'),
+                "processing_tasks": count_tasks('processing'),
+                "resolved_tasks": count_tasks('resolved')
+            }},
+            {"$addFields": {"known_tasks": {"$add": ["$new_tasks", "$processing_tasks", "$resolved_tasks"]}}},
+            # Same overall status rule as the ticket summaries
+            {"$addFields": {"overall_status": {"$switch": {
+                "branches": [
+                    {"case": {"$eq": ["$known_tasks", 0]}, "then": {"$ifNull": ["$status", "new"]}},
+                    {"case": {"$eq": ["$resolved_tasks", "$known_tasks"]}, "then": "resolved"},
+                    {"case": {"$eq": ["$new_tasks", "$known_tasks"]}, "then": "new"}
+                ],
+                "default": "processing"
+            }}}},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                "status": histogram("$overall_status"),
+                "task_status": [{"$unwind": "$tasks"}] + histogram({"$ifNull": ["$tasks.status", "new"]}),
+                "criticality": [{"$unwind": "$tasks"}] + histogram({"$ifNull": ["$tasks.criticality", "Unspecified"]}),
+                "tags": [{"$unwind": "$tasks"}, {"$unwind": "$tasks.tags"}] + histogram("$tasks.tags"),
+                "over_time": histogram({"$subtract": ["$saved_at", {"$mod": ["$saved_at", bucket_seconds]}]})
+                             + [{"$sort": {"_id": 1}}]
+            }}
+        ]
+        
+        try:
+            facets = next(self.db.companies_tickets.aggregate(pipeline), {})
+            
+            def to_counts(name):
+                return {str(entry['_id']): entry['count'] for entry in facets.get(name, [])}
+            
+            total = facets.get('total', [])
+            return {
+                'success': True,
+                'data': {
+                    'total_tickets': total[0]['count'] if total else 0,
+                    'status_counts': to_counts('status'),
+                    'task_status_counts': to_counts('task_status'),
+                    'criticality_counts': to_counts('criticality'),
+                    'tag_counts': to_counts('tags'),
+                    'tickets_over_time': [{'bucket_start': int(entry['_id']), 'count': entry['count']}
+                                          for entry in facets.get('over_time', [])],
+                    'bucket': bucket
+                }
+            }
+            
+        except PyMongoError as e:
+            logger.error(f"Error computing dashboard stats in MongoDB: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
     def update_analysis_status(self, company_id, ticket_id, new_status):
         """
         Update the status of an analysis
@@ -246,6 +588,17 @@ class MongoDBStorage:
             
             if result.matched_count == 0:
                 return {'success': False, 'error': 'Analysis not found'}
+            self._invalidate_analysis(company_id, ticket_id)
+            
+            # Tickets with tasks derive their status from the tasks
+            summary_result = self.db.ticket_summaries.update_one(
+                {"ticket_id": ticket_id, "company_id": company_id, "issue_count": 0},
+                {"$set": {"status": new_status}}
+            )
+            if summary_result.matched_count:
+                self._publish('ticket_updated', company_id, ticket_id, analysis_status=new_status, status=new_status)
+            else:
+                self._publish('ticket_updated', company_id, ticket_id, analysis_status=new_status)
                 
             return {
                 'success': True,
@@ -264,6 +617,11 @@ class MongoDBStorage:
         """
         Update the status of a specific task within an analysis
         
+        The task status, the task counts and the overall status are all
+        computed by the server in one atomic pipeline update, so concurrent
+        updates to the same ticket never work from stale data and the full
+        document never leaves the database.
+        
         Args:
             company_id: Company identifier
             ticket_id: Ticket identifier
@@ -274,83 +632,270 @@ class MongoDBStorage:
             Dict with operation status
         """
         try:
-            # Get the current analysis
-            result = self.get_analysis(company_id, ticket_id)
-            if not result['success']:
-                return result
-                
-            analysis_data = result['data']
+            task_index = int(task_index)
+        except (TypeError, ValueError):
+            return {'success': False, 'error': 'Task not found in analysis'}
+        if task_index < 0:
+            return {'success': False, 'error': 'Task not found in analysis'}
+        
+        try:
+            updated = self.db.companies_tickets.find_one_and_update(
+                {
+                    "ticket_id": ticket_id,
+                    "company_id": company_id,
+                    f"final_report.issues.{task_index}": {"$exists": True}
+                },
+                self._task_status_pipeline({task_index: new_status}),
+                projection={"_id": 0, "status": 1, "task_status_counts": 1},
+                return_document=ReturnDocument.AFTER
+            )
             
-            # Update task status
-            if ('final_report' in analysis_data and 
-                'issues' in analysis_data['final_report'] and 
-                task_index < len(analysis_data['final_report']['issues'])):
-                
-                # Update task status in our local copy
-                analysis_data['final_report']['issues'][task_index]['status'] = new_status
-                
-                # Prepare update operation
-                update_field = f"final_report.issues.{task_index}.status"
-                update_op = {
-                    "$set": {
-                        update_field: new_status,
-                        "metadata.updated_at": int(time.time())
-                    }
-                }
-                
-                # Recalculate overall status
-                task_count = len(analysis_data['final_report']['issues'])
-                resolved_count = sum(1 for issue in analysis_data['final_report']['issues'] 
-                                    if issue.get('status') == 'resolved')
-                new_count = sum(1 for issue in analysis_data['final_report']['issues'] 
-                               if issue.get('status') == 'new')
-                
-                if resolved_count == task_count:
-                    overall_status = 'resolved'
-                elif new_count == task_count:
-                    overall_status = 'new'
-                else:
-                    overall_status = 'processing'
-                
-                # Add overall status to update operation
-                update_op["$set"]["status"] = overall_status
+            if updated is None:
+                # Only the failure path pays for telling the two cases apart
+                if self.db.companies_tickets.find_one({"ticket_id": ticket_id, "company_id": company_id}, {"_id": 1}):
+                    return {'success': False, 'error': 'Task not found in analysis'}
+                return {'success': False, 'error': 'Analysis not found'}
+            
+            overall_status = updated['status']
+            task_counts = updated['task_status_counts']
+            self._invalidate_analysis(company_id, ticket_id)
+            
+            self.db.ticket_summaries.update_one(
+                {"ticket_id": ticket_id, "company_id": company_id},
+                {"$set": {"status": overall_status, "task_status_counts": task_counts}}
+            )
+            self._publish_task_statuses(company_id, ticket_id, {task_index: new_status}, overall_status, task_counts)
+            
+            return {
+                'success': True,
+                'ticket_id': ticket_id,
+                'task_index': task_index,
+                'task_status': new_status,
+                'overall_status': overall_status,
+                'counts': task_counts
+            }
                 
-                # Execute update in MongoDB
-                update_result = self.db.companies_tickets.update_one(
-                    {"ticket_id": ticket_id, "company_id": company_id},
-                    update_op
+        except PyMongoError as e:
+            logger.error(f"Error updating task status in MongoDB: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+    
+    def update_task_statuses(self, company_id, changes):
+        """
+        Apply many task status changes with one bulk write
+        
+        Changes are grouped by ticket into one pipeline update per ticket,
+        so each ticket's counts and overall status are recomputed once
+        however many of its tasks change. The new counts are then read back
+        and the summaries updated with a second bulk write. A ticket whose
+        changes cannot be applied, including one whose update the server
+        rejects, is left untouched and reported as failed.
+        
+        Args:
+            company_id: Company identifier
+            changes: List of dicts with 'ticket_id', 'task_index' and 'status'
+            
+        Returns:
+            Dict with per-ticket results, including the new counts and overall
+            status of every updated ticket, and the changes that were rejected
+        """
+        grouped, errors = self._group_task_changes(changes)
+        if not grouped:
+            return self._bulk_task_result([], errors)
+        
+        try:
+            ticket_ids = list(grouped)
+            write_errors = {}
+            try:
+                self.db.companies_tickets.bulk_write([
+                    UpdateOne(
+                        {
+                            "ticket_id": ticket_id,
+                            "company_id": company_id,
+                            # If the highest index exists, the others do too
+                            f"final_report.issues.{max(grouped[ticket_id])}": {"$exists": True}
+                        },
+                        self._task_status_pipeline(grouped[ticket_id])
+                    )
+                    for ticket_id in ticket_ids
+                ], ordered=False)
+            except BulkWriteError as e:
+                # The other tickets' updates were still applied
+                for error in e.details.get('writeErrors', []):
+                    write_errors[ticket_ids[error['index']]] = error.get('errmsg', 'Write failed')
+            
+            # Read back the recomputed counts; the issue statuses tell a missing task from a missing ticket
+            updated = {
+                document['ticket_id']: document
+                for document in self.db.companies_tickets.find(
+                    {"company_id": company_id, "ticket_id": {"$in": list(grouped)}},
+                    {"_id": 0, "ticket_id": 1, "status": 1, "task_status_counts": 1, "final_report.issues.status": 1}
                 )
+            }
+            
+            tickets = []
+            summary_operations = []
+            for ticket_id, task_statuses in grouped.items():
+                document = updated.get(ticket_id)
+                if ticket_id in write_errors:
+                    tickets.append({'ticket_id': ticket_id, 'success': False, 'error': write_errors[ticket_id]})
+                    continue
+                if document is None:
+                    tickets.append({'ticket_id': ticket_id, 'success': False, 'error': 'Analysis not found'})
+                    continue
+                if max(task_statuses) >= len(document.get('final_report', {}).get('issues', [])):
+                    tickets.append({'ticket_id': ticket_id, 'success': False, 'error': 'Task not found in analysis'})
+                    continue
                 
-                if update_result.matched_count == 0:
-                    return {'success': False, 'error': 'Analysis not found'}
-                
-                # Calculate task counts for response
-                task_counts = {
-                    'new': sum(1 for issue in analysis_data['final_report']['issues'] 
-                              if issue.get('status') == 'new'),
-                    'processing': sum(1 for issue in analysis_data['final_report']['issues'] 
-                                     if issue.get('status') == 'processing'),
-                    'resolved': sum(1 for issue in analysis_data['final_report']['issues'] 
-                                   if issue.get('status') == 'resolved')
-                }
-                
-                return {
-                    'success': True,
+                tickets.append({
                     'ticket_id': ticket_id,
-                    'task_index': task_index,
-                    'task_status': new_status,
-                    'overall_status': overall_status,
-                    'counts': task_counts
-                }
-            else:
-                return {
-                    'success': False,
-                    'error': 'Task not found in analysis'
-                }
-                
+                    'success': True,
+                    'overall_status': document['status'],
+                    'counts': document['task_status_counts']
+                })
+                summary_operations.append(UpdateOne(
+                    {"ticket_id": ticket_id, "company_id": company_id},
+                    {"$set": {"status": document['status'], "task_status_counts": document['task_status_counts']}}
+                ))
+                self._invalidate_analysis(company_id, ticket_id)
+            
+            if summary_operations:
+                self.db.ticket_summaries.bulk_write(summary_operations, ordered=False)
+            for ticket in tickets:
+                if ticket['success']:
+                    self._publish_task_statuses(company_id, ticket['ticket_id'], grouped[ticket['ticket_id']],
+                                                ticket['overall_status'], ticket['counts'])
+            
         except PyMongoError as e:
-            logger.error(f"Error updating task status in MongoDB: {str(e)}")
+            logger.error(f"Error bulk updating task statuses in MongoDB: {str(e)}")
             return {
                 'success': False,
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+        
+        return self._bulk_task_result(tickets, errors)
+    
+    def start_change_stream(self, event_bus, retry_seconds=5):
+        """
+        Relay ticket summary changes from a MongoDB change stream into an event bus
+        
+        Every write path updates ticket_summaries, so the stream carries
+        writes made by any app instance. Once it is running this instance
+        stops publishing its own writes, which would duplicate them. Change
+        streams need a replica set or sharded cluster.
+        
+        Args:
+            event_bus: EventBus receiving a 'ticket_saved' event per summary change
+            retry_seconds: Delay before reopening an interrupted stream
+            
+        Returns:
+            True if the stream was opened, False if change streams are unavailable
+        """
+        try:
+            stream = self.db.ticket_summaries.watch(full_document='updateLookup')
+        except PyMongoError as e:
+            logger.warning(f"MongoDB change streams unavailable, publishing local writes instead: {str(e)}")
+            return False
+        
+        self.event_bus = None
+        thread = threading.Thread(
+            target=self._relay_changes, args=(stream, event_bus, retry_seconds),
+            name='summary-change-stream', daemon=True
+        )
+        thread.start()
+        logger.info("Relaying ticket summary changes from the MongoDB change stream")
+        return True
+    
+    def _relay_changes(self, stream, event_bus, retry_seconds):
+        """Publish summary changes from the change stream, resuming after interruptions"""
+        resume_token = None
+        while True:
+            try:
+                if stream is None:
+                    stream = self.db.ticket_summaries.watch(full_document='updateLookup', resume_after=resume_token)
+                with stream:
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        summary = change.get('fullDocument')
+                        if not summary:
+                            continue
+                        summary.pop('_id', None)
+                        company_id = summary.pop('company_id')
+                        event_bus.publish({
+                            'type': 'ticket_saved',
+                            'company_id': company_id,
+                            'ticket_id': summary['ticket_id'],
+                            'summary': summary
+                        })
+            except PyMongoError as e:
+                logger.warning(f"Change stream interrupted, retrying in {retry_seconds}s: {str(e)}")
+                time.sleep(retry_seconds)
+            stream = None
+    
+    def _task_status_pipeline(self, task_statuses):
+        """
+        Build the update pipeline that sets task statuses and recomputes
+        task_status_counts and the overall status on the server
+        
+        Args:
+            task_statuses: Dict of task index -> new status
+            
+        Returns:
+            List of pipeline stages for an update
+        """
+        issues = "$final_report.issues"
+        
+        # Rebuild the array as the untouched runs of issues around each updated task
+        segments = []
+        position = 0
+        for task_index in sorted(task_statuses):
+            if task_index > position:
+                segments.append({"$slice": [issues, position, task_index - position]})
+            segments.append({"$map": {
+                "input": {"$slice": [issues, task_index, 1]},
+                "as": "issue",
+                # $literal keeps a status such as '$title' or {'$size': ...} from being evaluated
+                "in": {"$mergeObjects": ["$$issue", {"status": {"$literal": task_statuses[task_index]}}]}
+            }})
+            position = task_index + 1
+        segments.append({"$slice": [issues, position, self.MAX_ARRAY_SLICE]})
+        
+        def count_status(status):
+            # Tasks without a status count as new
+            return {"$size": {"$filter": {
+                "input": issues,
+                "as": "issue",
+                "cond": {"$eq": [{"$ifNull": ["$$issue.status", "new"]}, status]}
+            }}}
+        
+        return [
+            {"$set": {
+                "final_report.issues": {"$concatArrays": segments},
+                "metadata.updated_at": int(time.time())
+            }},
+            {"$set": {
+                "task_status_counts": {
+                    "new": count_status('new'),
+                    "processing": count_status('processing'),
+                    "resolved": count_status('resolved')
+                }
+            }},
+            # Same rule as _overall_status: only tasks with a known status are compared
+            {"$set": {
+                "status": {"$let": {
+                    "vars": {"total": {"$add": [
+                        "$task_status_counts.new", "$task_status_counts.processing", "$task_status_counts.resolved"
+                    ]}},
+                    "in": {"$switch": {
+                        "branches": [
+                            {"case": {"$eq": ["$$total", 0]}, "then": "new"},
+                            {"case": {"$eq": ["$task_status_counts.resolved", "$$total"]}, "then": "resolved"},
+                            {"case": {"$eq": ["$task_status_counts.new", "$$total"]}, "then": "new"}
+                        ],
+                        "default": "processing"
+                    }}
+                }}
+            }}
+        ]
@@ -1,73 +1,296 @@
-from flask import jsonify
+import os
+import copy
+import time
 
 # Import the centralized app configuration
-from utils.app_config import socketio, logger, storage, scout, analyst, text_processor
+from utils.app_config import socketio, logger, storage, scout, analyst, text_processor, job_manager, tracer, TEXT_SPLIT_LINES
+from utils.file_processor import iter_records
+from utils.tracing import activate, current_trace, span, add_span
 
-def process_with_agents(content, query, process_id, company_id, save_analysis):
+def emit_status(message, job_id=None):
+    """Emit a status message and record it as the job's latest progress"""
+    socketio.emit('status', {'message': message})
+    if job_id:
+        job_manager.set_message(job_id, message)
+
+def preprocess_records(records, total_records=None, job_id=None):
     """
-    Process content with Scout and Analyst agents
+    Apply text preprocessing to records batch by batch
+    
+    Batches are produced lazily, so a streaming source is read only as fast
+    as the consumer (Scout) takes batches, and processed records are never
+    all held in memory at once. Reading and preprocessing interleave with
+    the consumer, so the process_file span records only the time spent
+    producing batches, summed over all of them.
     
     Args:
-        content: List of records to analyze
+        records: List of records, or an iterable streaming them from a file
+        total_records: Number of records if known, used for progress messages
+        job_id: Optional job identifier for progress reporting
+        
+    Returns:
+        Generator yielding lists of preprocessed records
+    """
+    ingest_start = batch_start = time.time()
+    ingest_ms = 0.0
+    emit_status('Preprocessing data...', job_id)
+    record_count = 0
+    
+    # Process in batches for memory efficiency
+    total_batches = None
+    if total_records is not None:
+        total_batches = (total_records + text_processor.batch_size - 1) // text_processor.batch_size
+    
+    try:
+        # Batches may be spread across worker processes; results come back in order
+        batches = text_processor.batch_records(records)
+        for i, processed_batch in enumerate(text_processor.preprocess_batches(batches)):
+            add_span('preprocess_batch', batch_start, batch=i + 1, records=len(processed_batch))
+            if total_batches is not None:
+                socketio.emit('status', {'message': f'Preprocessed batch {i+1} of {total_batches}...'})
+            else:
+                socketio.emit('status', {'message': f'Preprocessed batch {i+1}...'})
+            record_count += len(processed_batch)
+            ingest_ms += (time.time() - batch_start) * 1000
+            yield processed_batch
+            batch_start = time.time()
+            
+        emit_status(f'Preprocessing complete. Processed {record_count} records.', job_id)
+        ingest_ms += (time.time() - batch_start) * 1000
+    finally:
+        add_span('process_file', ingest_start, duration_ms=ingest_ms, records=record_count)
+
+def attach_trace(final_results, include_spans=True):
+    """
+    Record the active trace in the metadata of analysis results
+    
+    Args:
+        final_results: Dict with analysis results
+        include_spans: Whether to include every span or only the per-stage totals
+    """
+    trace = current_trace()
+    if trace is not None:
+        final_results.setdefault('metadata', {})['trace'] = trace.to_dict(include_spans)
+
+def save_results(final_results, company_id, ticket_id=None, job_id=None):
+    """
+    Save analysis results and record the outcome on them
+    
+    Args:
+        final_results: Dict with analysis results, updated with 'saved' and 'ticket_id'
+        company_id: Company identifier
+        ticket_id: Optional ticket to overwrite, a new ticket is created if not provided
+        job_id: Optional job identifier for progress reporting
+    """
+    # Stored tickets keep the stage totals; the full span list goes to the trace exporters
+    attach_trace(final_results, include_spans=False)
+    with span('storage_save', backend=type(storage).__name__) as save_span:
+        save_result = storage.save_analysis(final_results, company_id, ticket_id)
+        save_span.set(success=save_result['success'])
+    final_results['saved'] = save_result['success']
+    if save_result['success']:
+        final_results['ticket_id'] = save_result['ticket_id']
+        emit_status(f'Analysis saved successfully with ticket ID: {save_result["ticket_id"]}', job_id)
+    else:
+        logger.error(f"Failed to save analysis: {save_result.get('error', 'Unknown error')}")
+        emit_status(f'Failed to save analysis: {save_result.get("error", "Unknown error")}', job_id)
+
+def run_agents(record_batches, query, process_id, company_id, save_analysis, job_id=None, ticket_id=None):
+    """
+    Run Scout and Analyst agents over preprocessed records and save the result
+    
+    Args:
+        record_batches: Iterable of preprocessed record batches, consumed once by Scout
         query: Query string for analysis
         process_id: Unique ID for this analysis process
         company_id: Company identifier
         save_analysis: Whether to save the analysis
+        job_id: Optional job identifier for progress reporting
+        ticket_id: Optional existing ticket the records are appended to
         
     Returns:
-        JSON response with analysis results
+        Dict with analysis results, or a dict with an 'error' key on failure
     """
+    if ticket_id:
+        return run_incremental_agents(record_batches, process_id, company_id, ticket_id, save_analysis, job_id)
+    
+    # Analyst work on each issue can start while Scout is still streaming the rest
+    pipeline = analyst.start_issue_pipeline(query, company_id)
     try:
-        # Apply text preprocessing to all records
-        socketio.emit('status', {'message': 'Preprocessing data...'})
-        processed_records = []
-        
-        # Process in batches for memory efficiency
-        total_records = len(content)
-        for i, batch in enumerate(text_processor.batch_records(content)):
-            socketio.emit('status', {'message': f'Preprocessing batch {i+1} of {(total_records+text_processor.batch_size-1)//text_processor.batch_size}...'})
-            processed_batch = text_processor.preprocess_batch(batch)
-            processed_records.extend(processed_batch)
-            
-        socketio.emit('status', {'message': f'Preprocessing complete. Processed {len(processed_records)} records.'})
-        
         # Step 2: Scout agent processing with batching
-        socketio.emit('status', {'message': 'Scout agent processing data in batches...'})
-        scout_results = scout.process_scout_query({
-            'content': processed_records,
-            'query': query,
-            'process_id': process_id,
-            'company_id': company_id
-        })
+        emit_status('Scout agent processing data in batches...', job_id)
+        with span('scout') as scout_span:
+            scout_results = scout.process_scout_query({
+                'batches': record_batches,
+                'query': query,
+                'process_id': process_id,
+                'company_id': company_id,
+                'on_issue': pipeline.submit if pipeline else None
+            })
+            scout_span.set(records=scout_results.get('record_count'))
 
         if 'error' in scout_results:
             socketio.emit('status', {'message': f'Error in Scout analysis: {scout_results["error"]}'})
-            return jsonify(scout_results), 500
-        
+            return scout_results
+
         # Step 3: Analyst agent processing
-        socketio.emit('status', {'message': 'Analyst agent reviewing findings...'})
-        final_results = analyst.process_analyst_query(scout_results)
-        
+        emit_status('Analyst agent reviewing findings...', job_id)
+        with span('analyst'):
+            final_results = analyst.process_analyst_query(scout_results, pipeline)
+
+        if 'error' in final_results:
+            return final_results
+
         # Initialize status for each issue
         if 'final_report' in final_results and 'issues' in final_results['final_report']:
             for issue in final_results['final_report']['issues']:
                 issue['status'] = 'new'
-        
+
         # Step 4: Save analysis if requested
         if save_analysis:
-            save_result = storage.save_analysis(final_results, company_id)
-            final_results['saved'] = save_result['success']
-            if save_result['success']:
-                final_results['ticket_id'] = save_result['ticket_id']
-                socketio.emit('status', {'message': f'Analysis saved successfully with ticket ID: {save_result["ticket_id"]}'})
-            else:
-                logger.error(f"Failed to save analysis: {save_result.get('error', 'Unknown error')}")
-                socketio.emit('status', {'message': f'Failed to save analysis: {save_result.get("error", "Unknown error")}'})
+            save_results(final_results, company_id, job_id=job_id)
+
+        attach_trace(final_results)
+        socketio.emit('status', {'message': 'Analysis complete'})
+        return final_results
+
+    except Exception as e:
+        logger.error(f"Error in agent processing: {str(e)}")
+        socketio.emit('status', {'message': f'Error: {str(e)}'})
+        return {'error': str(e), 'process_id': process_id, 'company_id': company_id}
+    
+    finally:
+        if pipeline:
+            pipeline.shutdown()
+
+def run_incremental_agents(record_batches, process_id, company_id, ticket_id, save_analysis, job_id=None):
+    """
+    Analyze only new records and merge the findings into an existing ticket
+    
+    Scout and Analyst run over the new records alone, so the cost of an
+    append grows with the new data rather than the ticket's history. New
+    issue types become new tasks; existing tasks keep their index and status.
+    The ticket's original query is reused.
+    
+    Args:
+        record_batches: Iterable of preprocessed batches of the new records
+        process_id: Unique ID for this analysis process
+        company_id: Company identifier
+        ticket_id: Ticket the records are appended to
+        save_analysis: Whether to save the merged analysis
+        job_id: Optional job identifier for progress reporting
+        
+    Returns:
+        Dict with the merged analysis, or a dict with an 'error' key on failure
+    """
+    pipeline = None
+    try:
+        existing_result = storage.get_analysis(company_id, ticket_id, full=True)
+        if not existing_result['success']:
+            emit_status(f'Cannot append to ticket {ticket_id}: {existing_result["error"]}', job_id)
+            return {'error': existing_result['error'], 'process_id': process_id, 'company_id': company_id}
+        
+        # The stored document may be shared with the read cache, so merge into a copy
+        existing = copy.deepcopy(existing_result['data'])
+        existing_report = existing.get('final_report') or {}
+        query = existing.get('query', '')
+        pipeline = analyst.start_issue_pipeline(query, company_id)
+        
+        emit_status(f'Scout agent processing new records for ticket {ticket_id}...', job_id)
+        with span('scout', ticket_id=ticket_id) as scout_span:
+            scout_results = scout.process_scout_query({
+                'batches': record_batches,
+                'query': query,
+                'process_id': process_id,
+                'company_id': company_id,
+                'known_issue_types': [issue['issue_type'] for issue in existing_report.get('issues', []) if issue.get('issue_type')],
+                'on_issue': pipeline.submit if pipeline else None
+            })
+            scout_span.set(records=scout_results.get('record_count'))
+        
+        if 'error' in scout_results:
+            socketio.emit('status', {'message': f'Error in Scout analysis: {scout_results["error"]}'})
+            return scout_results
+        
+        emit_status('Analyst agent reviewing new findings...', job_id)
+        with span('analyst', ticket_id=ticket_id):
+            new_results = analyst.process_analyst_query(scout_results, pipeline)
         
+        if 'error' in new_results:
+            return new_results
+        
+        for issue in new_results['final_report'].get('issues', []):
+            issue['status'] = 'new'
+        
+        emit_status(f'Merging new findings into ticket {ticket_id}...', job_id)
+        metadata = scout.append_metadata(existing.get('metadata', {}), new_results['metadata'])
+        scout_analysis = scout.append_scout_analysis(
+            existing.get('scout_analysis') or {}, metadata['record_count'] - scout_results['record_count'],
+            new_results['scout_analysis'], scout_results['record_count']
+        )
+        final_results = {
+            **existing,
+            'process_id': process_id,
+            'timestamp': int(time.time()),
+            'scout_analysis': scout_analysis,
+            'metadata': metadata,
+            'analyst_insights': analyst.append_insights(existing.get('analyst_insights'), new_results['analyst_insights']),
+            'final_report': analyst.append_final_report(existing_report, new_results['final_report'], scout_analysis)
+        }
+        
+        if save_analysis:
+            # Task statuses may have changed while the agents ran; keep the latest ones
+            current = storage.get_analysis(company_id, ticket_id)
+            if current['success']:
+                current_issues = current['data'].get('final_report', {}).get('issues', [])
+                for issue, current_issue in zip(final_results['final_report']['issues'], current_issues):
+                    issue['status'] = current_issue.get('status', issue['status'])
+                final_results['status'] = current['data'].get('status', final_results.get('status'))
+            save_results(final_results, company_id, ticket_id, job_id)
+        
+        attach_trace(final_results)
         socketio.emit('status', {'message': 'Analysis complete'})
-        return jsonify(final_results)
+        return final_results
     
     except Exception as e:
-        logger.error(f"Error in agent processing: {str(e)}")
+        logger.error(f"Error appending to ticket {ticket_id}: {str(e)}")
         socketio.emit('status', {'message': f'Error: {str(e)}'})
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return {'error': str(e), 'process_id': process_id, 'company_id': company_id}
+    
+    finally:
+        if pipeline:
+            pipeline.shutdown()
+
+def run_analysis_job(file_path, query, process_id, company_id, save_analysis, ticket_id=None, trace=None):
+    """
+    Job entry point: parse an uploaded file and run the analysis pipeline
+
+    Runs on a job worker thread. The file is streamed in batches through
+    preprocessing into Scout and removed when the job ends. The process_id
+    doubles as the job ID.
+
+    Args:
+        file_path: Path of the uploaded file
+        query: Query string for analysis
+        process_id: Unique ID for this analysis process
+        company_id: Company identifier
+        save_analysis: Whether to save the analysis
+        ticket_id: Optional existing ticket the file's records are appended to
+        trace: Optional Trace started when the upload was received
+
+    Returns:
+        Dict with analysis results, or a dict with an 'error' key on failure
+    """
+    trace = trace or tracer.start_trace(process_id, company_id=company_id)
+    with activate(trace):
+        try:
+            # Stream the file straight through preprocessing into Scout so records are never all in memory
+            emit_status('Processing file...', process_id)
+            record_batches = preprocess_records(iter_records(file_path, split_text_lines=TEXT_SPLIT_LINES), job_id=process_id)
+            return run_agents(record_batches, query, process_id, company_id, save_analysis, job_id=process_id,
+                              ticket_id=ticket_id)
+        finally:
+            # Clean up temporary file
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            trace.finish()
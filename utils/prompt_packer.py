@@ -0,0 +1,272 @@
+import re
+import math
+import logging
+from collections import OrderedDict
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Selection policies accepted by PromptPacker
+PACKING_POLICIES = ('file_order', 'diversity', 'recency', 'length')
+
+# Encoding used when the model name is not known to tiktoken
+DEFAULT_ENCODING = 'o200k_base'
+
+# Words and single non-space symbols, the pieces the fallback counter prices
+TOKEN_PIECE_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Offline token estimate that errs high
+
+    Every punctuation mark counts as a token and every word as one token
+    per started 4 characters, which is at least what BPE tokenizers use
+    for English text, so budgets filled with this estimate do not overrun.
+
+    Args:
+        text: Text to price
+
+    Returns:
+        Estimated token count
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in TOKEN_PIECE_PATTERN.findall(text))
+
+
+class TokenCounter:
+    """
+    Counts tokens with the model's tiktoken encoding
+
+    Falls back to estimate_tokens when tiktoken is not installed or the
+    encoding cannot be loaded, e.g. because its vocabulary file cannot be
+    downloaded on an offline host.
+    """
+    def __init__(self, model_name=None, encoding_name=None):
+        """
+        Load the tokenizer
+
+        Args:
+            model_name: LLM name, e.g. 'azure/gpt-4o-mini'; the provider prefix is ignored
+            encoding_name: Explicit tiktoken encoding, overrides model_name
+        """
+        self.encoding = None
+        if tiktoken is None:
+            logger.info("tiktoken not installed, estimating prompt tokens")
+            return
+
+        try:
+            if not encoding_name and model_name:
+                try:
+                    encoding_name = tiktoken.encoding_name_for_model(model_name.split('/')[-1])
+                except KeyError:
+                    encoding_name = None
+            self.encoding = tiktoken.get_encoding(encoding_name or DEFAULT_ENCODING)
+        except Exception as e:
+            # get_encoding downloads the vocabulary on first use
+            logger.warning(f"Could not load tiktoken encoding, estimating prompt tokens: {str(e)}")
+
+    @property
+    def exact(self):
+        """Whether counts come from the model's tokenizer rather than the estimate"""
+        return self.encoding is not None
+
+    def count(self, text):
+        """Return the number of tokens in text"""
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return estimate_tokens(text)
+
+
+class PromptPacker:
+    """
+    Fills a token budget with the most useful feedback entries
+
+    Entries are ranked by a selection policy, then taken greedily while
+    they fit, so a large entry that does not fit leaves room for smaller
+    ones further down. Selected entries keep their original order in the
+    prompt.
+
+    Policies:
+        file_order  entries in the order given
+        diversity   round-robin over (category, source, location) groups so
+                    every group is represented before any gets a second entry
+        recency     newest 'timestamp' first, entries without one last
+        length      shortest first, fitting the most entries
+    """
+    def __init__(self, token_counter=None, policy='diversity', separator='\n\n'):
+        """
+        Initialize the packer
+
+        Args:
+            token_counter: TokenCounter used to price entries
+            policy: One of PACKING_POLICIES
+            separator: Text placed between entries in the prompt
+        """
+        if policy not in PACKING_POLICIES:
+            raise ValueError(f"Unknown packing policy '{policy}', expected one of {', '.join(PACKING_POLICIES)}")
+        self.token_counter = token_counter or TokenCounter()
+        self.policy = policy
+        self.separator = separator
+        self.separator_tokens = self.token_counter.count(separator)
+
+    def count_tokens(self, text):
+        """Return the number of tokens in text"""
+        return self.token_counter.count(text)
+
+    def _rank(self, items):
+        """Return item indices in the order the policy prefers them"""
+        indices = list(range(len(items)))
+
+        if self.policy == 'recency':
+            # Stable sort keeps file order among equal or missing timestamps
+            return sorted(indices, key=lambda i: (items[i].get('timestamp') is None,
+                                                  -(items[i].get('timestamp') or 0)))
+
+        if self.policy == 'length':
+            return sorted(indices, key=lambda i: len(items[i]['text']))
+
+        if self.policy == 'diversity':
+            groups = OrderedDict()
+            for i in indices:
+                key = (items[i].get('category'), items[i].get('source'), items[i].get('location'))
+                groups.setdefault(key, []).append(i)
+
+            ranked = []
+            queues = [iter(group) for group in groups.values()]
+            while queues:
+                remaining = []
+                for queue in queues:
+                    index = next(queue, None)
+                    if index is not None:
+                        ranked.append(index)
+                        remaining.append(queue)
+                queues = remaining
+            return ranked
+
+        return indices
+
+    def pack(self, items, budget):
+        """
+        Select entries that fit a token budget
+
+        Args:
+            items: List of dicts with the entry 'text' and optionally 'category',
+                'source', 'location' and a numeric 'timestamp'
+            budget: Maximum tokens of the joined entries, None for no limit
+
+        Returns:
+            Dict with the selected 'entries' in original order, 'used_tokens',
+            'dropped_tokens', and the 'included'/'dropped' entry counts
+        """
+        costs = [self.count_tokens(item['text']) for item in items]
+
+        if budget is None:
+            selected = list(range(len(items)))
+        else:
+            selected, _ = self._select(self._rank(items), costs, budget)
+
+        entries, used_tokens, _ = self._join(items, costs, selected, budget)
+
+        return {
+            'entries': entries,
+            'used_tokens': used_tokens,
+            'dropped_tokens': sum(costs) - sum(costs[index] for index in selected),
+            'included': len(selected),
+            'dropped': len(items) - len(selected)
+        }
+
+    def pack_shards(self, items, shard_budget, max_shards=None):
+        """
+        Distribute entries over prompts that each fit a token budget
+
+        Every shard is filled like pack() from the entries the policy prefers
+        among those not placed yet, so when max_shards caps the number of
+        prompts the entries left out are the least preferred ones. Entries
+        that stop fitting a shard once its joined text is counted exactly go
+        back to the front of the queue for the next shard. An entry too large
+        for an empty shard is left out.
+
+        Args:
+            items: List of entry dicts, as for pack()
+            shard_budget: Maximum tokens of the joined entries of one shard
+            max_shards: Maximum number of shards, None for as many as needed
+
+        Returns:
+            Dict with the 'shards' (lists of entries in original order), the total
+            'used_tokens', 'dropped_tokens', and the 'included'/'dropped' entry counts
+        """
+        costs = [self.count_tokens(item['text']) for item in items]
+        remaining = self._rank(items)
+        rank = {index: position for position, index in enumerate(remaining)}
+        shards = []
+        used_tokens = 0
+        placed = 0
+        placed_tokens = 0
+
+        while remaining and (max_shards is None or len(shards) < max_shards):
+            selected, remaining = self._select(remaining, costs, shard_budget)
+            if not selected:
+                break
+            # A single entry always fits, so a shard never ends up empty
+            entries, shard_tokens, removed = self._join(items, costs, selected, shard_budget)
+            remaining = sorted(removed, key=rank.get) + remaining
+            shards.append(entries)
+            used_tokens += shard_tokens
+            placed += len(selected)
+            placed_tokens += sum(costs[index] for index in selected)
+
+        return {
+            'shards': shards,
+            'used_tokens': used_tokens,
+            'dropped_tokens': sum(costs) - placed_tokens,
+            'included': placed,
+            'dropped': len(items) - placed
+        }
+
+    def _select(self, ranked, costs, budget):
+        """
+        Take ranked entries greedily while they fit the budget
+
+        Returns:
+            Tuple of (selected indices in original order, indices left over in rank order)
+        """
+        selected = []
+        leftover = []
+        used = 0
+        for index in ranked:
+            # Every entry after the first is preceded by a separator
+            cost = costs[index] + (self.separator_tokens if selected else 0)
+            if used + cost <= budget:
+                selected.append(index)
+                used += cost
+            else:
+                leftover.append(index)
+        selected.sort()
+        return selected, leftover
+
+    def _join(self, items, costs, selected, budget):
+        """
+        Return the texts of the selected entries and their joined token count
+
+        Selected indices that do not fit after exact counting are removed
+        from the list in place.
+
+        Returns:
+            Tuple of (entry texts, joined token count, removed indices in removal order)
+        """
+        entries = [items[index]['text'] for index in selected]
+        used_tokens = sum(costs[index] for index in selected) + self.separator_tokens * max(len(selected) - 1, 0)
+        removed = []
+
+        # Tokenizers can merge across entry boundaries; drop from the end until the joined text fits
+        if budget is not None and self.token_counter.exact:
+            while entries and self.count_tokens(self.separator.join(entries)) > budget:
+                entries.pop()
+                removed.append(selected.pop())
+            used_tokens = self.count_tokens(self.separator.join(entries)) if entries else 0
+
+        return entries, used_tokens, removed
@@ -0,0 +1,652 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from utils.storage import AnalysisStorage
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies_tickets (
+    company_id TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    saved_at INTEGER NOT NULL DEFAULT 0,
+    document TEXT NOT NULL CHECK (json_valid(document)),
+    PRIMARY KEY (company_id, ticket_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_company_saved_at
+    ON companies_tickets (company_id, saved_at DESC);
+
+CREATE TABLE IF NOT EXISTS ticket_summaries (
+    company_id TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    created_at INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    issue_count INTEGER NOT NULL DEFAULT 0,
+    summary TEXT NOT NULL CHECK (json_valid(summary)),
+    PRIMARY KEY (company_id, ticket_id)
+);
+CREATE INDEX IF NOT EXISTS idx_summaries_company_created_at
+    ON ticket_summaries (company_id, created_at DESC, ticket_id DESC);
+
+CREATE TABLE IF NOT EXISTS analysis_payloads (
+    company_id TEXT NOT NULL,
+    ticket_id TEXT NOT NULL,
+    field TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (company_id, ticket_id, field)
+);
+"""
+
+
+class SQLiteStorage(AnalysisStorage):
+    """
+    Embedded SQLite storage for analysis results
+
+    Implements the same interface as MongoDBStorage for single-node
+    deployments and hermetic tests. Analyses are stored as JSON documents,
+    with the columns used for lookups and sorting kept alongside and indexed.
+    """
+    def __init__(self, database_path='kollab.sqlite3', cache_size=256, cache_ttl=300, event_bus=None):
+        """
+        Open (and create if needed) the SQLite database
+
+        Args:
+            database_path: Path of the database file, or ':memory:'
+            cache_size: Maximum analyses in the read-through cache, 0 disables it
+            cache_ttl: Time-to-live of cached analyses in seconds
+            event_bus: Optional EventBus receiving change events after writes
+        """
+        self.database_path = database_path
+        self.event_bus = event_bus
+        self._init_analysis_cache(cache_size, cache_ttl)
+        self.lock = threading.RLock()
+
+        directory = os.path.dirname(os.path.abspath(database_path))
+        if database_path != ':memory:' and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok=True)
+
+        # One shared connection in autocommit mode; writes open explicit transactions
+        self.conn = sqlite3.connect(database_path, check_same_thread=False, isolation_level=None)
+        if database_path != ':memory:':
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        logger.info(f"Using SQLite storage: {database_path}")
+
+    @contextmanager
+    def _transaction(self):
+        """Run statements in one write transaction, rolling back on error"""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _write_analysis(self, conn, document):
+        """Upsert an analysis document, its payload and summary; top-level fields overwrite existing ones"""
+        key = (document['company_id'], document['ticket_id'])
+        payload = self._split_payload(document)
+        row = conn.execute(
+            "SELECT document FROM companies_tickets WHERE company_id = ? AND ticket_id = ?", key
+        ).fetchone()
+        if row:
+            existing = json.loads(row[0])
+            # Drop payload fields embedded by older saves
+            for field in payload:
+                existing.pop(field, None)
+            existing.update(document)
+            document = existing
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO analysis_payloads (company_id, ticket_id, field, data) VALUES (?, ?, ?, ?)",
+            [key + (field, data) for field, data in payload.items()]
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO companies_tickets (company_id, ticket_id, saved_at, document) VALUES (?, ?, ?, ?)",
+            key + (document.get('metadata', {}).get('saved_at', 0), json.dumps(document))
+        )
+        self._write_summary(conn, document)
+        return row is None
+
+    def _write_summary(self, conn, document):
+        """Write the summary row of an analysis document"""
+        summary = self._build_summary(document)
+        company_id = summary.pop('company_id')
+        conn.execute(
+            "INSERT OR REPLACE INTO ticket_summaries "
+            "(company_id, ticket_id, created_at, status, issue_count, summary) VALUES (?, ?, ?, ?, ?, ?)",
+            (company_id, summary['ticket_id'], summary['created_at'], summary['status'],
+             summary['issue_count'], json.dumps(summary))
+        )
+
+    def save_analysis(self, analysis_data, company_id, ticket_id=None):
+        """
+        Save analysis data to SQLite
+
+        Args:
+            analysis_data: Dict containing analysis results
+            company_id: Company identifier for organizing data
+            ticket_id: Optional ticket identifier, generated if not provided
+
+        Returns:
+            Dict with status and ticket_id
+        """
+        try:
+            document = self._prepare_analysis(analysis_data, company_id, ticket_id)
+            with self._transaction() as conn:
+                inserted = self._write_analysis(conn, document)
+            self._invalidate_analysis(company_id, document['ticket_id'])
+            self._publish_saved(document)
+
+            if inserted:
+                logger.info(f"Saved new analysis to SQLite, ticket_id: {document['ticket_id']}")
+            else:
+                logger.info(f"Updated existing analysis in SQLite, ticket_id: {document['ticket_id']}")
+
+            return {
+                'success': True,
+                'ticket_id': document['ticket_id']
+            }
+
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.error(f"Error saving analysis to SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def save_analyses_bulk(self, items):
+        """
+        Save many analyses in one transaction
+
+        Each item is written under its own savepoint, so a failing item does
+        not stop the others from being saved.
+
+        Args:
+            items: List of dicts with 'analysis', 'company_id' and an optional 'ticket_id'
+
+        Returns:
+            Dict with saved/failed counts and a per-item list of results in input order
+        """
+        results = []
+        saved_documents = []
+        try:
+            with self._transaction() as conn:
+                for index, item in enumerate(items):
+                    company_id = item.get('company_id')
+                    if not company_id or not isinstance(item.get('analysis'), dict):
+                        results.append({'success': False, 'error': 'Missing analysis or company_id'})
+                        continue
+
+                    # Suffix generated ticket IDs so items saved in the same second don't collide
+                    ticket_id = item.get('ticket_id') or f"{company_id}_{int(time.time())}_{index}"
+                    conn.execute("SAVEPOINT bulk_item")
+                    try:
+                        document = self._prepare_analysis(item['analysis'], company_id, ticket_id)
+                        self._write_analysis(conn, document)
+                        conn.execute("RELEASE bulk_item")
+                        results.append({'success': True, 'ticket_id': ticket_id})
+                        saved_documents.append(document)
+                        self._invalidate_analysis(company_id, ticket_id)
+                    except (sqlite3.Error, TypeError, ValueError) as e:
+                        conn.execute("ROLLBACK TO bulk_item")
+                        conn.execute("RELEASE bulk_item")
+                        results.append({'success': False, 'ticket_id': ticket_id, 'error': str(e)})
+
+        except sqlite3.Error as e:
+            logger.error(f"Error bulk saving analyses to SQLite: {str(e)}")
+            results = [{'success': False, 'error': str(e)} for _ in items]
+            saved_documents = []
+
+        for document in saved_documents:
+            self._publish_saved(document)
+
+        saved = sum(1 for result in results if result['success'])
+        logger.info(f"Bulk saved {saved} of {len(items)} analyses to SQLite")
+        return {
+            'success': saved == len(items),
+            'saved': saved,
+            'failed': len(items) - saved,
+            'results': results
+        }
+
+    def rebuild_summaries(self, company_id=None):
+        """
+        Rebuild ticket summaries from the full analysis documents
+
+        Args:
+            company_id: Optional company to rebuild, defaults to all companies
+
+        Returns:
+            Number of summaries written
+        """
+        query = "SELECT document FROM companies_tickets"
+        params = ()
+        if company_id:
+            query += " WHERE company_id = ?"
+            params = (company_id,)
+
+        with self._transaction() as conn:
+            rows = conn.execute(query, params).fetchall()
+            for (document,) in rows:
+                self._write_summary(conn, json.loads(document))
+
+        logger.info(f"Rebuilt {len(rows)} ticket summaries")
+        return len(rows)
+
+    def _load_analysis(self, company_id, ticket_id):
+        """
+        Retrieve a specific analysis by ticket ID from SQLite
+
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+
+        Returns:
+            Dict containing the analysis data or error
+        """
+        try:
+            with self.lock:
+                # Leave out payload fields embedded by older saves
+                row = self.conn.execute(
+                    "SELECT json_remove(document, " + ", ".join("'$.%s'" % field for field in self.PAYLOAD_FIELDS)
+                    + ") FROM companies_tickets WHERE company_id = ? AND ticket_id = ?",
+                    (company_id, ticket_id)
+                ).fetchone()
+
+            if not row:
+                return {'success': False, 'error': 'Analysis not found'}
+
+            return {
+                'success': True,
+                'data': json.loads(row[0])
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving analysis from SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _load_payload(self, company_id, ticket_id):
+        """
+        Read the compressed payload fields of an analysis
+
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+
+        Returns:
+            Dict containing the decompressed payload fields or error
+        """
+        key = (company_id, ticket_id)
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT field, data FROM analysis_payloads WHERE company_id = ? AND ticket_id = ?", key
+                ).fetchall()
+                payload = {field: self._decompress_payload(data) for field, data in rows}
+
+                # Tickets saved before payloads were split out still embed them
+                for field in self.PAYLOAD_FIELDS:
+                    if field in payload:
+                        continue
+                    path = f'$.{field}'
+                    row = self.conn.execute(
+                        "SELECT json_quote(json_extract(document, ?)) FROM companies_tickets "
+                        "WHERE company_id = ? AND ticket_id = ? AND json_type(document, ?) IS NOT NULL",
+                        (path,) + key + (path,)
+                    ).fetchone()
+                    if row:
+                        payload[field] = json.loads(row[0])
+
+            return {
+                'success': True,
+                'data': payload
+            }
+
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            logger.error(f"Error retrieving analysis payload from SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def get_all_analyses(self, company_id):
+        """
+        Get all analyses for a company
+
+        Args:
+            company_id: Company identifier
+
+        Returns:
+            List of analysis summary objects, newest first
+        """
+        try:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT summary FROM ticket_summaries WHERE company_id = ? "
+                    "ORDER BY created_at DESC, ticket_id DESC",
+                    (company_id,)
+                ).fetchall()
+
+            return {
+                'success': True,
+                'data': [json.loads(summary) for (summary,) in rows]
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error retrieving analyses from SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def list_analyses(self, company_id, limit=20, cursor=None):
+        """
+        Get one page of analysis summaries for a company, newest first
+
+        Args:
+            company_id: Company identifier
+            limit: Maximum number of summaries to return, capped at MAX_PAGE_SIZE
+            cursor: Opaque cursor from a previous page, None for the first page
+
+        Returns:
+            Dict with the page of summaries and the cursor of the next page, None on the last page
+        """
+        limit = max(1, min(int(limit), self.MAX_PAGE_SIZE))
+
+        query = "SELECT summary FROM ticket_summaries WHERE company_id = ?"
+        params = [company_id]
+        if cursor:
+            try:
+                created_at, ticket_id = self._decode_cursor(cursor)
+            except ValueError as e:
+                return {'success': False, 'error': str(e)}
+            query += " AND (created_at, ticket_id) < (?, ?)"
+            params += [created_at, ticket_id]
+
+        # One extra row tells whether another page follows
+        query += " ORDER BY created_at DESC, ticket_id DESC LIMIT ?"
+        params.append(limit + 1)
+
+        try:
+            with self.lock:
+                page = [json.loads(summary) for (summary,) in self.conn.execute(query, params)]
+
+            next_cursor = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = self._encode_cursor(page[-1])
+
+            return {
+                'success': True,
+                'data': page,
+                'next_cursor': next_cursor
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error listing analyses from SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def get_dashboard_stats(self, company_id, bucket='day'):
+        """
+        Compute dashboard statistics for a company
+
+        Args:
+            company_id: Company identifier
+            bucket: Time bucket for ticket counts, one of TIME_BUCKETS
+
+        Returns:
+            Dict with total_tickets, status_counts, task_status_counts,
+            criticality_counts, tag_counts and tickets_over_time
+            (list of {'bucket_start', 'count'} oldest first)
+        """
+        if bucket not in self.TIME_BUCKETS:
+            return {'success': False, 'error': f'Unknown time bucket: {bucket}'}
+        bucket_seconds = self.TIME_BUCKETS[bucket]
+
+        issues = "companies_tickets AS t, json_each(t.document, '$.final_report.issues') AS issue"
+
+        try:
+            with self.lock:
+                def counts(query, *params):
+                    return {str(key): count for key, count in self.conn.execute(query, (company_id,) + params)}
+
+                total = self.conn.execute(
+                    "SELECT COUNT(*) FROM companies_tickets WHERE company_id = ?", (company_id,)
+                ).fetchone()[0]
+                data = {
+                    'total_tickets': total,
+                    'status_counts': counts(
+                        "SELECT status, COUNT(*) FROM ticket_summaries WHERE company_id = ? GROUP BY status"),
+                    'task_status_counts': counts(
+                        f"SELECT COALESCE(json_extract(issue.value, '$.status'), 'new'), COUNT(*) "
+                        f"FROM {issues} WHERE t.company_id = ? GROUP BY 1"),
+                    'criticality_counts': counts(
+                        f"SELECT COALESCE(json_extract(issue.value, '$.criticality'), 'Unspecified'), COUNT(*) "
+                        f"FROM {issues} WHERE t.company_id = ? GROUP BY 1"),
+                    'tag_counts': counts(
+                        f"SELECT tag.value, COUNT(*) FROM {issues}, json_each(issue.value, '$.tags') AS tag "
+                        f"WHERE t.company_id = ? GROUP BY 1"),
+                    'tickets_over_time': [
+                        {'bucket_start': bucket_start, 'count': count}
+                        for bucket_start, count in self.conn.execute(
+                            "SELECT saved_at - saved_at % ?, COUNT(*) FROM companies_tickets "
+                            "WHERE company_id = ? GROUP BY 1 ORDER BY 1",
+                            (bucket_seconds, company_id))
+                    ],
+                    'bucket': bucket
+                }
+
+            return {
+                'success': True,
+                'data': data
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error computing dashboard stats in SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def update_analysis_status(self, company_id, ticket_id, new_status):
+        """
+        Update the status of an analysis
+
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            new_status: New status value
+
+        Returns:
+            Dict with operation status
+        """
+        try:
+            with self._transaction() as conn:
+                result = conn.execute(
+                    "UPDATE companies_tickets SET document = json_set(document, '$.status', ?, "
+                    "'$.metadata.updated_at', ?) WHERE company_id = ? AND ticket_id = ?",
+                    (new_status, int(time.time()), company_id, ticket_id)
+                )
+                if result.rowcount == 0:
+                    return {'success': False, 'error': 'Analysis not found'}
+                self._invalidate_analysis(company_id, ticket_id)
+
+                # Tickets with tasks derive their status from the tasks
+                summary_result = conn.execute(
+                    "UPDATE ticket_summaries SET status = ?, summary = json_set(summary, '$.status', ?) "
+                    "WHERE company_id = ? AND ticket_id = ? AND issue_count = 0",
+                    (new_status, new_status, company_id, ticket_id)
+                )
+
+            if summary_result.rowcount:
+                self._publish('ticket_updated', company_id, ticket_id, analysis_status=new_status, status=new_status)
+            else:
+                self._publish('ticket_updated', company_id, ticket_id, analysis_status=new_status)
+
+            return {
+                'success': True,
+                'ticket_id': ticket_id,
+                'status': new_status
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error updating analysis status in SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def update_task_status(self, company_id, ticket_id, task_index, new_status):
+        """
+        Update the status of a specific task within an analysis
+
+        The task update, the recount and the overall status are written in
+        one transaction, so concurrent updates never work from stale counts.
+
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            task_index: Index of the task to update
+            new_status: New status value for the task
+
+        Returns:
+            Dict with operation status
+        """
+        try:
+            task_index = int(task_index)
+        except (TypeError, ValueError):
+            return {'success': False, 'error': 'Task not found in analysis'}
+        if task_index < 0:
+            return {'success': False, 'error': 'Task not found in analysis'}
+
+        try:
+            with self._transaction() as conn:
+                result = self._apply_task_statuses(conn, company_id, ticket_id, {task_index: new_status})
+            if not result['success']:
+                return {'success': False, 'error': result['error']}
+            self._publish_task_statuses(company_id, ticket_id, {task_index: new_status},
+                                        result['overall_status'], result['counts'])
+
+            return {
+                'success': True,
+                'ticket_id': ticket_id,
+                'task_index': task_index,
+                'task_status': new_status,
+                'overall_status': result['overall_status'],
+                'counts': result['counts']
+            }
+
+        except sqlite3.Error as e:
+            logger.error(f"Error updating task status in SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def update_task_statuses(self, company_id, changes):
+        """
+        Apply many task status changes in one transaction
+
+        Changes are grouped by ticket so each ticket is written, recounted
+        and summarized once however many of its tasks change. A ticket whose
+        changes cannot be applied is left untouched and reported as failed.
+
+        Args:
+            company_id: Company identifier
+            changes: List of dicts with 'ticket_id', 'task_index' and 'status'
+
+        Returns:
+            Dict with per-ticket results, including the new counts and overall
+            status of every updated ticket, and the changes that were rejected
+        """
+        grouped, errors = self._group_task_changes(changes)
+        tickets = []
+        try:
+            with self._transaction() as conn:
+                for ticket_id, task_statuses in grouped.items():
+                    result = self._apply_task_statuses(conn, company_id, ticket_id, task_statuses)
+                    tickets.append({'ticket_id': ticket_id, **result})
+
+        except sqlite3.Error as e:
+            logger.error(f"Error bulk updating task statuses in SQLite: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+        for ticket in tickets:
+            if ticket['success']:
+                self._publish_task_statuses(company_id, ticket['ticket_id'], grouped[ticket['ticket_id']],
+                                            ticket['overall_status'], ticket['counts'])
+        return self._bulk_task_result(tickets, errors)
+
+    def _apply_task_statuses(self, conn, company_id, ticket_id, task_statuses):
+        """
+        Set task statuses of one ticket and recompute its counts, inside a transaction
+
+        Args:
+            conn: Connection with an open transaction
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            task_statuses: Dict of task index -> new status
+
+        Returns:
+            Dict with the overall status and task counts, or an error
+        """
+        key = (company_id, ticket_id)
+        # All task paths go into one json_set; if the highest index exists, the others do too
+        paths = []
+        for task_index, new_status in task_statuses.items():
+            paths += [f"$.final_report.issues[{task_index}].status", new_status]
+        last_task_path = f"$.final_report.issues[{max(task_statuses)}]"
+
+        result = conn.execute(
+            f"UPDATE companies_tickets SET document = json_set(document, {', '.join('?' * len(paths))}, "
+            "'$.metadata.updated_at', ?) WHERE company_id = ? AND ticket_id = ? AND json_type(document, ?) IS NOT NULL",
+            tuple(paths) + (int(time.time()),) + key + (last_task_path,)
+        )
+        if result.rowcount == 0:
+            exists = conn.execute(
+                "SELECT 1 FROM companies_tickets WHERE company_id = ? AND ticket_id = ?", key
+            ).fetchone()
+            return {'success': False, 'error': 'Task not found in analysis' if exists else 'Analysis not found'}
+
+        # Tasks without a status count as new
+        task_counts = {status: 0 for status in self.TASK_STATUSES}
+        for status, count in conn.execute(
+                "SELECT COALESCE(json_extract(issue.value, '$.status'), 'new'), COUNT(*) "
+                "FROM companies_tickets AS t, json_each(t.document, '$.final_report.issues') AS issue "
+                "WHERE t.company_id = ? AND t.ticket_id = ? GROUP BY 1", key):
+            if status in task_counts:
+                task_counts[status] = count
+        overall_status = self._overall_status(task_counts)
+
+        counts_json = json.dumps(task_counts)
+        conn.execute(
+            "UPDATE companies_tickets SET document = json_set(document, '$.status', ?, "
+            "'$.task_status_counts', json(?)) WHERE company_id = ? AND ticket_id = ?",
+            (overall_status, counts_json) + key
+        )
+        conn.execute(
+            "UPDATE ticket_summaries SET status = ?, summary = json_set(summary, '$.status', ?, "
+            "'$.task_status_counts', json(?)) WHERE company_id = ? AND ticket_id = ?",
+            (overall_status, overall_status, counts_json) + key
+        )
+        self._invalidate_analysis(company_id, ticket_id)
+
+        return {'success': True, 'overall_status': overall_status, 'counts': task_counts}
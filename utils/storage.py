@@ -0,0 +1,416 @@
+import time
+import zlib
+import json
+import base64
+import logging
+import threading
+from utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# Storage backends selectable with STORAGE_BACKEND
+STORAGE_BACKENDS = ('mongodb', 'sqlite')
+
+
+class AnalysisStorage:
+    """
+    Base class for analysis storage backends
+
+    Defines the interface the routes and agents rely on and holds the
+    bookkeeping shared by every backend. Each method returns a dict with a
+    'success' key and either the result or an 'error' message.
+    """
+    # Upper bound on the page size of list_analyses
+    MAX_PAGE_SIZE = 100
+    # Time buckets for dashboard ticket counts, in seconds
+    TIME_BUCKETS = {'hour': 3600, 'day': 86400, 'week': 7 * 86400}
+    # Task statuses counted on ticket summaries
+    TASK_STATUSES = ('new', 'processing', 'resolved')
+    # Bulky raw LLM outputs, stored compressed apart from the main document
+    PAYLOAD_FIELDS = ('scout_analysis', 'analyst_insights')
+    # Read-through cache of analyses without their payload, set up by _init_analysis_cache
+    analysis_cache = None
+    # EventBus receiving change events after writes, None publishes nothing
+    event_bus = None
+
+    def save_analysis(self, analysis_data, company_id, ticket_id=None):
+        """Save an analysis, inserting or overwriting the ticket"""
+        raise NotImplementedError
+
+    def save_analyses_bulk(self, items):
+        """Save many analyses given as dicts with 'analysis', 'company_id' and optional 'ticket_id'"""
+        raise NotImplementedError
+
+    def _init_analysis_cache(self, max_entries=256, ttl_seconds=300):
+        """
+        Set up the read-through cache used by get_analysis
+
+        Args:
+            max_entries: Maximum cached analyses, 0 disables the cache
+            ttl_seconds: Time-to-live bounding staleness from writes by other processes
+        """
+        self.analysis_cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds) if max_entries else None
+        # Bumped on every invalidation so a read racing a write never caches stale data
+        self.cache_generation = 0
+        self.cache_lock = threading.Lock()
+
+    def get_analysis(self, company_id, ticket_id, full=False):
+        """
+        Retrieve a specific analysis by ticket ID
+
+        The main document, without the PAYLOAD_FIELDS, is served from the
+        read-through cache when possible and may be shared with the cache,
+        so callers must not modify it. The payload is only read on request.
+
+        Args:
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            full: Whether to include the raw scout_analysis and analyst_insights
+
+        Returns:
+            Dict containing the analysis data or error
+        """
+        result = self._get_cached_analysis(company_id, ticket_id)
+        if not full or not result['success']:
+            return result
+
+        payload = self._load_payload(company_id, ticket_id)
+        if not payload['success']:
+            return payload
+        return {'success': True, 'data': {**result['data'], **payload['data']}}
+
+    def _get_cached_analysis(self, company_id, ticket_id):
+        """Read the main document of an analysis through the cache"""
+        if self.analysis_cache is None:
+            return self._load_analysis(company_id, ticket_id)
+
+        key = (company_id, ticket_id)
+        analysis_data = self.analysis_cache.get(key)
+        if analysis_data is not None:
+            return {'success': True, 'data': analysis_data}
+
+        generation = self.cache_generation
+        result = self._load_analysis(company_id, ticket_id)
+        if result['success']:
+            with self.cache_lock:
+                if generation == self.cache_generation:
+                    self.analysis_cache.set(key, result['data'])
+        return result
+
+    def _load_analysis(self, company_id, ticket_id):
+        """Read the main document of an analysis from the backend, bypassing the cache"""
+        raise NotImplementedError
+
+    def _load_payload(self, company_id, ticket_id):
+        """Read and decompress the payload fields of an analysis"""
+        raise NotImplementedError
+
+    def _invalidate_analysis(self, company_id, ticket_id):
+        """Drop a ticket from the read-through cache after it was written"""
+        if self.analysis_cache is None:
+            return
+        with self.cache_lock:
+            self.cache_generation += 1
+            self.analysis_cache.delete((company_id, ticket_id))
+
+    def _publish(self, event_type, company_id, ticket_id, **fields):
+        """
+        Publish a change event for a ticket to the event bus
+
+        Args:
+            event_type: 'ticket_saved' with the new summary, or 'ticket_updated'
+                with the changed summary fields
+            company_id: Company identifier
+            ticket_id: Ticket identifier
+            **fields: Event-specific fields
+        """
+        if self.event_bus is None:
+            return
+        self.event_bus.publish({'type': event_type, 'company_id': company_id, 'ticket_id': ticket_id, **fields})
+
+    def _publish_saved(self, document):
+        """Publish the summary of a saved analysis document"""
+        if self.event_bus is None:
+            return
+        summary = self._build_summary(document)
+        self._publish('ticket_saved', summary.pop('company_id'), summary['ticket_id'], summary=summary)
+
+    def _publish_task_statuses(self, company_id, ticket_id, task_statuses, overall_status, task_counts):
+        """Publish the task changes of a ticket with its recomputed status and counts"""
+        self._publish(
+            'ticket_updated', company_id, ticket_id,
+            status=overall_status,
+            task_status_counts=task_counts,
+            tasks=[{'task_index': task_index, 'status': status} for task_index, status in task_statuses.items()]
+        )
+
+    def start_change_stream(self, event_bus):
+        """
+        Feed change events from the database's own change feed instead of local writes
+
+        Args:
+            event_bus: EventBus receiving the events
+
+        Returns:
+            True if the change feed is running, False if the backend has none
+        """
+        return False
+
+    def cache_stats(self):
+        """Return read-through cache counters, or None if the cache is disabled"""
+        return self.analysis_cache.stats() if self.analysis_cache is not None else None
+
+    def get_all_analyses(self, company_id):
+        """Get the summaries of all analyses for a company, newest first"""
+        raise NotImplementedError
+
+    def list_analyses(self, company_id, limit=20, cursor=None):
+        """Get one page of analysis summaries for a company, newest first"""
+        raise NotImplementedError
+
+    def get_dashboard_stats(self, company_id, bucket='day'):
+        """Compute status, task, criticality, tag and time-bucket counts for a company"""
+        raise NotImplementedError
+
+    def update_analysis_status(self, company_id, ticket_id, new_status):
+        """Update the status of an analysis"""
+        raise NotImplementedError
+
+    def update_task_status(self, company_id, ticket_id, task_index, new_status):
+        """Update the status of a specific task within an analysis"""
+        raise NotImplementedError
+
+    def update_task_statuses(self, company_id, changes):
+        """Apply many task status changes, recomputing each touched ticket once"""
+        raise NotImplementedError
+
+    def rebuild_summaries(self, company_id=None):
+        """Rebuild ticket summaries from the full analysis documents"""
+        raise NotImplementedError
+
+    def _prepare_analysis(self, analysis_data, company_id, ticket_id=None):
+        """
+        Fill in the bookkeeping fields of an analysis before it is written
+
+        Args:
+            analysis_data: Dict containing analysis results
+            company_id: Company identifier
+            ticket_id: Optional ticket identifier, generated if not provided
+
+        Returns:
+            Shallow copy of the analysis ready to be written, without any _id
+        """
+        # Generate ticket ID if not provided
+        if not ticket_id:
+            timestamp = int(time.time())
+            ticket_id = f"{company_id}_{timestamp}"
+
+        # Add status field if not present
+        if 'status' not in analysis_data:
+            analysis_data['status'] = 'new'
+
+        # Add metadata if not present
+        if 'metadata' not in analysis_data:
+            analysis_data['metadata'] = {}
+
+        # Add save timestamp
+        analysis_data['metadata']['saved_at'] = int(time.time())
+        analysis_data['ticket_id'] = ticket_id
+        analysis_data['company_id'] = company_id
+
+        # Initialize task status if not present in issues
+        if 'final_report' in analysis_data and 'issues' in analysis_data['final_report']:
+            for issue in analysis_data['final_report']['issues']:
+                if 'status' not in issue:
+                    issue['status'] = 'new'
+
+        # Only a top-level _id (from a previously loaded document) would clash with $set
+        document = {key: value for key, value in analysis_data.items() if key != '_id'}
+
+        # Recount rather than keep counts carried over from a loaded document whose issues changed
+        document['task_status_counts'] = self._count_task_statuses(document.get('final_report', {}).get('issues', []))
+        return document
+
+    def _split_payload(self, document):
+        """
+        Move the payload fields off a prepared document
+
+        Args:
+            document: Document returned by _prepare_analysis, modified in place
+
+        Returns:
+            Dict of payload field -> zlib-compressed JSON bytes
+        """
+        return {
+            field: self._compress_payload(document.pop(field))
+            for field in self.PAYLOAD_FIELDS if field in document
+        }
+
+    def _compress_payload(self, value):
+        """Serialize a payload field to compressed JSON"""
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+    def _decompress_payload(self, data):
+        """Restore a payload field written by _compress_payload"""
+        return json.loads(zlib.decompress(data).decode('utf-8'))
+
+    def _group_task_changes(self, changes):
+        """
+        Validate task status changes and group them by ticket
+
+        Args:
+            changes: List of dicts with 'ticket_id', 'task_index' and 'status'
+
+        Returns:
+            Tuple of (dict of ticket_id -> {task_index: status} in request order,
+            list of {'index', 'error'} for changes that were rejected).
+            A later change to the same task overrides an earlier one.
+        """
+        grouped = {}
+        errors = []
+        for index, change in enumerate(changes):
+            if not isinstance(change, dict):
+                errors.append({'index': index, 'error': 'Change must be an object'})
+                continue
+
+            ticket_id = change.get('ticket_id')
+            new_status = change.get('status')
+            try:
+                task_index = int(change.get('task_index'))
+            except (TypeError, ValueError):
+                task_index = -1
+
+            if not ticket_id or not new_status:
+                errors.append({'index': index, 'error': 'Missing ticket_id or status'})
+            elif task_index < 0:
+                errors.append({'index': index, 'error': 'Invalid task_index'})
+            else:
+                grouped.setdefault(ticket_id, {})[task_index] = new_status
+        return grouped, errors
+
+    def _bulk_task_result(self, tickets, errors):
+        """Build the result of update_task_statuses from per-ticket results and rejected changes"""
+        updated = sum(1 for ticket in tickets if ticket['success'])
+        return {
+            'success': updated == len(tickets) and not errors,
+            'updated': updated,
+            'failed': len(tickets) - updated,
+            'tickets': tickets,
+            'errors': errors
+        }
+
+    def _count_task_statuses(self, issues):
+        """Count tasks by status; tasks without a status count as new"""
+        task_status_counts = {status: 0 for status in self.TASK_STATUSES}
+        for issue in issues:
+            status = issue.get('status', 'new')
+            if status in task_status_counts:
+                task_status_counts[status] += 1
+        return task_status_counts
+
+    def _overall_status(self, task_status_counts, status='new'):
+        """
+        Derive a ticket's overall status from its task counts
+
+        Args:
+            task_status_counts: Dict of task status -> count
+            status: Ticket status used when there are no tasks
+
+        Returns:
+            Overall status string
+        """
+        total_tasks = sum(task_status_counts.values())
+        if total_tasks == 0:
+            return status
+        elif task_status_counts.get('resolved', 0) == total_tasks:
+            return 'resolved'
+        elif task_status_counts.get('new', 0) == total_tasks:
+            return 'new'
+        return 'processing'
+
+    def _build_summary(self, analysis_data):
+        """
+        Build the dashboard summary for an analysis document
+
+        Args:
+            analysis_data: Full analysis document
+
+        Returns:
+            Dict with the small set of fields the dashboard lists
+        """
+        final_report = analysis_data.get('final_report', {})
+        issues = final_report.get('issues', [])
+        task_status_counts = self._count_task_statuses(issues)
+
+        return {
+            'company_id': analysis_data.get('company_id'),
+            'ticket_id': analysis_data.get('ticket_id'),
+            'created_at': analysis_data.get('metadata', {}).get('saved_at', 0),
+            'status': self._overall_status(task_status_counts, analysis_data.get('status', 'new')),
+            'task_status_counts': task_status_counts,
+            'query': analysis_data.get('query', 'No query available'),
+            'summary': final_report.get('executive_summary', 'No summary available'),
+            'issue_count': len(issues),
+        }
+
+    def _encode_cursor(self, summary):
+        """Encode the sort position of a summary as an opaque page cursor"""
+        position = json.dumps([summary['created_at'], summary['ticket_id']])
+        return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+    def _decode_cursor(self, cursor):
+        """Decode a page cursor into (created_at, ticket_id), raising ValueError if malformed"""
+        try:
+            created_at, ticket_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (TypeError, ValueError, UnicodeError) as e:
+            raise ValueError('Invalid cursor') from e
+        return created_at, ticket_id
+
+
+def create_storage(backend='mongodb', mongodb_uri=None, mongodb_db='KollabAgentic', sqlite_path='kollab.sqlite3',
+                   mongodb_timeout_ms=5000, cache_size=256, cache_ttl=300, mongodb_max_pool_size=100,
+                   event_bus=None):
+    """
+    Create the configured storage backend
+
+    When MongoDB is selected but cannot be reached, the embedded SQLite
+    backend is used instead so the app keeps working.
+
+    Args:
+        backend: 'mongodb' or 'sqlite'
+        mongodb_uri: MongoDB connection URI
+        mongodb_db: MongoDB database name
+        sqlite_path: Path of the SQLite database file
+        mongodb_timeout_ms: How long to wait for MongoDB before falling back
+        cache_size: Maximum analyses in the read-through cache, 0 disables it
+        cache_ttl: Time-to-live of cached analyses in seconds
+        mongodb_max_pool_size: Maximum MongoDB connections per server
+        event_bus: Optional EventBus receiving change events after writes
+
+    Returns:
+        AnalysisStorage instance
+    """
+    if backend not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend '{backend}', expected one of {', '.join(STORAGE_BACKENDS)}")
+
+    # Backends are imported lazily so each only needs its own driver
+    if backend == 'mongodb':
+        from pymongo.errors import PyMongoError
+        from utils.mongodb_storage import MongoDBStorage
+        try:
+            storage = MongoDBStorage(
+                connection_string=mongodb_uri,
+                database_name=mongodb_db,
+                server_selection_timeout_ms=mongodb_timeout_ms,
+                cache_size=cache_size,
+                cache_ttl=cache_ttl,
+                max_pool_size=mongodb_max_pool_size,
+                event_bus=event_bus
+            )
+            logger.info("Connected to MongoDB")
+            return storage
+        except PyMongoError as e:
+            logger.warning(f"MongoDB connection failed: {str(e)}. Falling back to SQLite at {sqlite_path}")
+
+    from utils.sqlite_storage import SQLiteStorage
+    return SQLiteStorage(database_path=sqlite_path, cache_size=cache_size, cache_ttl=cache_ttl, event_bus=event_bus)
@@ -0,0 +1,105 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class IssueStreamParser:
+    """
+    Picks completed entries of a JSON array out of a streamed LLM response
+
+    Text is fed as it arrives. The parser tracks strings, escapes and
+    nesting, and once the array under the watched key (Scout's
+    'issue_types') has received a complete object, that object is decoded
+    and returned, without waiting for the rest of the response. Text around
+    the JSON, such as a Markdown fence, is ignored. An entry that does not
+    decode is skipped; the caller still parses the full response at the end.
+    """
+    def __init__(self, key='issue_types'):
+        """
+        Initialize the parser
+
+        Args:
+            key: Name of the array whose entries are returned
+        """
+        self.key = key
+        self.text = ''
+        self.position = 0
+        self.stack = []
+        self.in_string = False
+        self.escaped = False
+        self.string_start = None
+        self.last_string = None
+        self.key_pending = False  # last tokens were the watched key and a colon
+        self.array_depth = None  # nesting depth of the watched array while it is open
+        self.array_closed = False
+        self.entry_start = None
+
+    def feed(self, chunk):
+        """
+        Add streamed text
+
+        Args:
+            chunk: Next piece of the response
+
+        Returns:
+            List of array entries completed by this chunk, decoded
+        """
+        self.text += chunk
+        completed = []
+
+        for index in range(self.position, len(self.text)):
+            char = self.text[index]
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    self.last_string = self.text[self.string_start + 1:index]
+                continue
+
+            if char.isspace():
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string_start = index
+                self.key_pending = False
+            elif char == ':':
+                self.key_pending = self.last_string == self.key and self.array_depth is None and not self.array_closed
+            elif char in '[{':
+                self.stack.append(char)
+                if char == '[' and self.key_pending:
+                    self.array_depth = len(self.stack)
+                elif char == '{' and self.array_depth is not None and len(self.stack) == self.array_depth + 1:
+                    self.entry_start = index
+                self.key_pending = False
+            elif char in ']}':
+                if self.stack:
+                    self.stack.pop()
+                if char == '}' and self.entry_start is not None and len(self.stack) == self.array_depth:
+                    entry = self._decode(self.text[self.entry_start:index + 1])
+                    if entry is not None:
+                        completed.append(entry)
+                    self.entry_start = None
+                elif char == ']' and self.array_depth is not None and len(self.stack) < self.array_depth:
+                    # The array is closed; later arrays under the same key are not watched
+                    self.array_depth = None
+                    self.array_closed = True
+                self.key_pending = False
+            else:
+                self.key_pending = False
+
+        self.position = len(self.text)
+        return completed
+
+    def _decode(self, entry_text):
+        """Decode one array entry, None if it is not valid JSON"""
+        try:
+            return json.loads(entry_text)
+        except json.JSONDecodeError:
+            logger.debug(f"Skipping undecodable streamed {self.key} entry")
+            return None
@@ -1,4 +1,9 @@
 import re
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import nltk
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -19,6 +24,32 @@ download_nltk_resources()
 
 logger = logging.getLogger(__name__)
 
+# Cleaning pattern, compiled once at import: URLs, HTML tags and special
+# characters (keeping word characters, spaces and basic punctuation),
+# removed in a single pass. A tag is matched before the URL inside it, so
+# '<a href=http://x>' goes as a whole rather than leaving 'a href'. '<' is
+# kept out of the special-character run so a run such as ':)' cannot
+# swallow the start of a following tag; a '<' that opens no tag is removed
+# on its own.
+CLEANING_PATTERN = re.compile(r'https?://\S+|www\.\S+|<.*?>|[^\w\s.,!?<]+|<')
+
+# Lightweight tokenizer: word runs, ellipses and single punctuation marks
+TOKEN_PATTERN = re.compile(r'\w+|\.\.\.|[^\w\s]')
+
+TOKENIZER_BACKENDS = ('nltk', 'regex')
+
+# Preprocessor instance owned by each worker process of the parallel pool
+_worker_preprocessor = None
+
+def _init_worker(batch_size, tokenizer):
+    """Create the per-process preprocessor when a pool worker starts"""
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(batch_size=batch_size, tokenizer=tokenizer)
+
+def _preprocess_chunk(batches):
+    """Preprocess a chunk of batches inside a pool worker"""
+    return [_worker_preprocessor.preprocess_batch(batch) for batch in batches]
+
 class TextPreprocessor:
     """
     Handles text preprocessing including:
@@ -27,16 +58,26 @@ class TextPreprocessor:
     - Batching large datasets
     """
     
-    def __init__(self):
+    def __init__(self, batch_size=200, workers=1, chunk_size=1, tokenizer='nltk'):
         """
         Initialize the text preprocessor
         
         Args:
-            stopwords: remove stopwords and to keep keywords
             batch_size: batch_size to process the text
+            workers: Number of worker processes for preprocess_batches, 1 runs in-process
+            chunk_size: Number of batches sent to a worker process per task
+            tokenizer: Stopword tokenizer backend, 'nltk' (word_tokenize) or 'regex' (faster)
         """
-        self.batch_size = 200
-        self.stop_words = set(stopwords.words("english"))
+        if tokenizer not in TOKENIZER_BACKENDS:
+            raise ValueError(f"Unknown tokenizer backend: {tokenizer}")
+        
+        self.batch_size = batch_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.tokenizer = tokenizer
+        self.stop_words = frozenset(stopwords.words("english"))
+        self._pool = None
+        self._pool_lock = threading.Lock()
         
     def clean_text(self, text):
         """
@@ -54,25 +95,25 @@ class TextPreprocessor:
         # Convert to string if not already
         text = str(text)
         
-        # Remove URLs
-        text = re.sub(r'https?://\S+|www\.\S+', '', text)
-        
-        # Remove HTML tags
-        text = re.sub(r'<.*?>', '', text)
+        # Remove URLs, HTML tags and special characters in one scan
+        text = CLEANING_PATTERN.sub('', text)
         
-        # Remove special characters and numbers (keep letters, spaces, and basic punctuation)
-        text = re.sub(r'[^\w\s.,!?]', '', text)
-        
-        # Replace multiple spaces with single space
-        text = re.sub(r'\s+', ' ', text)
-        
-        # Normalize line breaks
-        text = text.replace('\r\n', '\n').replace('\r', '\n')
-        
-        # Remove leading/trailing whitespace
-        text = text.strip()
+        # Collapse whitespace runs (including line breaks) to single spaces and trim the ends
+        return ' '.join(text.split())
+    
+    def tokenize(self, text):
+        """
+        Split text into word and punctuation tokens using the configured backend
         
-        return text
+        Args:
+            text: Text string to tokenize
+            
+        Returns:
+            List of tokens
+        """
+        if self.tokenizer == 'regex':
+            return TOKEN_PATTERN.findall(text)
+        return word_tokenize(text)
     
     def remove_stop_words(self, text):
         """
@@ -85,10 +126,11 @@ class TextPreprocessor:
             Text string with stopwords removed
         """
         # Tokenize text
-        word_tokens = word_tokenize(text)
+        word_tokens = self.tokenize(text)
         
         # Remove stopwords
-        filtered_text = [word for word in word_tokens if word.lower() not in self.stop_words]
+        stop_words = self.stop_words
+        filtered_text = [word for word in word_tokens if word.lower() not in stop_words]
         
         # Join tokens back into string
         return ' '.join(filtered_text)
@@ -138,13 +180,23 @@ class TextPreprocessor:
         Split records into batches for processing
         
         Args:
-            records: List of records to batch
+            records: List of records, or any iterable such as a streaming file reader
             
         Returns:
             Generator yielding batches of records
         """
-        for i in range(0, len(records), self.batch_size):
-            yield records[i:i + self.batch_size]
+        if isinstance(records, list):
+            for i in range(0, len(records), self.batch_size):
+                yield records[i:i + self.batch_size]
+            return
+        
+        # Pull only one batch at a time from streaming sources
+        iterator = iter(records)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                return
+            yield batch
     
     def preprocess_batch(self, records):
         """
@@ -156,4 +208,60 @@ class TextPreprocessor:
         Returns:
             List of preprocessed records
         """
-        return [self.preprocess_record(record) for record in records]
\ No newline at end of file
+        return [self.preprocess_record(record) for record in records]
+    
+    def _get_pool(self):
+        """Create the worker process pool on first use"""
+        with self._pool_lock:
+            if self._pool is None:
+                # Spawned workers don't inherit the server's threads, locks or sockets as forked ones would
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.batch_size, self.tokenizer)
+                )
+            return self._pool
+    
+    def preprocess_batches(self, batches):
+        """
+        Preprocess batches, spreading them across worker processes when enabled
+        
+        Batches are yielded in input order. Only a bounded number of chunks
+        is in flight at once, so streaming inputs are not read ahead fully.
+        
+        Args:
+            batches: Iterable of record batches
+            
+        Returns:
+            Generator yielding preprocessed batches in input order
+        """
+        if self.workers <= 1:
+            for batch in batches:
+                yield self.preprocess_batch(batch)
+            return
+        
+        pool = self._get_pool()
+        batch_iterator = iter(batches)
+        in_flight = deque()
+        max_in_flight = self.workers * 2
+        
+        while True:
+            # Keep every worker busy with a little queued work behind it
+            while len(in_flight) < max_in_flight:
+                chunk = list(islice(batch_iterator, self.chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(pool.submit(_preprocess_chunk, chunk))
+            
+            if not in_flight:
+                return
+            
+            yield from in_flight.popleft().result()
+    
+    def close(self):
+        """Shut down the worker process pool if one was started"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
\ No newline at end of file
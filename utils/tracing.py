@@ -0,0 +1,321 @@
+import json
+import time
+import queue
+import logging
+import threading
+import itertools
+import contextvars
+import urllib.request
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# (trace, parent span id) of the code currently running
+_active = contextvars.ContextVar('tracing_active', default=(None, None))
+
+
+class Span:
+    """A timed pipeline stage with attributes such as record counts and prompt sizes"""
+    __slots__ = ('name', 'span_id', 'parent_id', 'start', 'duration_ms', 'attributes', '_started')
+
+    def __init__(self, name, span_id, parent_id, attributes, start=None):
+        self.name = name
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = start if start is not None else time.time()
+        self.duration_ms = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        """Add attributes to the span"""
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        """Return the span as a JSON-serializable dict"""
+        return {
+            'name': self.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stand-in yielded by span() when no trace is active"""
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    Collects the spans of one analysis process
+
+    Spans can be opened from any thread the trace was activated or
+    propagated to. Finishing the trace hands it to the exporters once.
+    """
+    def __init__(self, process_id, exporters=(), **attributes):
+        """
+        Start a trace
+
+        Args:
+            process_id: Analysis process the trace belongs to
+            exporters: Exporters receiving the trace when it finishes
+            **attributes: Attributes of the whole trace, e.g. company_id
+        """
+        self.process_id = process_id
+        self.exporters = exporters
+        self.attributes = attributes
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.spans = []
+        self.span_ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.finished = False
+
+    def _open(self, name, parent_id, attributes, start=None):
+        """Create a span; it is recorded when closed"""
+        return Span(name, next(self.span_ids), parent_id, attributes, start)
+
+    def _close(self, span, duration_ms=None):
+        """Record a span with its duration"""
+        span.duration_ms = duration_ms if duration_ms is not None else (time.perf_counter() - span._started) * 1000
+        with self.lock:
+            self.spans.append(span)
+
+    def to_dict(self, include_spans=True):
+        """
+        Return the trace as a JSON-serializable dict
+
+        Args:
+            include_spans: Whether to list the spans, ordered by start, besides the per-stage totals
+
+        Returns:
+            Dict with the process_id, duration_ms, attributes, stage_totals_ms and optionally spans
+        """
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: (span.start, span.span_id))
+        stage_totals = {}
+        for span in spans:
+            stage_totals[span.name] = stage_totals.get(span.name, 0) + span.duration_ms
+        trace_data = {
+            'process_id': self.process_id,
+            'start': self.start,
+            'duration_ms': (time.perf_counter() - self._started) * 1000,
+            'attributes': self.attributes,
+            'stage_totals_ms': stage_totals
+        }
+        if include_spans:
+            trace_data['spans'] = [span.to_dict() for span in spans]
+        return trace_data
+
+    def finish(self):
+        """
+        End the trace and export it
+
+        Returns:
+            The final trace dict
+        """
+        trace_data = self.to_dict()
+        with self.lock:
+            if self.finished:
+                return trace_data
+            self.finished = True
+
+        for exporter in self.exporters:
+            try:
+                exporter.export(trace_data)
+            except Exception as e:
+                logger.error(f"Trace export failed for process {self.process_id}: {str(e)}")
+        return trace_data
+
+
+@contextmanager
+def activate(trace):
+    """Make trace the one spans are recorded to in the current context"""
+    token = _active.set((trace, None))
+    try:
+        yield trace
+    finally:
+        _active.reset(token)
+
+
+def current_trace():
+    """Return the active trace, or None"""
+    return _active.get()[0]
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a block as a span of the active trace
+
+    Spans opened inside the block become its children. Without an active
+    trace a no-op span is yielded, so instrumented code runs unchanged.
+
+    Args:
+        name: Stage name, e.g. 'scout_llm'
+        **attributes: Initial span attributes
+
+    Yields:
+        The span, whose set() adds attributes
+    """
+    trace, parent_id = _active.get()
+    if trace is None:
+        yield NOOP_SPAN
+        return
+
+    current = trace._open(name, parent_id, attributes)
+    token = _active.set((trace, current.span_id))
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=str(e))
+        raise
+    finally:
+        _active.reset(token)
+        trace._close(current)
+
+
+def add_span(name, start, duration_ms=None, **attributes):
+    """
+    Record a stage that has already ended as a span of the active trace
+
+    Useful where the stage is not a single block, e.g. one batch of a
+    generator, or a stage interleaved with others whose time is summed
+    over its pieces.
+
+    Args:
+        name: Stage name
+        start: time.time() at which the stage started
+        duration_ms: Time spent in the stage, defaults to the time from start until now
+        **attributes: Span attributes
+    """
+    trace, parent_id = _active.get()
+    if trace is None:
+        return
+    if duration_ms is None:
+        duration_ms = (time.time() - start) * 1000
+    trace._close(trace._open(name, parent_id, attributes, start=start), duration_ms)
+
+
+def propagate(func):
+    """
+    Bind func to the active trace and span so it records into them on another thread
+
+    Args:
+        func: Callable to run on a worker thread
+
+    Returns:
+        Wrapped callable
+    """
+    active = _active.get()
+
+    def run(*args, **kwargs):
+        token = _active.set(active)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _active.reset(token)
+    return run
+
+
+class JsonlSpanExporter:
+    """Appends every span of a finished trace as one JSON line to a file"""
+    def __init__(self, path):
+        """
+        Initialize the exporter
+
+        Args:
+            path: File the span lines are appended to
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+    def export(self, trace_data):
+        """Write the spans of a finished trace"""
+        lines = [
+            json.dumps({'process_id': trace_data['process_id'], **trace_data['attributes'], **span}, default=str)
+            for span in trace_data['spans']
+        ]
+        if not lines:
+            return
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as trace_file:
+                trace_file.write('\n'.join(lines) + '\n')
+
+
+class HttpCollectorExporter:
+    """
+    POSTs finished traces as JSON to a collector endpoint
+
+    Traces are sent from a background thread so a slow or unreachable
+    collector never delays an analysis; when the backlog is full further
+    traces are dropped with a warning.
+    """
+    def __init__(self, url, timeout=5, max_pending=100):
+        """
+        Initialize the exporter and start its sender thread
+
+        Args:
+            url: Collector endpoint accepting one trace per POST
+            timeout: Seconds to wait for the collector per request
+            max_pending: Maximum traces waiting to be sent
+        """
+        self.url = url
+        self.timeout = timeout
+        self.pending = queue.Queue(maxsize=max_pending)
+        threading.Thread(target=self._send_loop, name='trace-exporter', daemon=True).start()
+
+    def export(self, trace_data):
+        """Queue a finished trace for sending"""
+        try:
+            self.pending.put_nowait(trace_data)
+        except queue.Full:
+            logger.warning(f"Trace collector backlog full, dropping trace of process {trace_data['process_id']}")
+
+    def _send_loop(self):
+        """Send queued traces to the collector"""
+        while True:
+            trace_data = self.pending.get()
+            request = urllib.request.Request(
+                self.url,
+                data=json.dumps(trace_data, default=str).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout):
+                    pass
+            except Exception as e:
+                logger.warning(f"Could not send trace of process {trace_data['process_id']} to collector: {str(e)}")
+
+
+class Tracer:
+    """Starts traces that are exported to the configured exporters when finished"""
+    def __init__(self, exporters=None):
+        """
+        Initialize the tracer
+
+        Args:
+            exporters: Optional list of exporters, e.g. JsonlSpanExporter and HttpCollectorExporter
+        """
+        self.exporters = list(exporters or [])
+
+    def start_trace(self, process_id, **attributes):
+        """
+        Start the trace of an analysis process
+
+        Args:
+            process_id: Analysis process the trace belongs to
+            **attributes: Attributes of the whole trace, e.g. company_id
+
+        Returns:
+            Trace to activate while the process runs
+        """
+        return Trace(process_id, self.exporters, **attributes)